@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.core.database import get_db
-from app.models.conversation import Agent
+from app.core.cache import AGENTS_NAMESPACE, CachedResponse, response_cache
+from app.core.database import get_async_db
+from app.models.agent import Agent
 from pydantic import BaseModel
 from uuid import UUID
 from typing import Dict, Any
@@ -20,23 +22,34 @@ class AgentResponse(BaseModel):
         from_attributes = True
 
 @router.get("/", response_model=List[AgentResponse])
-async def list_agents(db: Session = Depends(get_db)):
+async def list_agents(db: AsyncSession = Depends(get_async_db)):
     """
     List all available AI agents/platforms
     """
-    agents = db.query(Agent).all()
-    return agents
+    async def load() -> CachedResponse:
+        result = await db.execute(select(Agent))
+        return CachedResponse.from_content(
+            [AgentResponse.model_validate(agent) for agent in result.scalars().all()]
+        )
+    
+    entry = await response_cache.get_or_load(AGENTS_NAMESPACE, "list", load)
+    return entry.to_response()
 
 @router.get("/{agent_id}", response_model=AgentResponse)
-async def get_agent(agent_id: UUID, db: Session = Depends(get_db)):
+async def get_agent(agent_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """
     Get agent details by ID
     """
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
-    if not agent:
-        from fastapi import HTTPException, status
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Agent not found"
-        )
-    return agent
+    async def load() -> CachedResponse:
+        result = await db.execute(select(Agent).where(Agent.id == agent_id))
+        agent = result.scalar_one_or_none()
+        if not agent:
+            from fastapi import HTTPException, status
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Agent not found"
+            )
+        return CachedResponse.from_content(AgentResponse.model_validate(agent))
+    
+    entry = await response_cache.get_or_load(AGENTS_NAMESPACE, f"agent:{agent_id}", load)
+    return entry.to_response()
@@ -1,55 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional, Union
 from uuid import UUID
+from datetime import datetime
+import anyio
+import hashlib
+import json
+import zlib
 
-from app.core.database import get_db
+from app.core.cache import AGENTS_NAMESPACE, CachedResponse, response_cache, user_namespace
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.core.executors import executors, EMBEDDING_POOL
 from app.core.auth import get_current_user
+from app.core.pagination import encode_cursor, decode_cursor
 from app.models.user import User
 from app.models.conversation import Conversation, Message
-from app.models.agent import Agent
 from app.schemas.conversation import (
     ConversationCreate,
     ConversationResponse,
     ConversationListResponse,
+    ConversationListPage,
     ConversationUpdate,
     ConversationBatchCreate,
     ConversationBatchResponse,
     MessageResponse
 )
-from app.tasks.embedding_tasks import generate_embeddings_task, run_sync_embeddings
+from app.tasks.embedding_tasks import generate_embeddings_task, run_sync_embeddings, run_sync_embeddings_batch
+from app.services.agent_registry import agent_registry
+from app.services.embedding_snapshots import embedding_snapshots
+from app.services.ingestion import ingest_conversations
+from app.services.export import (
+    EXPORT_FORMATS,
+    NDJSON_FORMAT,
+    PARQUET_FORMAT,
+    export_arrow,
+    export_ndjson,
+    load_pyarrow
+)
+from app.services.ndjson_import import ImportLineTooLong, gunzip_chunks, import_ndjson, iter_ndjson_lines
+from app.services.vector_index import vector_indexes
 
 router = APIRouter()
 
 
-def _resolve_agent_id(db: Session, raw_agent_id: UUID | str) -> UUID:
-    if isinstance(raw_agent_id, UUID):
-        return raw_agent_id
-
-    # Extension adapters often send agent name keys (e.g., "chatgpt")
-    agent = db.query(Agent).filter(Agent.name == raw_agent_id).first()
-    if agent:
-        return agent.id
-
-    # Fallback: create an agent entry dynamically for unknown source keys
-    display_name = str(raw_agent_id).replace("_", " ").replace("-", " ").title()
-    agent = Agent(name=str(raw_agent_id), display_name=display_name, metadata={})
-    db.add(agent)
-    db.flush()
-    return agent.id
+async def _load_conversation_with_messages(db: AsyncSession, conversation_id: UUID) -> Conversation:
+    """Reload a conversation with its messages eagerly loaded for serialization"""
+    result = await db.execute(
+        select(Conversation)
+        .where(Conversation.id == conversation_id)
+        .options(selectinload(Conversation.messages))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
 
 @router.post("/", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     conversation_data: ConversationCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Create a new conversation with messages
     """
     # Create conversation
-    agent_id = _resolve_agent_id(db, conversation_data.agent_id)
+    raw_agent_id = conversation_data.agent_id
+    agent_ids, created_agent = await agent_registry.resolve(db, [raw_agent_id])
+    agent_id = agent_ids[raw_agent_id if isinstance(raw_agent_id, UUID) else str(raw_agent_id)]
+    if created_agent:
+        # Commit the new agent on its own; the registry already remembers its id
+        await db.commit()
     conversation = Conversation(
         user_id=current_user.id,
         agent_id=agent_id,
@@ -61,7 +85,7 @@ async def create_conversation(
     )
     
     db.add(conversation)
-    db.flush()  # Get conversation ID
+    await db.flush()  # Get conversation ID
     
     # Add messages
     messages = []
@@ -78,9 +102,11 @@ async def create_conversation(
         )
         messages.append(message)
     
-    db.bulk_save_objects(messages)
-    db.commit()
-    db.refresh(conversation)
+    db.add_all(messages)
+    await db.commit()
+    await response_cache.invalidate(user_namespace(current_user.id))
+    if created_agent:
+        await response_cache.invalidate(AGENTS_NAMESPACE)
     
     # Trigger background embedding generation
     # Trigger background embedding generation
@@ -88,137 +114,242 @@ async def create_conversation(
     background_tasks.add_task(run_sync_embeddings, str(conversation.id))
     
     # Load messages for response
-    conversation.messages = db.query(Message).filter(
-        Message.conversation_id == conversation.id
-    ).order_by(Message.sequence_number).all()
-    
-    return conversation
+    return await _load_conversation_with_messages(db, conversation.id)
 
 @router.post("/batch", response_model=ConversationBatchResponse)
 async def batch_create_conversations(
     batch_data: ConversationBatchCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Batch create conversations (for extension sync)
-    Deduplicates based on external_id
+    Deduplicates based on external_id; set-based, see services.ingestion
     """
+    result = await ingest_conversations(db, current_user.id, batch_data.conversations)
+    processed_ids = result["conversation_ids"]
+    
+    # Embed every conversation that gained messages, in one background pass
+    if result["embed_conversation_ids"]:
+        background_tasks.add_task(
+            run_sync_embeddings_batch,
+            [str(cid) for cid in result["embed_conversation_ids"]]
+        )
+    
+    # Load all processed conversations with their messages in one pass
     created_conversations = []
-    created_count = 0
-    updated_count = 0
-    failed_count = 0
+    if processed_ids:
+        loaded = await db.execute(
+            select(Conversation)
+            .where(Conversation.id.in_(processed_ids))
+            .options(selectinload(Conversation.messages))
+            .execution_options(populate_existing=True)
+        )
+        by_id = {c.id: c for c in loaded.scalars().all()}
+        created_conversations = [by_id[cid] for cid in processed_ids if cid in by_id]
     
-    for conv_data in batch_data.conversations:
+    return ConversationBatchResponse(
+        created=result["created"],
+        updated=result["updated"],
+        failed=result["failed"],
+        conversations=created_conversations,
+        errors=result["errors"]
+    )
+
+class _RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body is produced while the request body is
+    still being read. The stock disconnect listener consumes receive() and
+    would steal request chunks; a disconnect surfaces from request.stream()
+    as ClientDisconnect instead.
+    """
+
+    async def listen_for_disconnect(self, receive) -> None:
+        await anyio.sleep_forever()
+
+@router.post("/import")
+async def import_conversations(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming bulk import: one ConversationCreate JSON object per line
+    (application/x-ndjson, optionally Content-Encoding: gzip)
+
+    The body is read incrementally and ingested in chunks through the bulk
+    write path, so memory stays flat regardless of upload size. The response
+    is NDJSON too: a "progress" event per chunk with running totals and that
+    chunk's errors by line number, then a final "done" event. Embeddings are
+    queued per chunk.
+    """
+    user_id = current_user.id
+    deferred_embeddings: List[str] = []
+
+    def queue_embeddings(conversation_ids):
+        ids = [str(cid) for cid in conversation_ids]
         try:
-            # Check if conversation already exists
-            agent_id = _resolve_agent_id(db, conv_data.agent_id)
-            existing = None
-            if conv_data.external_id:
-                existing = db.query(Conversation).filter(
-                    Conversation.user_id == current_user.id,
-                    Conversation.agent_id == agent_id,
-                    Conversation.external_id == conv_data.external_id
-                ).first()
-            
-            if existing:
-                # Update existing conversation
-                existing.title = conv_data.title or existing.title
-                existing.project_id = conv_data.project_id or existing.project_id
-                existing.metadata = {**existing.metadata, **(conv_data.metadata or {})}
-                
-                # Check for new messages
-                existing_msg_count = db.query(Message).filter(
-                    Message.conversation_id == existing.id
-                ).count()
-                
-                if len(conv_data.messages) > existing_msg_count:
-                    # Add new messages
-                    for msg_data in conv_data.messages[existing_msg_count:]:
-                        message = Message(
-                            conversation_id=existing.id,
-                            role=msg_data.role,
-                            content=msg_data.content,
-                            sequence_number=msg_data.sequence_number,
-                            external_id=msg_data.external_id,
-                            model=msg_data.model,
-                            tokens=msg_data.tokens,
-                            metadata=msg_data.metadata or {}
-                        )
-                        db.add(message)
-                    
-                    existing.message_count = len(conv_data.messages)
-                
-                db.commit()
-                db.refresh(existing)
-                created_conversations.append(existing)
-                updated_count += 1
-                
+            executors.get(EMBEDDING_POOL).submit(run_sync_embeddings_batch, ids)
+        except HTTPException:
+            # Pool saturated: embed after the import finishes
+            deferred_embeddings.extend(ids)
+
+    async def events():
+        chunks = request.stream()
+        if request.headers.get("content-encoding", "").lower() in ("gzip", "deflate"):
+            chunks = gunzip_chunks(chunks)
+        lines = iter_ndjson_lines(chunks, settings.IMPORT_MAX_LINE_BYTES)
+        async with AsyncSessionLocal() as db:
+            try:
+                async for event in import_ndjson(db, user_id, lines, queue_embeddings):
+                    yield json.dumps(event, default=str) + "\n"
+            except (ImportLineTooLong, zlib.error) as e:
+                yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+            finally:
+                if deferred_embeddings:
+                    background_tasks.add_task(run_sync_embeddings_batch, list(deferred_embeddings))
+
+    return _RequestStreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        background=background_tasks
+    )
+
+@router.get("/export")
+async def export_conversations(
+    format: str = Query(NDJSON_FORMAT, pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    include_embeddings: bool = False,
+    include_deleted: bool = False,
+    agent_id: Optional[UUID] = None,
+    project_id: Optional[UUID] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the user's whole corpus
+
+    ndjson: one conversation per line with nested messages (importable via
+    /import). arrow / parquet: one row per message; these need pyarrow on
+    the server (501 otherwise). Rows come from a server-side cursor in
+    EXPORT_YIELD_PER batches, so memory and time to first byte do not grow
+    with the size of the history.
+    """
+    filters = {
+        "user_id": current_user.id,
+        "agent_id": agent_id,
+        "project_id": project_id,
+        "include_deleted": include_deleted
+    }
+    if format != NDJSON_FORMAT:
+        load_pyarrow()
+
+    async def body():
+        async with AsyncSessionLocal() as db:
+            if format == NDJSON_FORMAT:
+                chunks = export_ndjson(db, include_embeddings, **filters)
             else:
-                # Create new conversation
-                conversation = Conversation(
-                    user_id=current_user.id,
-                    agent_id=agent_id,
-                    project_id=conv_data.project_id,
-                    external_id=conv_data.external_id,
-                    title=conv_data.title or "Untitled Conversation",
-                    metadata=conv_data.metadata or {},
-                    message_count=len(conv_data.messages)
-                )
-                
-                db.add(conversation)
-                db.flush()
-                
-                # Add messages
-                for msg_data in conv_data.messages:
-                    message = Message(
-                        conversation_id=conversation.id,
-                        role=msg_data.role,
-                        content=msg_data.content,
-                        sequence_number=msg_data.sequence_number,
-                        external_id=msg_data.external_id,
-                        model=msg_data.model,
-                        tokens=msg_data.tokens,
-                        metadata=msg_data.metadata or {}
-                    )
-                    db.add(message)
-                
-                db.commit()
-                db.refresh(conversation)
-                created_conversations.append(conversation)
-                created_count += 1
-                
-                # Trigger embedding generation
-                # Use sync generation for free tier compatibility (run in background task)
-                background_tasks.add_task(run_sync_embeddings, str(conversation.id))
-                
-        except Exception as e:
-            print(f"Failed to process conversation: {e}")
-            failed_count += 1
-            continue
-    
-    return ConversationBatchResponse(
-        created=created_count,
-        updated=updated_count,
-        failed=failed_count,
-        conversations=created_conversations
+                chunks = export_arrow(db, format, include_embeddings, **filters)
+            async for chunk in chunks:
+                yield chunk
+
+    media_types = {
+        NDJSON_FORMAT: "application/x-ndjson",
+        PARQUET_FORMAT: "application/vnd.apache.parquet",
+    }
+    filename = f"conversations-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{format}"
+    return StreamingResponse(
+        body(),
+        media_type=media_types.get(format, "application/vnd.apache.arrow.stream"),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
+def _conversation_etag(conversation, window: tuple) -> str:
+    """Weak ETag for one representation (window and body option) of a conversation"""
+    raw = "|".join(str(part) for part in (
+        conversation.id,
+        conversation.updated_at.isoformat() if conversation.updated_at else "",
+        conversation.message_count,
+        conversation.content_digest,
+        *window
+    ))
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Weak comparison: W/"x" and "x" match
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+class _NotModified(Exception):
+    def __init__(self, headers: dict):
+        self.headers = headers
+
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: UUID,
-    db: Session = Depends(get_db),
+    request: Request,
+    from_sequence: Optional[int] = None,
+    to_sequence: Optional[int] = None,
+    last: Optional[int] = Query(None, ge=1, le=10000),
+    include_content: bool = True,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get conversation by ID with all messages
+    Get conversation by ID with its messages
+
+    from_sequence / to_sequence (inclusive) select a range of messages and
+    last keeps only the latest N of it; include_content=false drops message
+    bodies. The response carries an ETag; send it back as If-None-Match to
+    get 304 Not Modified without any messages being read. Responses are
+    cached per user until the user's next conversation write.
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id,
-        Conversation.is_deleted == False
-    ).first()
+    window = (from_sequence, to_sequence, last, include_content)
+    if_none_match = request.headers.get("if-none-match")
+    
+    async def load() -> CachedResponse:
+        return await _load_conversation_window(db, current_user.id, conversation_id, window, if_none_match)
+    
+    try:
+        entry = await response_cache.get_or_load(
+            user_namespace(current_user.id), f"conversation:{conversation_id}:{window}", load
+        )
+    except _NotModified as not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=not_modified.headers)
+    
+    if _etag_matches(if_none_match, entry.headers.get("ETag", "")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=entry.headers)
+    return entry.to_response()
+
+async def _load_conversation_window(
+    db: AsyncSession,
+    user_id: UUID,
+    conversation_id: UUID,
+    window: tuple,
+    if_none_match: Optional[str]
+) -> CachedResponse:
+    from_sequence, to_sequence, last, include_content = window
+    result = await db.execute(
+        select(
+            Conversation.id,
+            Conversation.user_id,
+            Conversation.agent_id,
+            Conversation.project_id,
+            Conversation.external_id,
+            Conversation.title,
+            Conversation.metadata,
+            Conversation.created_at,
+            Conversation.updated_at,
+            Conversation.message_count,
+            Conversation.content_digest
+        ).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id,
+            Conversation.is_deleted == False
+        )
+    )
+    conversation = result.one_or_none()
     
     if not conversation:
         raise HTTPException(
@@ -226,56 +357,147 @@ async def get_conversation(
             detail="Conversation not found"
         )
     
-    # Load messages
-    conversation.messages = db.query(Message).filter(
-        Message.conversation_id == conversation.id
-    ).order_by(Message.sequence_number).all()
+    etag = _conversation_etag(conversation, window)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        raise _NotModified(cache_headers)
+    
+    columns = [
+        Message.id,
+        Message.conversation_id,
+        Message.role,
+        Message.sequence_number,
+        Message.external_id,
+        Message.model,
+        Message.tokens,
+        Message.metadata,
+        Message.created_at
+    ]
+    if include_content:
+        columns.append(Message.content)
+    query = select(*columns).where(Message.conversation_id == conversation_id)
+    if from_sequence is not None:
+        query = query.where(Message.sequence_number >= from_sequence)
+    if to_sequence is not None:
+        query = query.where(Message.sequence_number <= to_sequence)
     
-    return conversation
+    if last:
+        rows = (await db.execute(query.order_by(Message.sequence_number.desc()).limit(last))).all()
+        rows.reverse()
+    else:
+        rows = (await db.execute(query.order_by(Message.sequence_number))).all()
+    
+    return CachedResponse.from_content(ConversationResponse(
+        id=conversation.id,
+        user_id=conversation.user_id,
+        agent_id=conversation.agent_id,
+        project_id=conversation.project_id,
+        external_id=conversation.external_id,
+        title=conversation.title,
+        metadata=conversation.metadata or {},
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        message_count=conversation.message_count or 0,
+        messages=[MessageResponse(**row._mapping) for row in rows]
+    ), cache_headers)
 
-@router.get("/", response_model=List[ConversationListResponse])
+@router.get("/", response_model=Union[List[ConversationListResponse], ConversationListPage])
 async def list_conversations(
     project_id: Optional[UUID] = None,
     agent_id: Optional[UUID] = None,
-    limit: int = 50,
-    offset: int = 0,
-    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    paged: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    List conversations with filtering
+    List conversations with filtering, newest first
+    
+    With paged=true the response is {"items": [...], "next_cursor": ...};
+    pass next_cursor back as cursor for the next page. Keyset pages cost
+    the same at any depth. Without it the response stays a plain list and
+    the cursor is only in the X-Next-Cursor header. offset still works but
+    scans and discards every earlier row.
     """
-    query = db.query(Conversation).filter(
-        Conversation.user_id == current_user.id,
+    async def load() -> CachedResponse:
+        return await _load_conversation_page(
+            db, current_user.id, project_id, agent_id, limit, offset, cursor, paged
+        )
+    
+    entry = await response_cache.get_or_load(
+        user_namespace(current_user.id),
+        f"list:{project_id}:{agent_id}:{limit}:{offset}:{cursor}:{paged}",
+        load
+    )
+    return entry.to_response()
+
+async def _load_conversation_page(
+    db: AsyncSession,
+    user_id: UUID,
+    project_id: Optional[UUID],
+    agent_id: Optional[UUID],
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+    paged: bool = False
+) -> CachedResponse:
+    query = select(Conversation).where(
+        Conversation.user_id == user_id,
         Conversation.is_deleted == False
     )
     
     if project_id:
-        query = query.filter(Conversation.project_id == project_id)
+        query = query.where(Conversation.project_id == project_id)
     
     if agent_id:
-        query = query.filter(Conversation.agent_id == agent_id)
+        query = query.where(Conversation.agent_id == agent_id)
+    
+    if cursor:
+        position = decode_cursor(cursor, created_at=datetime.fromisoformat, id=UUID)
+        query = query.where(
+            tuple_(Conversation.created_at, Conversation.id)
+            < tuple_(position["created_at"], position["id"])
+        )
+    elif offset:
+        query = query.offset(offset)
+    
+    result = await db.execute(
+        query.order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(limit)
+    )
+    conversations = result.scalars().all()
     
-    conversations = query.order_by(
-        Conversation.created_at.desc()
-    ).limit(limit).offset(offset).all()
+    next_cursor = None
+    headers = {}
+    if len(conversations) == limit:
+        last = conversations[-1]
+        next_cursor = encode_cursor({
+            "created_at": last.created_at.isoformat(),
+            "id": str(last.id)
+        })
+        headers["X-Next-Cursor"] = next_cursor
     
-    return conversations
+    items = [ConversationListResponse.model_validate(c) for c in conversations]
+    if paged:
+        return CachedResponse.from_content(ConversationListPage(items=items, next_cursor=next_cursor), headers)
+    return CachedResponse.from_content(items, headers)
 
 @router.put("/{conversation_id}", response_model=ConversationResponse)
 async def update_conversation(
     conversation_id: UUID,
     update_data: ConversationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Update conversation
     """
-    conversation = db.query(Conversation).filter(
+    result = await db.execute(select(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
-    ).first()
+    ))
+    conversation = result.scalar_one_or_none()
     
     if not conversation:
         raise HTTPException(
@@ -284,6 +506,9 @@ async def update_conversation(
         )
     
     # Update fields
+    project_changed = (
+        update_data.project_id is not None and update_data.project_id != conversation.project_id
+    )
     if update_data.title is not None:
         conversation.title = update_data.title
     if update_data.project_id is not None:
@@ -291,25 +516,30 @@ async def update_conversation(
     if update_data.is_archived is not None:
         conversation.is_archived = update_data.is_archived
     
-    db.commit()
-    db.refresh(conversation)
+    await db.commit()
+    await response_cache.invalidate(user_namespace(current_user.id))
+    if project_changed:
+        # Index and snapshot rows carry the project they were loaded under
+        vector_indexes.invalidate(current_user.id)
+        embedding_snapshots.mark_rebuild([current_user.id])
     
-    return conversation
+    return await _load_conversation_with_messages(db, conversation.id)
 
 @router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_conversation(
     conversation_id: UUID,
     hard_delete: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete conversation (soft delete by default)
     """
-    conversation = db.query(Conversation).filter(
+    result = await db.execute(select(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
-    ).first()
+    ))
+    conversation = result.scalar_one_or_none()
     
     if not conversation:
         raise HTTPException(
@@ -318,12 +548,14 @@ async def delete_conversation(
         )
     
     if hard_delete:
-        db.delete(conversation)
+        await db.delete(conversation)
     else:
-        from datetime import datetime
         conversation.is_deleted = True
         conversation.deleted_at = datetime.utcnow()
     
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate(user_namespace(current_user.id))
+    vector_indexes.invalidate(current_user.id)
+    embedding_snapshots.mark_rebuild([current_user.id])
     
     return None
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-import numpy as np
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from uuid import UUID
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.pagination import encode_cursor, decode_cursor
 from app.core.auth import get_current_user
 from app.models.user import User
 from app.models.conversation import Conversation, Message
@@ -12,40 +15,102 @@ from app.schemas.search import (
     SearchRequest,
     SearchResponse,
     SearchResult,
+    SimilarConversationsRequest,
+    SimilarConversationResult,
+    SimilarConversationsResponse,
     ConversationCompareRequest,
     ConversationCompareResponse,
     TurnSimilarityResult,
 )
-from app.services.embedding_service import EmbeddingService
+from app.core.executors import executors, INFERENCE_POOL
+from app.services.embedding_service import EmbeddingService, encode_query, search_memory, search_pgvector, MEMORY_BACKEND
+from app.services.encoder_backends import embedding_version
+from app.services.alignment import align_turns, embedding_matrix, paired_similarities
 
 router = APIRouter()
 
 
-def _cosine_similarity(left: list[float], right: list[float]) -> float:
-    left_arr = np.array(left, dtype=np.float32)
-    right_arr = np.array(right, dtype=np.float32)
-    left_norm = np.linalg.norm(left_arr)
-    right_norm = np.linalg.norm(right_arr)
-    if left_norm == 0.0 or right_norm == 0.0:
-        return 0.0
-    return float(np.dot(left_arr, right_arr) / (left_norm * right_norm))
+def _resolve_ef_search(request: SearchRequest) -> Optional[int]:
+    """HNSW ef_search from the request, or from its named search tier"""
+    if request.ef_search is not None:
+        return request.ef_search
+    if request.search_tier is None:
+        return None
+    if request.search_tier not in settings.SEARCH_EF_SEARCH_TIERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown search_tier, expected one of {sorted(settings.SEARCH_EF_SEARCH_TIERS)}"
+        )
+    return settings.SEARCH_EF_SEARCH_TIERS[request.search_tier]
+
+def _keyword_query(request: SearchRequest, user_id, limit: int, after: Optional[dict] = None):
+    """
+    Ranked full-text query over the stored messages.search_vector
+    (message content plus the conversation title at a higher weight),
+    ordered by rank then message id; after is the previous page's last
+    (rank, id) keyset position
+    """
+    search_query = func.plainto_tsquery('english', request.query)
+    rank = func.ts_rank_cd(Message.search_vector, search_query)
+    
+    query = select(
+        rank.label("rank"),
+        Message.id.label("message_id"),
+        Message.content,
+        Message.role,
+        Conversation.id.label("conversation_id"),
+        Conversation.title.label("conversation_title"),
+        func.coalesce(Conversation.metadata['source'].astext, 'unknown').label("agent_name")
+    ).join(
+        Conversation, Message.conversation_id == Conversation.id
+    ).where(
+        Conversation.user_id == user_id,
+        Conversation.is_deleted == False,
+        Message.search_vector.op('@@')(search_query)
+    )
+    
+    # Apply filters
+    if request.project_ids:
+        query = query.where(Conversation.project_id.in_(request.project_ids))
+    
+    if request.agent_ids:
+        query = query.where(Conversation.agent_id.in_(request.agent_ids))
+    
+    if after is not None:
+        query = query.where(or_(
+            rank < after["rank"],
+            and_(rank == after["rank"], Message.id > after["id"])
+        ))
+    
+    return query.order_by(rank.desc(), Message.id).limit(limit)
 
 @router.post("/semantic", response_model=SearchResponse)
 async def semantic_search(
     request: SearchRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Semantic search using vector embeddings
     """
-    embedding_service = EmbeddingService(db)
-    
-    results = embedding_service.search_similar(
-        query=request.query,
-        user_id=str(current_user.id),
+    user_id = str(current_user.id)
+    ef_search = _resolve_ef_search(request)
+    after = None
+    if request.cursor:
+        position = decode_cursor(request.cursor, similarity=float, id=UUID)
+        after = (position["similarity"], str(position["id"]))
+    query_vector = await executors.run(INFERENCE_POOL, encode_query, request.query)
+    search = search_memory if settings.SEARCH_BACKEND == MEMORY_BACKEND else search_pgvector
+    results = await search(
+        db,
+        user_id,
+        query_vector,
         limit=request.limit,
-        threshold=request.similarity_threshold
+        threshold=request.similarity_threshold,
+        project_ids=request.project_ids,
+        agent_ids=request.agent_ids,
+        ef_search=ef_search,
+        after=after
     )
     
     search_results = [
@@ -61,55 +126,37 @@ async def semantic_search(
         for r in results
     ]
     
+    next_cursor = None
+    if len(results) == request.limit:
+        next_cursor = encode_cursor({
+            "similarity": results[-1]["similarity"],
+            "id": results[-1]["message_id"]
+        })
+    
     return SearchResponse(
         query=request.query,
         results=search_results,
         total=len(search_results),
-        search_type="semantic"
+        search_type="semantic",
+        next_cursor=next_cursor
     )
 
 @router.post("/keyword", response_model=SearchResponse)
 async def keyword_search(
     request: SearchRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Full-text keyword search using PostgreSQL FTS
+    Full-text keyword search using PostgreSQL FTS, best matches first
     """
-    from app.models.conversation import Message, Conversation
-    from app.models.user import User as UserModel
-    from sqlalchemy import func, or_
-    
-    # Build query
-    query = db.query(
-        Message.id.label("message_id"),
-        Message.content,
-        Message.role,
-        Conversation.id.label("conversation_id"),
-        Conversation.title.label("conversation_title"),
-        func.coalesce(Conversation.metadata['source'].astext, 'unknown').label("agent_name")
-    ).join(
-        Conversation, Message.conversation_id == Conversation.id
-    ).filter(
-        Conversation.user_id == current_user.id,
-        Conversation.is_deleted == False
-    )
-    
-    # Add full-text search
-    search_vector = func.to_tsvector('english', Message.content)
-    search_query = func.plainto_tsquery('english', request.query)
-    query = query.filter(search_vector.op('@@')(search_query))
-    
-    # Apply filters
-    if request.project_ids:
-        query = query.filter(Conversation.project_id.in_(request.project_ids))
-    
-    if request.agent_ids:
-        query = query.filter(Conversation.agent_id.in_(request.agent_ids))
+    after = None
+    if request.cursor:
+        after = decode_cursor(request.cursor, rank=float, id=UUID)
+    query = _keyword_query(request, current_user.id, request.limit, after)
     
     # Execute
-    results = query.limit(request.limit).all()
+    results = (await db.execute(query)).all()
     
     search_results = [
         SearchResult(
@@ -124,91 +171,47 @@ async def keyword_search(
         for r in results
     ]
     
+    next_cursor = None
+    if len(results) == request.limit:
+        next_cursor = encode_cursor({"rank": results[-1].rank, "id": str(results[-1].message_id)})
+    
     return SearchResponse(
         query=request.query,
         results=search_results,
         total=len(search_results),
-        search_type="keyword"
+        search_type="keyword",
+        next_cursor=next_cursor
     )
 
 @router.post("/hybrid", response_model=SearchResponse)
 async def hybrid_search(
     request: SearchRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Hybrid search combining semantic + keyword with RRF
+    Hybrid search combining semantic + keyword with RRF,
+    ranked and fused in the database in one round trip
     """
-    # Get semantic results
-    embedding_service = EmbeddingService(db)
-    semantic_results = embedding_service.search_similar(
-        query=request.query,
-        user_id=str(current_user.id),
-        limit=request.limit * 2,  # Get more for merging
-        threshold=request.similarity_threshold
-    )
-    
-    # Get keyword results
-    from app.models.conversation import Message, Conversation
-    from sqlalchemy import func
-    
-    query = db.query(
-        Message.id.label("message_id"),
-        Message.content,
-        Message.role,
-        Conversation.id.label("conversation_id"),
-        Conversation.title.label("conversation_title"),
-        func.coalesce(Conversation.metadata['source'].astext, 'unknown').label("agent_name")
-    ).join(
-        Conversation, Message.conversation_id == Conversation.id
-    ).filter(
-        Conversation.user_id == current_user.id,
-        Conversation.is_deleted == False
+    user_id = str(current_user.id)
+    ef_search = _resolve_ef_search(request)
+    query_vector = await executors.run(INFERENCE_POOL, encode_query, request.query)
+    results = await db.run_sync(
+        lambda session: EmbeddingService(session).search_hybrid(
+            query=request.query,
+            user_id=user_id,
+            limit=request.limit,
+            threshold=request.similarity_threshold,
+            rrf_k=request.rrf_k,
+            candidate_depth=request.candidate_depth,
+            project_ids=request.project_ids,
+            agent_ids=request.agent_ids,
+            query_vector=query_vector,
+            ef_search=ef_search
+        )
     )
     
-    search_vector = func.to_tsvector('english', Message.content)
-    search_query = func.plainto_tsquery('english', request.query)
-    query = query.filter(search_vector.op('@@')(search_query))
-    
-    keyword_results = query.limit(request.limit * 2).all()
-    
-    # Reciprocal Rank Fusion (RRF)
-    k = 60  # RRF constant
-    scores = {}
-    
-    # Score semantic results
-    for rank, result in enumerate(semantic_results, 1):
-        msg_id = result["message_id"]
-        scores[msg_id] = scores.get(msg_id, 0) + 1 / (k + rank)
-    
-    # Score keyword results
-    for rank, result in enumerate(keyword_results, 1):
-        msg_id = str(result.message_id)
-        scores[msg_id] = scores.get(msg_id, 0) + 1 / (k + rank)
-    
-    # Sort by combined score
-    sorted_ids = sorted(scores.keys(), key=lambda x: scores[x], reverse=True)[:request.limit]
-    
-    # Build final results
-    result_map = {r["message_id"]: r for r in semantic_results}
-    for r in keyword_results:
-        if str(r.message_id) not in result_map:
-            result_map[str(r.message_id)] = {
-                "message_id": str(r.message_id),
-                "content": r.content,
-                "role": r.role,
-                "conversation_id": str(r.conversation_id),
-                "conversation_title": r.conversation_title,
-                "agent_name": r.agent_name,
-                "similarity": None
-            }
-    
-    final_results = [
-        SearchResult(**result_map[msg_id])
-        for msg_id in sorted_ids
-        if msg_id in result_map
-    ]
+    final_results = [SearchResult(**r) for r in results]
     
     return SearchResponse(
         query=request.query,
@@ -218,22 +221,65 @@ async def hybrid_search(
     )
 
 
+@router.post("/similar-conversations", response_model=SimilarConversationsResponse)
+async def similar_conversations(
+    request: SimilarConversationsRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    "More like this": conversations nearest to the given one by their
+    conversation-level embedding
+    """
+    exists = (await db.execute(select(Conversation.id).where(
+        Conversation.id == request.conversation_id,
+        Conversation.user_id == current_user.id,
+        Conversation.is_deleted == False,
+    ))).scalar_one_or_none()
+    if exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    user_id = str(current_user.id)
+    results = await db.run_sync(
+        lambda session: EmbeddingService(session).search_similar_conversations(
+            conversation_id=request.conversation_id,
+            user_id=user_id,
+            limit=request.limit,
+            threshold=request.similarity_threshold,
+            project_ids=request.project_ids,
+            agent_ids=request.agent_ids,
+            ef_search=request.ef_search
+        )
+    )
+    
+    similar = [SimilarConversationResult(**r) for r in results]
+    
+    return SimilarConversationsResponse(
+        conversation_id=request.conversation_id,
+        results=similar,
+        total=len(similar)
+    )
+
+
 @router.post("/compare/conversations", response_model=ConversationCompareResponse)
 async def compare_conversations(
     request: ConversationCompareRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    left = db.query(Conversation).filter(
+    left = (await db.execute(select(Conversation).where(
         Conversation.id == request.left_conversation_id,
         Conversation.user_id == current_user.id,
         Conversation.is_deleted == False,
-    ).first()
-    right = db.query(Conversation).filter(
+    ))).scalar_one_or_none()
+    right = (await db.execute(select(Conversation).where(
         Conversation.id == request.right_conversation_id,
         Conversation.user_id == current_user.id,
         Conversation.is_deleted == False,
-    ).first()
+    ))).scalar_one_or_none()
 
     if not left or not right:
         raise HTTPException(
@@ -241,20 +287,28 @@ async def compare_conversations(
             detail="One or both conversations were not found",
         )
 
-    max_turns = max(1, min(int(request.max_turns), 100))
+    max_turns_cap = settings.COMPARE_ALIGN_MAX_TURNS if request.mode == "align" else 100
+    max_turns = max(1, min(int(request.max_turns), max_turns_cap))
 
-    left_messages = db.query(Message).filter(
-        Message.conversation_id == left.id,
-        Message.role == "assistant",
-    ).order_by(Message.sequence_number.asc()).limit(max_turns).all()
+    # Previews only; long conversations would otherwise pull every full text
+    def assistant_turns(conversation_id):
+        return select(
+            Message.id,
+            func.substr(Message.content, 1, 220).label("preview")
+        ).where(
+            Message.conversation_id == conversation_id,
+            Message.role == "assistant",
+        ).order_by(Message.sequence_number.asc()).limit(max_turns)
 
-    right_messages = db.query(Message).filter(
-        Message.conversation_id == right.id,
-        Message.role == "assistant",
-    ).order_by(Message.sequence_number.asc()).limit(max_turns).all()
+    left_messages = (await db.execute(assistant_turns(left.id))).all()
+    right_messages = (await db.execute(assistant_turns(right.id))).all()
 
-    turns = min(len(left_messages), len(right_messages))
-    if turns == 0:
+    if request.mode == "index":
+        turns = min(len(left_messages), len(right_messages))
+        left_messages = left_messages[:turns]
+        right_messages = right_messages[:turns]
+
+    if not left_messages and not right_messages:
         return ConversationCompareResponse(
             left_conversation_id=left.id,
             right_conversation_id=right.id,
@@ -262,37 +316,65 @@ async def compare_conversations(
             comparable_turns=0,
             average_similarity=None,
             turn_results=[],
+            mode=request.mode,
         )
 
-    message_ids = [m.id for m in left_messages[:turns]] + [m.id for m in right_messages[:turns]]
-    embedding_rows = db.query(Embedding).filter(Embedding.message_id.in_(message_ids)).all()
+    message_ids = [m.id for m in left_messages] + [m.id for m in right_messages]
+    embedding_rows = (await db.execute(
+        select(Embedding.message_id, Embedding.embedding).where(
+            Embedding.message_id.in_(message_ids),
+            Embedding.model_name == settings.EMBEDDING_MODEL,
+            Embedding.model_version == embedding_version(),
+        )
+    )).all()
     embedding_by_message = {row.message_id: row.embedding for row in embedding_rows}
 
+    left_matrix, left_has = embedding_matrix(
+        [embedding_by_message.get(m.id) for m in left_messages], settings.EMBEDDING_DIMENSION
+    )
+    right_matrix, right_has = embedding_matrix(
+        [embedding_by_message.get(m.id) for m in right_messages], settings.EMBEDDING_DIMENSION
+    )
+
+    if request.mode == "align":
+        pairs = await executors.run(
+            INFERENCE_POOL, align_turns, left_matrix, right_matrix, request.gap_penalty
+        )
+    else:
+        similarities = paired_similarities(left_matrix, right_matrix)
+        pairs = [(idx, idx, float(similarities[idx])) for idx in range(turns)]
+
     turn_results: list[TurnSimilarityResult] = []
     comparable_scores: list[float] = []
-    for idx in range(turns):
-        left_msg = left_messages[idx]
-        right_msg = right_messages[idx]
-        left_embedding = embedding_by_message.get(left_msg.id)
-        right_embedding = embedding_by_message.get(right_msg.id)
+    for turn_index, (left_idx, right_idx, similarity) in enumerate(pairs, start=1):
+        left_msg = left_messages[left_idx] if left_idx is not None else None
+        right_msg = right_messages[right_idx] if right_idx is not None else None
+        has_left = left_idx is not None and bool(left_has[left_idx])
+        has_right = right_idx is not None and bool(right_has[right_idx])
 
-        has_left = left_embedding is not None
-        has_right = right_embedding is not None
-        similarity = None
         if has_left and has_right:
-            similarity = _cosine_similarity(left_embedding, right_embedding)
             comparable_scores.append(similarity)
+        else:
+            similarity = None
+
+        if left_msg is None:
+            operation = "inserted"
+        elif right_msg is None:
+            operation = "skipped"
+        else:
+            operation = "match"
 
         turn_results.append(
             TurnSimilarityResult(
-                turn_index=idx + 1,
-                left_message_id=left_msg.id,
-                right_message_id=right_msg.id,
-                left_preview=left_msg.content[:220],
-                right_preview=right_msg.content[:220],
+                turn_index=turn_index,
+                left_message_id=left_msg.id if left_msg else None,
+                right_message_id=right_msg.id if right_msg else None,
+                left_preview=left_msg.preview if left_msg else "",
+                right_preview=right_msg.preview if right_msg else "",
                 similarity=similarity,
                 has_left_embedding=has_left,
                 has_right_embedding=has_right,
+                operation=operation,
             )
         )
 
@@ -303,8 +385,11 @@ async def compare_conversations(
     return ConversationCompareResponse(
         left_conversation_id=left.id,
         right_conversation_id=right.id,
-        compared_turns=turns,
+        compared_turns=len(turn_results),
         comparable_turns=len(comparable_scores),
         average_similarity=avg_similarity,
         turn_results=turn_results,
+        mode=request.mode,
+        inserted_turns=sum(1 for t in turn_results if t.operation == "inserted"),
+        skipped_turns=sum(1 for t in turn_results if t.operation == "skipped"),
     )
@@ -0,0 +1,165 @@
+from fastapi import APIRouter, Depends, Query, BackgroundTasks
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from uuid import UUID
+from datetime import datetime
+
+from app.core.database import get_async_db
+from app.core.auth import get_current_user
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.user import User
+from app.models.conversation import Conversation
+from app.schemas.sync import (
+    SyncManifestEntry,
+    SyncManifestResponse,
+    SyncDeltaRequest,
+    SyncDeltaResult,
+    SyncDeltaResponse
+)
+from app.services.embedding_snapshots import embedding_snapshots
+from app.services.ingestion import format_digest, ingest_conversations
+from app.services.vector_index import vector_indexes
+from app.tasks.embedding_tasks import run_sync_embeddings_batch
+
+router = APIRouter()
+
+@router.get("/manifest", response_model=SyncManifestResponse)
+async def sync_manifest(
+    agent_id: Optional[UUID] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Per-conversation sync state, oldest change first
+
+    For each conversation: last sequence number and content digest, the XOR
+    of sha256("<sequence_number>:<role>:<content>")[:8] over its messages.
+    The client compares them with its local copy and sends only the
+    conversations (and messages) that differ to POST /sync/delta. Reads only
+    conversation rows.
+
+    next_cursor pages through one pass and is not a sync checkpoint, and
+    neither is the last updated_at seen: updated_at is the writing
+    transaction's start time, so a long write can commit after later
+    timestamps were already listed. For incremental passes, set since to
+    the previous pass's start minus a margin longer than the longest write
+    (a few minutes) and let the digests skip what is unchanged.
+    """
+    query = select(
+        Conversation.id,
+        Conversation.agent_id,
+        Conversation.external_id,
+        Conversation.last_sequence_number,
+        Conversation.message_count,
+        Conversation.content_digest,
+        Conversation.updated_at,
+        Conversation.is_deleted
+    ).where(Conversation.user_id == current_user.id)
+
+    if agent_id:
+        query = query.where(Conversation.agent_id == agent_id)
+
+    if since:
+        query = query.where(Conversation.updated_at > since)
+
+    if cursor:
+        position = decode_cursor(cursor, updated_at=datetime.fromisoformat, id=UUID)
+        query = query.where(
+            tuple_(Conversation.updated_at, Conversation.id)
+            > tuple_(position["updated_at"], position["id"])
+        )
+
+    result = await db.execute(
+        query.order_by(Conversation.updated_at, Conversation.id).limit(limit)
+    )
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor({
+            "updated_at": last.updated_at.isoformat(),
+            "id": str(last.id)
+        })
+
+    return SyncManifestResponse(
+        conversations=[
+            SyncManifestEntry(
+                conversation_id=row.id,
+                agent_id=row.agent_id,
+                external_id=row.external_id,
+                last_sequence_number=row.last_sequence_number,
+                message_count=row.message_count or 0,
+                content_digest=format_digest(row.content_digest),
+                updated_at=row.updated_at,
+                is_deleted=bool(row.is_deleted)
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor
+    )
+
+@router.post("/delta", response_model=SyncDeltaResponse)
+async def sync_delta(
+    delta: SyncDeltaRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply new or changed messages only (append/patch sync)
+
+    Messages are upserted by sequence number: new ones are appended, stored
+    ones are replaced when role or content changed. Send base_digest from
+    the manifest to have a conversation rejected as a conflict, instead of
+    patched, if the server copy changed since the client last looked.
+    """
+    result = await ingest_conversations(db, current_user.id, delta.conversations, patch=True)
+
+    if result["edited_conversation_ids"]:
+        vector_indexes.invalidate(current_user.id)
+        embedding_snapshots.mark_rebuild([current_user.id])
+
+    if result["embed_conversation_ids"]:
+        background_tasks.add_task(
+            run_sync_embeddings_batch,
+            [str(cid) for cid in result["embed_conversation_ids"]],
+            [str(cid) for cid in result["edited_conversation_ids"]]
+        )
+
+    states = []
+    if result["conversation_ids"]:
+        rows = await db.execute(
+            select(
+                Conversation.id,
+                Conversation.external_id,
+                Conversation.last_sequence_number,
+                Conversation.message_count,
+                Conversation.content_digest
+            ).where(Conversation.id.in_(result["conversation_ids"]))
+        )
+        by_id = {row.id: row for row in rows.all()}
+        states = [
+            SyncDeltaResult(
+                conversation_id=row.id,
+                external_id=row.external_id,
+                last_sequence_number=row.last_sequence_number,
+                message_count=row.message_count or 0,
+                content_digest=format_digest(row.content_digest)
+            )
+            for row in (by_id.get(cid) for cid in result["conversation_ids"])
+            if row is not None
+        ]
+
+    return SyncDeltaResponse(
+        created=result["created"],
+        updated=result["updated"],
+        failed=result["failed"],
+        conversations=states,
+        conflicts=result["conflicts"],
+        errors=result["errors"]
+    )
@@ -1,13 +1,18 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Set
+from uuid import UUID
+import asyncio
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 
+from app.core.cache import principal_cache
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.user import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -47,11 +52,77 @@ def decode_access_token(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+# User columns kept in the principal cache; never the password hash
+PRINCIPAL_FIELDS = ("id", "email", "full_name", "is_active", "created_at")
+_PENDING_INVALIDATIONS = "principal_invalidations"
+
+def _principal_fields(user: User) -> Dict[str, Any]:
+    return {name: getattr(user, name) for name in PRINCIPAL_FIELDS}
+
+def _principal_user(fields: Dict[str, Any]) -> User:
+    """Transient (session-less) User rebuilt from cached fields"""
+    return User(
+        id=UUID(fields["id"]),
+        email=fields["email"],
+        full_name=fields["full_name"],
+        is_active=fields["is_active"],
+        created_at=datetime.fromisoformat(fields["created_at"]) if fields["created_at"] else None
+    )
+
+def _queue_principal_invalidation(target: User):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_INVALIDATIONS, set()).add(str(target.id))
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in PRINCIPAL_FIELDS):
+        _queue_principal_invalidation(target)
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    _queue_principal_invalidation(target)
+
+# Running evictions, referenced until done so they are not garbage collected
+_eviction_tasks: Set[asyncio.Task] = set()
+
+# Evict only once the change is committed; a request that read the old row
+# earlier and fills the cache afterwards is caught by the generation check
+# in PrincipalCache.set
+@event.listens_for(Session, "after_commit")
+def _flush_principal_invalidations(session):
+    subjects = session.info.pop(_PENDING_INVALIDATIONS, None)
+    if not subjects:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Sync session in a worker thread or Celery: blocking is fine here
+        principal_cache.invalidate_blocking(subjects)
+        return
+    # AsyncSession commits run on the event loop thread; evict with the
+    # async client once the commit returns instead of blocking the loop
+    task = loop.create_task(principal_cache.invalidate(subjects))
+    _eviction_tasks.add(task)
+    task.add_done_callback(_eviction_tasks.discard)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_principal_invalidations(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(_PENDING_INVALIDATIONS, None)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
-    """Get current authenticated user"""
+    """
+    Get current authenticated user
+
+    Active users are cached by token subject for PRINCIPAL_CACHE_TTL_SECONDS,
+    so most requests skip the users lookup; the returned User is then
+    transient. Deactivation and deletion through the ORM evict the entry.
+    """
     token = credentials.credentials
     payload = decode_access_token(token)
     
@@ -62,7 +133,14 @@ async def get_current_user(
             detail="Could not validate credentials"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    cached = await principal_cache.get(user_id)
+    if cached is not None:
+        return _principal_user(cached)
+    
+    # Read before the user row, so an eviction that lands meanwhile is seen
+    generation = await principal_cache.generation(user_id)
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -75,4 +153,5 @@ async def get_current_user(
             detail="Inactive user"
         )
     
+    await principal_cache.set(user_id, _principal_fields(user), generation)
     return user
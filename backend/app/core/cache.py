@@ -0,0 +1,449 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import json
+import struct
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.core.redis import get_async_redis, get_redis, redis_breaker
+
+logger = logging.getLogger(__name__)
+
+AGENTS_NAMESPACE = "agents"
+
+def user_namespace(user_id) -> str:
+    return f"user:{user_id}"
+
+class CacheUnavailable(Exception):
+    """The backend is skipping lookups for now; callers treat it as a miss"""
+
+@dataclass
+class CachedResponse:
+    """Serialized JSON body plus the headers that belong with it"""
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_content(cls, content: Any, headers: Optional[Dict[str, str]] = None) -> "CachedResponse":
+        """Serialize a response model / dict the same way FastAPI would"""
+        return cls(JSONResponse(content=jsonable_encoder(content)).body, dict(headers or {}))
+
+    def to_response(self, status_code: int = 200) -> Response:
+        return Response(
+            content=self.body,
+            status_code=status_code,
+            media_type="application/json",
+            headers=self.headers
+        )
+
+    def dumps(self) -> bytes:
+        header = json.dumps(self.headers, separators=(",", ":")).encode("utf-8")
+        return struct.pack(">I", len(header)) + header + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedResponse":
+        (length,) = struct.unpack(">I", raw[:4])
+        return cls(raw[4 + length:], json.loads(raw[4:4 + length]))
+
+class MemoryCacheBackend:
+    """
+    In-process stand-in for Redis: LRU entries with a TTL, plain counters.
+    Invalidation only reaches this process, so use it for tests and
+    single-worker deployments.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    async def generation(self, namespace: str, ttl: int) -> int:
+        with self._lock:
+            return self._generations.setdefault(namespace, time.time_ns())
+
+    async def bump(self, namespace: str, ttl: int):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, time.time_ns()) + 1
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, raw = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return raw
+
+    async def set(self, key: str, raw: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, raw)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict_blocking(self, keys, namespaces, ttl: int):
+        """Bump namespace generations, then delete keys"""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, time.time_ns()) + 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    async def evict(self, keys, namespaces, ttl: int):
+        self.evict_blocking(keys, namespaces, ttl)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+class RedisCacheBackend:
+    """
+    Redis entries with SETEX; generations are plain counters. A missing
+    generation starts at the current time in ns, so after it expires it
+    can never line up with entries written under an earlier value.
+
+    Lookups and fills raise CacheUnavailable while the Redis circuit
+    breaker is open; invalidations are always attempted.
+    """
+
+    name = "redis"
+
+    @staticmethod
+    def _client(optional: bool = True):
+        if optional and redis_breaker.is_open():
+            raise CacheUnavailable("Redis circuit breaker is open")
+        return get_async_redis()
+
+    async def generation(self, namespace: str, ttl: int) -> int:
+        client = self._client()
+        key = f"rc:gen:{namespace}"
+        with redis_breaker.guard():
+            value = await client.get(key)
+            if value is None:
+                await client.set(key, time.time_ns(), nx=True, ex=ttl)
+                value = await client.get(key)
+        return int(value)
+
+    async def bump(self, namespace: str, ttl: int):
+        client = self._client(optional=False)
+        key = f"rc:gen:{namespace}"
+        with redis_breaker.guard():
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        client = self._client()
+        with redis_breaker.guard():
+            return await client.get(key)
+
+    async def set(self, key: str, raw: bytes, ttl: int):
+        client = self._client()
+        with redis_breaker.guard():
+            await client.setex(key, ttl, raw)
+
+    @staticmethod
+    def _queue_evict(pipe, keys, namespaces, ttl: int):
+        for namespace in namespaces:
+            pipe.incr(f"rc:gen:{namespace}")
+            pipe.expire(f"rc:gen:{namespace}", ttl)
+        if keys:
+            pipe.delete(*keys)
+
+    async def evict(self, keys, namespaces, ttl: int):
+        """Bump namespace generations, then delete keys, in one round trip"""
+        client = self._client(optional=False)
+        with redis_breaker.guard():
+            async with client.pipeline(transaction=False) as pipe:
+                self._queue_evict(pipe, list(keys), namespaces, ttl)
+                await pipe.execute()
+
+    def evict_blocking(self, keys, namespaces, ttl: int):
+        """evict() with the sync client, for worker threads without an event loop"""
+        with redis_breaker.guard():
+            with get_redis().pipeline(transaction=False) as pipe:
+                self._queue_evict(pipe, list(keys), namespaces, ttl)
+                pipe.execute()
+
+    def size(self) -> Optional[int]:
+        return None
+
+    def clear(self):
+        pass
+
+class ResponseCache:
+    """
+    Read-through cache for serialized API responses
+
+    Entries live in namespaces (one per user, plus shared ones such as
+    agents) and are keyed by the namespace's current generation. A write
+    invalidates everything a user can read by bumping one counter; stale
+    entries are never looked up again and expire on their own TTL. Redis
+    errors are counted and treated as misses, so the cache never fails a
+    request; while the Redis circuit breaker is open it is bypassed.
+    """
+
+    def __init__(self, backend, ttl_seconds: int, max_entry_bytes: int, enabled: bool = True):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+        self.enabled = enabled
+        # Generations outlive every entry written under them
+        self.generation_ttl = max(ttl_seconds * 10, 24 * 60 * 60)
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.oversized = 0
+        self.bumps = 0
+        self.errors = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def make_key(namespace: str, generation: int, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"rc:{namespace}:{generation}:{digest}"
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: str,
+        load: Callable[[], Awaitable[CachedResponse]]
+    ) -> CachedResponse:
+        """Cached response for key, calling load on a miss. Exceptions from load are not cached."""
+        if not self.enabled:
+            return await load()
+
+        # Read the generation before loading, so a write that lands while we
+        # load bumps past the entry we are about to store
+        cache_key = None
+        try:
+            generation = await self.backend.generation(namespace, self.generation_ttl)
+            cache_key = self.make_key(namespace, generation, key)
+            raw = await self.backend.get(cache_key)
+            if raw is not None:
+                self.hits += 1
+                return CachedResponse.loads(raw)
+        except CacheUnavailable:
+            self.bypassed += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache lookup failed: {e}")
+
+        self.misses += 1
+        entry = await load()
+        if cache_key is None:
+            return entry
+
+        raw = entry.dumps()
+        if len(raw) > self.max_entry_bytes:
+            self.oversized += 1
+            return entry
+        try:
+            await self.backend.set(cache_key, raw, self.ttl_seconds)
+            self.stores += 1
+        except CacheUnavailable:
+            self.bypassed += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache write failed: {e}")
+        return entry
+
+    async def invalidate(self, *namespaces: str):
+        """Bump namespace generations; O(1) per namespace regardless of entries"""
+        if not self.enabled:
+            return
+        for namespace in namespaces:
+            try:
+                await self.backend.bump(namespace, self.generation_ttl)
+                self.bumps += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Response cache invalidation of {namespace} failed: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "entries": self.backend.size(),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "oversized": self.oversized,
+            "invalidations": self.bumps,
+            "errors": self.errors,
+            "bypassed": self.bypassed,
+        }
+
+class PrincipalCache:
+    """
+    Short-TTL cache of authenticated principals keyed by token subject
+
+    Holds the identity fields of active users only, so an inactive or
+    missing user always goes to the database. Entries are evicted after a
+    commit that changes or deletes the user (see app.core.auth); the TTL
+    bounds staleness for changes made outside the ORM.
+
+    An eviction bumps a per-subject generation before deleting the entry. A
+    fill reads the generation before the user is loaded and again after the
+    entry is written, and deletes its entry if the two differ, so a request
+    that loaded the row just before a deactivation committed cannot leave
+    it cached.
+    """
+
+    def __init__(self, backend, ttl_seconds: int, enabled: bool = True):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        # Generations outlive every entry written under them
+        self.generation_ttl = max(ttl_seconds * 10, 60 * 60)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(subject: str) -> str:
+        return f"pc:{subject}"
+
+    @staticmethod
+    def namespace(subject: str) -> str:
+        return f"principal:{subject}"
+
+    async def get(self, subject: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            raw = await self.backend.get(self.make_key(subject))
+        except CacheUnavailable:
+            raw = None
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Principal cache lookup failed: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def generation(self, subject: str) -> Optional[int]:
+        """Read before loading the user; pass to set(). None skips the fill."""
+        if not self.enabled:
+            return None
+        try:
+            return await self.backend.generation(self.namespace(subject), self.generation_ttl)
+        except CacheUnavailable:
+            return None
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Principal cache lookup failed: {e}")
+            return None
+
+    async def set(self, subject: str, principal: Dict[str, Any], generation: Optional[int]):
+        if not self.enabled or generation is None:
+            return
+        key = self.make_key(subject)
+        try:
+            await self.backend.set(
+                key,
+                json.dumps(principal, default=str).encode("utf-8"),
+                self.ttl_seconds
+            )
+            if await self.backend.generation(self.namespace(subject), self.generation_ttl) != generation:
+                self.stale_fills += 1
+                await self.backend.evict([key], (), self.generation_ttl)
+        except CacheUnavailable:
+            pass
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Principal cache write failed: {e}")
+
+    def _eviction(self, subjects):
+        subjects = list(subjects)
+        return (
+            [self.make_key(subject) for subject in subjects],
+            [self.namespace(subject) for subject in subjects]
+        )
+
+    async def invalidate(self, subjects):
+        """Evict cached principals with the async client"""
+        keys, namespaces = self._eviction(subjects)
+        if not self.enabled or not keys:
+            return
+        try:
+            await self.backend.evict(keys, namespaces, self.generation_ttl)
+            self.invalidations += len(keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Principal cache invalidation failed: {e}")
+
+    def invalidate_blocking(self, subjects):
+        """invalidate() for sync sessions in worker threads and Celery"""
+        keys, namespaces = self._eviction(subjects)
+        if not self.enabled or not keys:
+            return
+        try:
+            self.backend.evict_blocking(keys, namespaces, self.generation_ttl)
+            self.invalidations += len(keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Principal cache invalidation failed: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "stale_fills": self.stale_fills,
+            "errors": self.errors,
+        }
+
+def _make_backend():
+    backend = settings.RESPONSE_CACHE_BACKEND
+    if backend == "redis" or (backend == "auto" and settings.REDIS_URL):
+        return RedisCacheBackend()
+    return MemoryCacheBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+response_cache = ResponseCache(
+    _make_backend(),
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    enabled=settings.RESPONSE_CACHE_ENABLED
+)
+
+principal_cache = PrincipalCache(
+    _make_backend(),
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    enabled=settings.PRINCIPAL_CACHE_ENABLED
+)
@@ -0,0 +1,167 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from fastapi import HTTPException, status
+from typing import Any, Callable, Dict
+import asyncio
+import threading
+import time
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class BoundedExecutor:
+    """
+    Thread pool with a bounded backlog and per-pool metrics
+
+    At most max_workers calls run at once and at most max_queue more wait for
+    a worker; further submissions are rejected with 503 instead of piling up
+    behind a slow pool.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"{name}-pool"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Server busy ({self.name} pool saturated), retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+            self.submitted += 1
+
+    def _wrap(self, fn: Callable, args: tuple, kwargs: dict, enqueued: float) -> Callable:
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                waited = started - enqueued
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._in_flight -= 1
+                    self._run_total += time.perf_counter() - started
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+        return call
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable in the pool without blocking the event loop"""
+        self._acquire()
+        call = self._wrap(fn, args, kwargs, time.perf_counter())
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, call)
+        except RuntimeError:
+            # Executor already shut down; undo the slot taken in _acquire
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        return await future
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue a blocking callable without waiting for it; 503 if saturated"""
+        self._acquire()
+        try:
+            return self._executor.submit(self._wrap(fn, args, kwargs, time.perf_counter()))
+        except RuntimeError:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+    def stats(self) -> Dict:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "mean_wait_ms": self._wait_total / finished * 1000.0 if finished else 0.0,
+                "max_wait_ms": self._wait_max * 1000.0,
+                "mean_run_ms": self._run_total / finished * 1000.0 if finished else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class ExecutorRegistry:
+    """Named executor pools shared by the whole process"""
+
+    def __init__(self):
+        self._pools: Dict[str, BoundedExecutor] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, max_workers: int, max_queue: int) -> BoundedExecutor:
+        with self._lock:
+            if name not in self._pools:
+                self._pools[name] = BoundedExecutor(name, max_workers, max_queue)
+            return self._pools[name]
+
+    def get(self, name: str) -> BoundedExecutor:
+        return self._pools[name]
+
+    async def run(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self.get(name).run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {name: pool.stats() for name, pool in self._pools.items()}
+
+    def shutdown(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown()
+
+executors = ExecutorRegistry()
+
+# bcrypt hashing and verification for register/login
+AUTH_POOL = "auth"
+executors.register(AUTH_POOL, settings.AUTH_EXECUTOR_WORKERS, settings.AUTH_EXECUTOR_QUEUE)
+
+# Embedding model inference and in-process vector search; torch and NumPy
+# release the GIL inside their kernels
+INFERENCE_POOL = "inference"
+executors.register(INFERENCE_POOL, settings.INFERENCE_EXECUTOR_WORKERS, settings.INFERENCE_EXECUTOR_QUEUE)
+
+# Embedding generation queued by streaming imports, off the request path
+EMBEDDING_POOL = "embedding"
+executors.register(EMBEDDING_POOL, settings.EMBEDDING_EXECUTOR_WORKERS, settings.EMBEDDING_EXECUTOR_QUEUE)
+
+# In-process vector index builds and snapshot refreshes
+INDEX_POOL = "index"
+executors.register(INDEX_POOL, settings.INDEX_EXECUTOR_WORKERS, settings.INDEX_EXECUTOR_QUEUE)
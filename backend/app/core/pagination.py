@@ -0,0 +1,29 @@
+from fastapi import HTTPException, status
+from typing import Any, Callable, Dict
+import base64
+import json
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """
+    Opaque keyset cursor for the position of the last row of a page.
+    Values must be JSON-serializable (pass datetimes/UUIDs as strings).
+    """
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, **fields: Callable[[Any], Any]) -> Dict[str, Any]:
+    """
+    Decode a cursor made by encode_cursor, converting each named field with
+    its parser (e.g. id=UUID); 400 if malformed or a field is missing
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(position, dict):
+            raise ValueError("cursor is not an object")
+        return {name: parse(position[name]) for name, parse in fields.items()}
+    except (KeyError, ValueError, TypeError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+from typing import Dict, Optional
+import threading
+import time
+import logging
+import redis
+import redis.asyncio
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RedisCircuitBreaker:
+    """
+    Skips optional Redis work for a while after a connection failure
+
+    Caches consult is_open() before a lookup and report connection errors
+    and timeouts through guard(), so an unreachable Redis costs one socket
+    timeout per REDIS_CIRCUIT_BREAKER_SECONDS instead of one per call.
+    """
+
+    def __init__(self, open_seconds: float):
+        self.open_seconds = open_seconds
+        self._open_until = 0.0
+        self.failures = 0
+        self.trips = 0
+
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def record_failure(self, error: Exception):
+        self.failures += 1
+        if not self.is_open():
+            self.trips += 1
+            logger.warning(f"Redis unavailable, skipping it for {self.open_seconds}s: {error}")
+        self._open_until = time.monotonic() + self.open_seconds
+
+    @contextmanager
+    def guard(self):
+        """Open the breaker on connection errors and timeouts, then re-raise"""
+        try:
+            yield
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            self.record_failure(e)
+            raise
+
+    def stats(self) -> Dict:
+        return {
+            "open": self.is_open(),
+            "open_seconds": self.open_seconds,
+            "failures": self.failures,
+            "trips": self.trips,
+        }
+
+redis_breaker = RedisCircuitBreaker(settings.REDIS_CIRCUIT_BREAKER_SECONDS)
+
+_client: Optional[redis.Redis] = None
+_client_lock = threading.Lock()
+_async_client: Optional[redis.asyncio.Redis] = None
+
+def get_redis() -> Optional[redis.Redis]:
+    """Shared Redis client, or None when Redis is not configured"""
+    global _client
+    if not settings.REDIS_URL:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+                )
+    return _client
+
+def get_async_redis() -> Optional[redis.asyncio.Redis]:
+    """Shared asyncio Redis client for request handlers, or None when not configured"""
+    global _async_client
+    if not settings.REDIS_URL:
+        return None
+    if _async_client is None:
+        _async_client = redis.asyncio.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+        )
+    return _async_client
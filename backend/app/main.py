@@ -2,10 +2,22 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, AsyncSessionLocal, Base
+from app.core.executors import executors
+from app.core.cache import principal_cache, response_cache
+from app.core.redis import redis_breaker
+from app.services.model_registry import model_registry
+from app.services.encoder_backends import embedding_version
+from app.services.batch_encoder import batch_encoder_stats
+from app.services.query_cache import query_cache
+from app.services.embedding_service import dedup_stats
+from app.services.vector_index import vector_indexes
+from app.services.embedding_snapshots import embedding_snapshots
+from app.services.agent_registry import agent_registry
 
 # Import models to ensure they're registered
 from app.models import user, conversation, embedding, agent
@@ -23,8 +35,27 @@ async def lifespan(app: FastAPI):
     # Create tables if they don't exist
     # In production, use Alembic migrations (but for now, auto-create)
     Base.metadata.create_all(bind=engine)
+    # Agent name -> id map; a failure here only defers loading to the first sync
+    try:
+        async with AsyncSessionLocal() as db:
+            await agent_registry.load(db)
+    except Exception as e:
+        logger.error(f"Agent registry load failed: {e}")
+    # Load the embedding model before serving so the first search is not slow
+    if settings.EMBEDDING_WARMUP_ON_STARTUP:
+        try:
+            stats = await asyncio.to_thread(
+                model_registry.warm_up,
+                settings.EMBEDDING_MODEL,
+                embedding_version()
+            )
+            logger.info(f"Embedding model warmed up: {stats}")
+        except Exception as e:
+            logger.error(f"Embedding model warm-up failed: {e}")
     yield
     logger.info("Shutting down API")
+    executors.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="AI Conversation Capture API",
@@ -42,15 +73,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable by browser clients: list paging and conditional GET
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 # Import and include routers
-from app.api.v1 import auth, conversations, search, agents
+from app.api.v1 import auth, conversations, search, agents, sync
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(conversations.router, prefix="/api/v1/conversations", tags=["Conversations"])
 app.include_router(search.router, prefix="/api/v1/search", tags=["Search"])
 app.include_router(agents.router, prefix="/api/v1/agents", tags=["Agents"])
+app.include_router(sync.router, prefix="/api/v1/sync", tags=["Sync"])
 
 @app.get("/health")
 async def health_check():
@@ -60,6 +94,23 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics for in-process caches and pools"""
+    return {
+        "embedding_models": model_registry.stats(),
+        "batch_encoders": batch_encoder_stats(),
+        "query_cache": query_cache.stats(),
+        "redis_breaker": redis_breaker.stats(),
+        "embedding_dedup": dedup_stats.stats(),
+        "executors": executors.stats(),
+        "vector_indexes": vector_indexes.stats(),
+        "embedding_snapshots": embedding_snapshots.stats(),
+        "response_cache": response_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "agent_registry": agent_registry.stats()
+    }
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, JSON, ForeignKey, Text, CheckConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, JSON, ForeignKey, Text, CheckConstraint, UniqueConstraint, DDL, FetchedValue, Index, event
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 import uuid
 
 from app.core.database import Base
@@ -25,9 +25,30 @@ class Conversation(Base):
     is_deleted = Column(Boolean, default=False)
     deleted_at = Column(DateTime(timezone=True))
     metadata = Column(JSON, default={})
+    # Delta sync: XOR of message content digests and highest sequence number;
+    # maintained by triggers on messages
+    content_digest = Column(BigInteger, nullable=False, server_default="0", server_onupdate=FetchedValue())
+    last_sequence_number = Column(Integer, server_onupdate=FetchedValue())
 
     # Relationships
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    messages = relationship(
+        "Message",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        order_by="Message.sequence_number"
+    )
+
+    __table_args__ = (
+        # Upsert key for extension sync
+        UniqueConstraint("user_id", "agent_id", "external_id", name="uq_conversations_user_agent_external"),
+        # Keyset pagination of a user's conversation list, newest first
+        Index(
+            "idx_conversations_user_created",
+            "user_id", created_at.desc(), id.desc()
+        ),
+        # Sync manifest, paged by last change
+        Index("idx_conversations_user_updated", "user_id", updated_at, id),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -47,10 +68,150 @@ class Message(Base):
     version = Column(Integer, default=1)
     parent_message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id"))
     metadata = Column(JSON, default={})
+    # Conversation title (weight A) + content (weight B); maintained by triggers
+    search_vector = deferred(Column(TSVECTOR, server_default=FetchedValue(), server_onupdate=FetchedValue()))
+    # 64-bit digest of (sequence_number, role, content); set by trigger
+    content_digest = Column(BigInteger, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
     
     __table_args__ = (
         CheckConstraint("role IN ('user', 'assistant', 'system')", name="check_role"),
+        UniqueConstraint("conversation_id", "sequence_number", name="uq_messages_conversation_sequence"),
+        Index("idx_messages_search_vector", "search_vector", postgresql_using="gin"),
     )
+
+# Keep messages.search_vector in sync with message content and conversation title.
+# Mirrors db/schema.sql so tables created through create_all get the same triggers.
+_SEARCH_VECTOR_DDL = [
+    DDL("""
+    CREATE OR REPLACE FUNCTION messages_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(
+                (SELECT title FROM conversations WHERE id = NEW.conversation_id), '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.content, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+    CREATE TRIGGER messages_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF content, conversation_id ON messages
+        FOR EACH ROW EXECUTE FUNCTION messages_search_vector_update()
+    """),
+    DDL("""
+    CREATE OR REPLACE FUNCTION conversations_title_search_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE messages
+        SET search_vector =
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(content, '')), 'B')
+        WHERE conversation_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+    CREATE TRIGGER conversations_title_search_trigger
+        AFTER UPDATE OF title ON conversations
+        FOR EACH ROW WHEN (OLD.title IS DISTINCT FROM NEW.title)
+        EXECUTE FUNCTION conversations_title_search_update()
+    """),
+]
+
+# Delta sync digests. Each message gets the first 8 bytes of
+# sha256("<sequence_number>:<role>:<content>") as a signed bigint, and the
+# conversation keeps the XOR of its messages' digests, so inserts, edits and
+# deletes update it in O(changed rows). Statement-level triggers fold a whole
+# bulk insert into one UPDATE per conversation.
+_CONTENT_DIGEST_DDL = [
+    DDL("""
+    CREATE OR REPLACE FUNCTION message_content_digest(seq INTEGER, role TEXT, content TEXT) RETURNS BIGINT AS $$
+        SELECT ('x' || substr(encode(sha256(convert_to(seq || ':' || role || ':' || content, 'UTF8')), 'hex'), 1, 16))::bit(64)::bigint
+    $$ LANGUAGE sql IMMUTABLE
+    """),
+    DDL("CREATE OR REPLACE AGGREGATE bigint_xor(BIGINT) (SFUNC = int8xor, STYPE = BIGINT, INITCOND = '0')"),
+    DDL("""
+    CREATE OR REPLACE FUNCTION messages_content_digest_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.content_digest := message_content_digest(NEW.sequence_number, NEW.role, NEW.content);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+    CREATE TRIGGER messages_content_digest_trigger
+        BEFORE INSERT OR UPDATE OF content, role, sequence_number ON messages
+        FOR EACH ROW EXECUTE FUNCTION messages_content_digest_update()
+    """),
+    DDL("""
+    CREATE OR REPLACE FUNCTION conversations_digest_after_insert() RETURNS trigger AS $$
+    BEGIN
+        UPDATE conversations c
+        SET content_digest = c.content_digest # d.digest,
+            last_sequence_number = GREATEST(c.last_sequence_number, d.last_sequence)
+        FROM (
+            SELECT conversation_id, bigint_xor(content_digest) AS digest, max(sequence_number) AS last_sequence
+            FROM new_messages GROUP BY conversation_id
+        ) d
+        WHERE c.id = d.conversation_id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+    CREATE TRIGGER messages_digest_insert_trigger
+        AFTER INSERT ON messages REFERENCING NEW TABLE AS new_messages
+        FOR EACH STATEMENT EXECUTE FUNCTION conversations_digest_after_insert()
+    """),
+    DDL("""
+    CREATE OR REPLACE FUNCTION conversations_digest_after_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE conversations c
+        SET content_digest = c.content_digest # d.digest,
+            last_sequence_number = GREATEST(c.last_sequence_number, d.last_sequence)
+        FROM (
+            SELECT conversation_id, bigint_xor(content_digest) AS digest, max(sequence_number) AS last_sequence
+            FROM (
+                SELECT conversation_id, content_digest, NULL::integer AS sequence_number FROM old_messages
+                UNION ALL
+                SELECT conversation_id, content_digest, sequence_number FROM new_messages
+            ) changed
+            GROUP BY conversation_id
+        ) d
+        WHERE c.id = d.conversation_id AND d.digest <> 0;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+    CREATE TRIGGER messages_digest_update_trigger
+        AFTER UPDATE ON messages REFERENCING OLD TABLE AS old_messages NEW TABLE AS new_messages
+        FOR EACH STATEMENT EXECUTE FUNCTION conversations_digest_after_update()
+    """),
+    DDL("""
+    CREATE OR REPLACE FUNCTION conversations_digest_after_delete() RETURNS trigger AS $$
+    BEGIN
+        UPDATE conversations c
+        SET content_digest = c.content_digest # d.digest,
+            last_sequence_number = (SELECT max(sequence_number) FROM messages WHERE conversation_id = c.id)
+        FROM (
+            SELECT conversation_id, bigint_xor(content_digest) AS digest
+            FROM old_messages GROUP BY conversation_id
+        ) d
+        WHERE c.id = d.conversation_id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+    CREATE TRIGGER messages_digest_delete_trigger
+        AFTER DELETE ON messages REFERENCING OLD TABLE AS old_messages
+        FOR EACH STATEMENT EXECUTE FUNCTION conversations_digest_after_delete()
+    """),
+]
+
+for _ddl in _SEARCH_VECTOR_DDL + _CONTENT_DIGEST_DDL:
+    event.listen(Message.__table__, "after_create", _ddl.execute_if(dialect="postgresql"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, String, ForeignKey
+from sqlalchemy import Column, DateTime, Float, Integer, String, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
@@ -12,6 +12,55 @@ class Embedding(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id", ondelete="CASCADE"), nullable=False, index=True)
     embedding = Column(Vector(384))  # 384 dimensions for all-MiniLM-L6-v2
+    content_hash = Column(String(64))  # SHA-256 of the message text
+    # Denormalized from the conversation so vector search can filter by tenant
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    agent_id = Column(UUID(as_uuid=True), ForeignKey("agents.id"))
     model_name = Column(String(100), nullable=False)
     model_version = Column(String(50), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Insert time, not transaction start (now()): snapshot refreshes page on it,
+    # and an embed transaction spends the encode time before it inserts
+    created_at = Column(DateTime(timezone=True), server_default=func.clock_timestamp())
+
+    __table_args__ = (
+        UniqueConstraint("message_id", "model_name", "model_version", name="uq_embeddings_message_model"),
+        Index("idx_embeddings_content_hash", "content_hash", "model_name", "model_version"),
+        Index("idx_embeddings_user_agent", "user_id", "agent_id"),
+    )
+
+class ConversationEmbedding(Base):
+    """
+    Length-weighted centroid of a conversation's message embeddings
+
+    embedding holds the weighted sum of the normalized message vectors (not
+    divided by weight_sum: cosine distance is scale-invariant), so new
+    messages are folded in by adding to it inside the upsert, without
+    re-reading the conversation's existing vectors.
+    """
+    __tablename__ = "conversation_embeddings"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
+    embedding = Column(Vector(384))
+    weight_sum = Column(Float, nullable=False, default=0.0)
+    message_count = Column(Integer, nullable=False, default=0)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    agent_id = Column(UUID(as_uuid=True), ForeignKey("agents.id"))
+    model_name = Column(String(100), nullable=False)
+    model_version = Column(String(50), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint(
+            "conversation_id", "model_name", "model_version",
+            name="uq_conversation_embeddings_conversation_model"
+        ),
+        Index("idx_conversation_embeddings_user_agent", "user_id", "agent_id"),
+        Index(
+            "idx_conversation_embeddings_vector",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"}
+        ),
+    )
@@ -17,6 +17,7 @@ class MessageCreate(MessageBase):
     pass
 
 class MessageResponse(MessageBase):
+    content: Optional[str] = None  # omitted when requested with include_content=false
     id: UUID
     conversation_id: UUID
     created_at: datetime
@@ -63,12 +64,22 @@ class ConversationListResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ConversationListPage(BaseModel):
+    items: List[ConversationListResponse]
+    next_cursor: Optional[str] = None  # pass back as cursor for the next page
+
 # Batch Create
 class ConversationBatchCreate(BaseModel):
     conversations: List[ConversationCreate]
 
+class BatchItemError(BaseModel):
+    index: int  # position in the request's conversations list
+    external_id: Optional[str] = None
+    error: str
+
 class ConversationBatchResponse(BaseModel):
     created: int
     updated: int
     failed: int
     conversations: List[ConversationResponse]
+    errors: List[BatchItemError] = []
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from uuid import UUID
+from datetime import datetime
 
 class SearchRequest(BaseModel):
     query: str
@@ -8,6 +9,14 @@ class SearchRequest(BaseModel):
     agent_ids: Optional[List[UUID]] = None
     limit: int = 20
     similarity_threshold: float = 0.5
+    # Hybrid search: RRF constant and candidates per leg (defaults to 2 * limit)
+    rrf_k: int = Field(60, ge=1)
+    candidate_depth: Optional[int] = Field(None, ge=1, le=1000)
+    # HNSW recall/latency trade-off: explicit ef_search, or a named tier
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+    search_tier: Optional[str] = None
+    # Keyset pagination (keyword and semantic): next_cursor of the previous page
+    cursor: Optional[str] = None
 
 class SearchResult(BaseModel):
     message_id: UUID
@@ -26,23 +35,51 @@ class SearchResponse(BaseModel):
     results: List[SearchResult]
     total: int
     search_type: str
+    next_cursor: Optional[str] = None
+
+class SimilarConversationsRequest(BaseModel):
+    conversation_id: UUID
+    project_ids: Optional[List[UUID]] = None
+    agent_ids: Optional[List[UUID]] = None
+    limit: int = Field(10, ge=1, le=100)
+    similarity_threshold: float = 0.0
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+
+class SimilarConversationResult(BaseModel):
+    conversation_id: UUID
+    conversation_title: Optional[str]
+    agent_name: str
+    message_count: Optional[int] = None
+    last_message_at: Optional[datetime] = None
+    similarity: float
+
+class SimilarConversationsResponse(BaseModel):
+    conversation_id: UUID
+    results: List[SimilarConversationResult]
+    total: int
 
 
 class ConversationCompareRequest(BaseModel):
     left_conversation_id: UUID
     right_conversation_id: UUID
     max_turns: int = 20
+    # "index" pairs turns by position; "align" finds the best monotonic
+    # alignment and reports turns inserted or skipped on either side
+    mode: str = Field("index", pattern="^(index|align)$")
+    gap_penalty: float = Field(0.3, ge=0.0, le=2.0)
 
 
 class TurnSimilarityResult(BaseModel):
     turn_index: int
-    left_message_id: UUID
-    right_message_id: UUID
-    left_preview: str
-    right_preview: str
+    left_message_id: Optional[UUID] = None
+    right_message_id: Optional[UUID] = None
+    left_preview: str = ""
+    right_preview: str = ""
     similarity: Optional[float] = None
     has_left_embedding: bool
     has_right_embedding: bool
+    # match | inserted (right only) | skipped (left only)
+    operation: str = "match"
 
 
 class ConversationCompareResponse(BaseModel):
@@ -52,3 +89,6 @@ class ConversationCompareResponse(BaseModel):
     comparable_turns: int
     average_similarity: Optional[float] = None
     turn_results: List[TurnSimilarityResult]
+    mode: str = "index"
+    inserted_turns: int = 0
+    skipped_turns: int = 0
@@ -0,0 +1,51 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from uuid import UUID
+
+from app.schemas.conversation import ConversationCreate, BatchItemError
+
+# Manifest Schemas
+class SyncManifestEntry(BaseModel):
+    conversation_id: UUID
+    agent_id: UUID
+    external_id: Optional[str]
+    last_sequence_number: Optional[int]
+    message_count: int
+    content_digest: str  # 16 hex chars, XOR of per-message digests
+    updated_at: datetime
+    is_deleted: bool
+
+class SyncManifestResponse(BaseModel):
+    conversations: List[SyncManifestEntry]
+    next_cursor: Optional[str] = None  # pass back as cursor to page through this pass only
+
+# Delta Schemas
+class SyncDeltaConversation(ConversationCreate):
+    # Digest the client last saw from the manifest; the delta is rejected as a
+    # conflict if the server copy has changed since
+    base_digest: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{16}$")
+
+class SyncDeltaRequest(BaseModel):
+    conversations: List[SyncDeltaConversation]
+
+class SyncDeltaResult(BaseModel):
+    conversation_id: UUID
+    external_id: Optional[str]
+    last_sequence_number: Optional[int]
+    message_count: int
+    content_digest: str
+
+class SyncConflict(BaseModel):
+    index: int  # position in the request's conversations list
+    external_id: Optional[str]
+    content_digest: str
+    last_sequence_number: Optional[int]
+
+class SyncDeltaResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    conversations: List[SyncDeltaResult]
+    conflicts: List[SyncConflict] = []
+    errors: List[BatchItemError] = []
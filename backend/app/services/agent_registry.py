@@ -0,0 +1,118 @@
+from sqlalchemy import select, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.models.agent import Agent
+
+logger = logging.getLogger(__name__)
+
+def agent_display_name(name: str) -> str:
+    """Display name for an agent created from an extension source key"""
+    return str(name).replace("_", " ").replace("-", " ").title()
+
+class AgentRegistry:
+    """
+    In-process name -> id map of agents
+
+    Loaded at startup and reloaded every AGENT_REGISTRY_REFRESH_SECONDS, so
+    known agent keys resolve without touching the database. Unknown keys
+    are upserted in one INSERT ... ON CONFLICT (name) statement whose
+    RETURNING covers both new and concurrently created rows, so racing
+    syncs converge on the same agent instead of failing on the unique name.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self._by_name: Dict[str, UUID] = {}
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.reloads = 0
+
+    def lookup(self, name: str) -> Optional[UUID]:
+        with self._lock:
+            return self._by_name.get(name)
+
+    def _remember(self, pairs: Iterable[Tuple[str, UUID]], replace: bool = False):
+        with self._lock:
+            if replace:
+                self._by_name = dict(pairs)
+                self._loaded_at = time.monotonic()
+            else:
+                self._by_name.update(pairs)
+
+    def is_stale(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds
+
+    async def load(self, db: AsyncSession):
+        """Replace the map with every agent in the database"""
+        result = await db.execute(select(Agent.name, Agent.id))
+        self._remember(((name, agent_id) for name, agent_id in result.all()), replace=True)
+        self.reloads += 1
+        logger.info(f"Agent registry loaded {len(self._by_name)} agents")
+
+    async def resolve(self, db: AsyncSession, raw_agent_ids: Iterable) -> Tuple[Dict, bool]:
+        """
+        Map agent ids or name keys (e.g. "chatgpt") to agent ids; returns
+        the mapping and whether any agent was created. Names not in the map
+        cost one round trip for the whole call; the caller commits.
+        """
+        if self.is_stale():
+            await self.load(db)
+
+        resolved = {}
+        unknown = set()
+        for raw in raw_agent_ids:
+            if isinstance(raw, UUID):
+                resolved[raw] = raw
+                continue
+            name = str(raw)
+            agent_id = self.lookup(name)
+            if agent_id is None:
+                unknown.add(name)
+                self.misses += 1
+            else:
+                resolved[name] = agent_id
+                self.hits += 1
+        if not unknown:
+            return resolved, False
+
+        stmt = pg_insert(Agent).values([
+            {"name": name, "display_name": agent_display_name(name), "metadata": {}}
+            for name in sorted(unknown)
+        ])
+        # No-op update so RETURNING also yields rows that already existed
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"name": stmt.excluded.name}
+        ).returning(Agent.name, Agent.id, literal_column("(xmax = 0)").label("inserted"))
+        rows = (await db.execute(stmt)).all()
+
+        self._remember((row.name, row.id) for row in rows)
+        resolved.update({row.name: row.id for row in rows})
+        created = sum(1 for row in rows if row.inserted)
+        self.created += created
+        return resolved, created > 0
+
+    def stats(self) -> Dict:
+        loaded_at = self._loaded_at
+        return {
+            "agents": len(self._by_name),
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "reloads": self.reloads,
+            "age_seconds": time.monotonic() - loaded_at if loaded_at is not None else None,
+        }
+
+agent_registry = AgentRegistry(settings.AGENT_REGISTRY_REFRESH_SECONDS)
@@ -0,0 +1,89 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+# Traceback moves
+_DIAGONAL = 0
+_UP = 1    # left turn with no counterpart (skipped)
+_LEFT = 2  # right turn with no counterpart (inserted)
+
+# Rows of the similarity matrix computed per matmul
+_BLOCK_ROWS = 256
+
+AlignedPair = Tuple[Optional[int], Optional[int], Optional[float]]
+
+def embedding_matrix(vectors: Sequence, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack optional vectors into an L2-normalized float32 matrix; missing or
+    zero vectors become zero rows. Returns (matrix, has_vector mask).
+    """
+    matrix = np.zeros((len(vectors), dim), dtype=np.float32)
+    has_vector = np.zeros(len(vectors), dtype=bool)
+    for i, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[i] = vector
+            has_vector[i] = True
+    norms = np.linalg.norm(matrix, axis=1)
+    has_vector &= norms > 0
+    matrix[has_vector] /= norms[has_vector, None]
+    return matrix, has_vector
+
+def paired_similarities(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Cosine similarity of left[i] and right[i] for normalized rows"""
+    turns = min(len(left), len(right))
+    return np.einsum("ij,ij->i", left[:turns], right[:turns])
+
+def align_turns(left: np.ndarray, right: np.ndarray, gap_penalty: float) -> List[AlignedPair]:
+    """
+    Best monotonic alignment of two turn sequences (Needleman-Wunsch over
+    cosine similarity, with a linear gap penalty for skipped/inserted turns)
+
+    left and right are L2-normalized row matrices. Returns (left_index,
+    right_index, similarity) in conversation order; one index is None for
+    a turn only present on one side.
+
+    The DP runs one row at a time with NumPy: the diagonal and vertical
+    moves are elementwise, and the horizontal (in-row) dependency is resolved
+    with a cumulative maximum, since
+    row[j] = max_k<=j (best[k] - gap * (j - k)) = cummax(best + gap*j) - gap*j.
+    Memory is one byte of traceback per cell plus two score rows.
+    """
+    n, m = len(left), len(right)
+    gap = float(gap_penalty)
+    offsets = gap * np.arange(m + 1, dtype=np.float64)
+
+    trace = np.empty((n + 1, m + 1), dtype=np.uint8)
+    trace[0, :] = _LEFT
+    trace[:, 0] = _UP
+    previous = -offsets
+
+    for block_start in range(0, n, _BLOCK_ROWS):
+        similarities = left[block_start:block_start + _BLOCK_ROWS] @ right.T
+        for offset, row_sims in enumerate(similarities):
+            i = block_start + offset + 1
+            diagonal = previous[:-1] + row_sims
+            up = previous[1:] - gap
+            best = np.empty(m + 1, dtype=np.float64)
+            best[0] = -gap * i
+            best[1:] = np.maximum(diagonal, up)
+
+            shifted = best + offsets
+            running = np.maximum.accumulate(shifted)
+            trace[i, 1:] = np.where(diagonal >= up, _DIAGONAL, _UP)
+            trace[i, 1:][running[1:] > shifted[1:]] = _LEFT
+            previous = running - offsets
+
+    pairs: List[AlignedPair] = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        move = trace[i, j]
+        if i > 0 and j > 0 and move == _DIAGONAL:
+            pairs.append((i - 1, j - 1, float(left[i - 1] @ right[j - 1])))
+            i, j = i - 1, j - 1
+        elif i > 0 and (j == 0 or move == _UP):
+            pairs.append((i - 1, None, None))
+            i -= 1
+        else:
+            pairs.append((None, j - 1, None))
+            j -= 1
+    pairs.reverse()
+    return pairs
@@ -0,0 +1,166 @@
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+import numpy as np
+import threading
+import queue
+import time
+import logging
+
+from app.core.config import settings
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+class MicroBatchEncoder:
+    """
+    Collects concurrent encode calls into one batched forward pass
+
+    Callers submit single texts and block on their own future. A worker
+    thread drains the queue until it has max_batch_size texts or max_wait_ms
+    has passed since the first one arrived, then encodes them together.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_version: str,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self.model_name = model_name
+        self.model_version = model_version
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self._batch_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._batches = 0
+        self._items = 0
+        self._queue_delay_total = 0.0
+        self._queue_delay_max = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name=f"batch-encoder-{self.model_name}",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue one text and return a future resolving to its vector"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        """Encode one text, sharing a forward pass with concurrent callers"""
+        return self.submit(text).result()
+
+    def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Encode several texts through the shared batching queue"""
+        futures = [self.submit(text) for text in texts]
+        return [f.result() for f in futures]
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(len(batch), [started - enqueued for _, _, enqueued in batch])
+
+            texts = [text for text, _, _ in batch]
+            try:
+                model = model_registry.get(self.model_name, self.model_version)
+                vectors = model.encode(
+                    texts,
+                    batch_size=len(texts),
+                    show_progress_bar=False
+                )
+            except Exception as e:
+                logger.error(f"Batched encode of {len(texts)} texts failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def _record(self, batch_size: int, delays: List[float]):
+        with self._metrics_lock:
+            self._batches += 1
+            self._items += batch_size
+            for bucket in BATCH_SIZE_BUCKETS:
+                if batch_size <= bucket:
+                    self._batch_histogram[bucket] += 1
+                    break
+            else:
+                self._batch_histogram[BATCH_SIZE_BUCKETS[-1]] += 1
+            self._queue_delay_total += sum(delays)
+            self._queue_delay_max = max(self._queue_delay_max, max(delays))
+
+    def stats(self) -> Dict:
+        """Batch-size distribution and queueing delay"""
+        with self._metrics_lock:
+            return {
+                "model_name": self.model_name,
+                "model_version": self.model_version,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "batch_size_histogram": {
+                    f"le_{bucket}": count for bucket, count in self._batch_histogram.items()
+                },
+                "queue_depth": self._queue.qsize(),
+                "mean_queue_delay_ms": (
+                    self._queue_delay_total / self._items * 1000.0 if self._items else 0.0
+                ),
+                "max_queue_delay_ms": self._queue_delay_max * 1000.0,
+            }
+
+_encoders: Dict[Tuple[str, str], MicroBatchEncoder] = {}
+_encoders_lock = threading.Lock()
+
+def get_batch_encoder(model_name: str, model_version: str) -> MicroBatchEncoder:
+    """Return the shared micro-batching encoder for a model"""
+    key = (model_name, model_version)
+    with _encoders_lock:
+        if key not in _encoders:
+            _encoders[key] = MicroBatchEncoder(
+                model_name,
+                model_version,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+            )
+        return _encoders[key]
+
+def batch_encoder_stats() -> list:
+    with _encoders_lock:
+        return [encoder.stats() for encoder in _encoders.values()]
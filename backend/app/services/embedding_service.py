@@ -1,39 +1,481 @@
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import and_, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import numpy as np
+import hashlib
+import threading
+import time
 import logging
 
 from app.core.config import settings
+from app.core.executors import executors, INFERENCE_POOL
 from app.models.conversation import Message, Conversation
-from app.models.embedding import Embedding
+from app.models.embedding import Embedding, ConversationEmbedding
+from app.services.model_registry import model_registry
+from app.services.encoder_backends import embedding_version
+from app.services.batch_encoder import get_batch_encoder
+from app.services.query_cache import query_cache
+from app.services.vector_index import vector_indexes
+from app.services.embedding_snapshots import embedding_snapshots
 
 logger = logging.getLogger(__name__)
 
+def content_hash(content: str) -> str:
+    """SHA-256 of message text, used to reuse vectors for identical content"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+class DedupStats:
+    """Process-wide counters of encoded vs. reused embeddings"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.reused = 0
+
+    def record(self, encoded: int, reused: int):
+        with self._lock:
+            self.encoded += encoded
+            self.reused += reused
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.encoded + self.reused
+            return {
+                "encoded": self.encoded,
+                "reused": self.reused,
+                "dedup_ratio": self.reused / total if total else 0.0
+            }
+
+dedup_stats = DedupStats()
+
+EXACT_STRATEGY = "exact"
+HNSW_STRATEGY = "hnsw"
+SNAPSHOT_STRATEGY = "snapshot"
+
+# Message weight in a conversation centroid is its length, capped so one
+# pasted document does not drown out the rest of the conversation
+CENTROID_MAX_WEIGHT_CHARS = 2000
+
+# Postgres caps a statement at 32767 bind parameters; embeddings bind 7 each
+EMBEDDING_COLUMNS = 7
+EMBEDDING_ROWS_PER_STATEMENT = max(1, min(settings.EMBEDDING_ROWS_PER_INSERT, 32767 // EMBEDDING_COLUMNS))
+
+# Where search_similar looks vectors up
+PGVECTOR_BACKEND = "pgvector"
+MEMORY_BACKEND = "memory"
+
+# (user_id, model_name, model_version) -> (expires_at, embedding count)
+_tenant_sizes: Dict[tuple, tuple] = {}
+
+def vector_literal(vector) -> str:
+    """pgvector text form of a vector, bound with CAST(:param AS vector)"""
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+def encode_query(
+    query: str,
+    model_name: str = settings.EMBEDDING_MODEL,
+    model_version: Optional[str] = None
+) -> np.ndarray:
+    """Encode a search query, served from the query cache when possible"""
+    model_version = model_version or embedding_version()
+    return query_cache.get_or_compute(
+        query,
+        model_name,
+        model_version,
+        get_batch_encoder(model_name, model_version).encode
+    )
+
+async def search_memory(
+    db: AsyncSession,
+    user_id: str,
+    query_vector: np.ndarray,
+    limit: int = 20,
+    threshold: float = 0.5,
+    project_ids: Optional[List] = None,
+    agent_ids: Optional[List] = None,
+    ef_search: Optional[int] = None,
+    after: Optional[Tuple[float, str]] = None
+) -> List[Dict]:
+    """
+    search_similar against the in-process index (SEARCH_BACKEND=memory):
+    the index is built and searched off the event loop, and the database
+    is only asked for the top hits' rows
+    """
+    index = await vector_indexes.get(db, user_id, settings.EMBEDDING_MODEL, embedding_version())
+    hits = await executors.run(
+        INFERENCE_POOL,
+        index.search,
+        query_vector,
+        limit * settings.SEARCH_KNN_CANDIDATE_FACTOR,
+        agent_ids=agent_ids,
+        project_ids=project_ids,
+        ef_search=ef_search,
+        after=after
+    )
+    return await db.run_sync(
+        lambda session: EmbeddingService(session)._hydrate_hits(user_id, hits, threshold, limit)
+    )
+
+def _usable_snapshot(snapshot, user_id: str, model_name: str, model_version: str):
+    """
+    snapshot if it is small enough for an exact scan, queueing a background
+    refresh when it is stale; no database access
+    """
+    if len(snapshot) > settings.EMBEDDING_SNAPSHOT_MAX_ROWS:
+        return None
+    if embedding_snapshots.needs_refresh(snapshot, user_id):
+        embedding_snapshots.refresh_in_background(user_id, model_name, model_version)
+    return snapshot
+
+def _search_snapshot_file(
+    user_id: str,
+    model_name: str,
+    model_version: str,
+    query_vector: np.ndarray,
+    k: int,
+    agent_ids: Optional[List],
+    project_ids: Optional[List],
+    after: Optional[Tuple[float, str]]
+) -> Tuple[bool, Optional[List[Tuple[str, float]]]]:
+    """
+    (snapshot exists, hits) from the user's snapshot; hits is None when
+    there is no snapshot or it is too large to scan
+    """
+    snapshot = embedding_snapshots.open(user_id, model_name, model_version)
+    if snapshot is None:
+        return False, None
+    snapshot = _usable_snapshot(snapshot, user_id, model_name, model_version)
+    if snapshot is None:
+        return True, None
+    return True, snapshot.search(query_vector, k, agent_ids=agent_ids, project_ids=project_ids, after=after)
+
+async def search_pgvector(
+    db: AsyncSession,
+    user_id: str,
+    query_vector: np.ndarray,
+    limit: int = 20,
+    threshold: float = 0.5,
+    project_ids: Optional[List] = None,
+    agent_ids: Optional[List] = None,
+    ef_search: Optional[int] = None,
+    after: Optional[Tuple[float, str]] = None
+) -> List[Dict]:
+    """
+    search_similar for request handlers (SEARCH_BACKEND=pgvector): a
+    snapshot is opened and scanned on the inference pool and only its hits
+    are hydrated through the session; tenants without a usable snapshot
+    are searched in Postgres
+    """
+    model_name, model_version = settings.EMBEDDING_MODEL, embedding_version()
+    has_snapshot = False
+    if settings.EMBEDDING_SNAPSHOTS_ENABLED:
+        has_snapshot, hits = await executors.run(
+            INFERENCE_POOL,
+            _search_snapshot_file,
+            user_id,
+            model_name,
+            model_version,
+            query_vector,
+            limit * settings.SEARCH_KNN_CANDIDATE_FACTOR,
+            agent_ids,
+            project_ids,
+            after
+        )
+        if hits is not None:
+            return await db.run_sync(
+                lambda session: EmbeddingService(session)._hydrate_hits(user_id, hits, threshold, limit)
+            )
+
+    def search(session: Session) -> List[Dict]:
+        service = EmbeddingService(session)
+        if settings.EMBEDDING_SNAPSHOTS_ENABLED and not has_snapshot:
+            service._queue_snapshot_write(user_id)
+        return service.search_similar(
+            query=None,
+            user_id=user_id,
+            limit=limit,
+            threshold=threshold,
+            query_vector=query_vector,
+            project_ids=project_ids,
+            agent_ids=agent_ids,
+            strategy=service._choose_strategy(user_id, None),
+            ef_search=ef_search,
+            after=after
+        )
+    return await db.run_sync(search)
+
 class EmbeddingService:
     """Service for generating and managing embeddings"""
     
     def __init__(self, db: Session):
         self.db = db
-        self.model = None
         self.model_name = settings.EMBEDDING_MODEL
-        self.model_version = "1.0"
+        self.model_version = embedding_version()
     
     def _load_model(self):
-        """Lazy load the embedding model"""
-        if self.model is None:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-        return self.model
+        """Get the process-wide shared embedding model"""
+        return model_registry.get(self.model_name, self.model_version)
+
+    def _batch_encoder(self):
+        """Get the shared micro-batching encoder for single-text encodes"""
+        return get_batch_encoder(self.model_name, self.model_version)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Encode a search query, served from the query cache when possible"""
+        return encode_query(query, self.model_name, self.model_version)
     
     
+    def _missing_messages_query(self):
+        """Messages without an embedding for the current model, with their tenant"""
+        return self.db.query(
+            Message.id,
+            Message.content,
+            Message.conversation_id,
+            Conversation.user_id,
+            Conversation.agent_id,
+            Conversation.project_id
+        ).join(
+            Conversation, Conversation.id == Message.conversation_id
+        ).outerjoin(
+            Embedding,
+            and_(
+                Embedding.message_id == Message.id,
+                Embedding.model_name == self.model_name,
+                Embedding.model_version == self.model_version
+            )
+        ).filter(Embedding.id.is_(None))
+
+    def _encode_sorted(self, contents: List[str]) -> List[np.ndarray]:
+        """
+        Encode texts in length-sorted batches so each forward pass pads
+        to similar lengths; vectors are returned in input order
+        """
+        model = self._load_model()
+        batch_size = settings.EMBEDDING_ENCODE_BATCH_SIZE
+        order = sorted(range(len(contents)), key=lambda i: len(contents[i]))
+        vectors: List[np.ndarray] = [None] * len(contents)
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            encoded = model.encode(
+                [contents[i] for i in chunk],
+                batch_size=len(chunk),
+                show_progress_bar=False
+            )
+            for i, vector in zip(chunk, encoded):
+                vectors[i] = vector
+        return vectors
+
+    def _find_vectors_by_hash(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Existing vectors for the current model, keyed by content hash"""
+        found = {}
+        for start in range(0, len(hashes), EMBEDDING_ROWS_PER_STATEMENT):
+            rows = self.db.query(
+                Embedding.content_hash, Embedding.embedding
+            ).filter(
+                Embedding.content_hash.in_(hashes[start:start + EMBEDDING_ROWS_PER_STATEMENT]),
+                Embedding.model_name == self.model_name,
+                Embedding.model_version == self.model_version
+            ).distinct(Embedding.content_hash).all()
+            found.update((r.content_hash, np.asarray(r.embedding, dtype=np.float32)) for r in rows)
+        return found
+
+    def _embed_messages(self, messages: List) -> Dict:
+        """
+        Encode (id, content) rows and write them in multi-row inserts of at
+        most EMBEDDING_ROWS_PER_STATEMENT messages, committing each; rows that
+        already exist are left untouched via ON CONFLICT.
+        Text already embedded elsewhere (same content hash) is not re-encoded.
+        """
+        totals = {"inserted": 0, "encoded": 0, "reused": 0}
+        for start in range(0, len(messages), EMBEDDING_ROWS_PER_STATEMENT):
+            result = self._embed_chunk(messages[start:start + EMBEDDING_ROWS_PER_STATEMENT])
+            for key in totals:
+                totals[key] += result[key]
+        return totals
+
+    def _embed_chunk(self, messages: List) -> Dict:
+        """Encode and insert one chunk of messages in a single statement"""
+        if not messages:
+            return {"inserted": 0, "encoded": 0, "reused": 0}
+
+        hashes = [content_hash(m.content) for m in messages]
+        vectors_by_hash = self._find_vectors_by_hash(list(set(hashes)))
+
+        # Encode each distinct unseen text once, even if repeated in this batch
+        pending: Dict[str, str] = {}
+        for message, digest in zip(messages, hashes):
+            if digest not in vectors_by_hash and digest not in pending:
+                pending[digest] = message.content
+        # Every message not encoded here reuses a vector: a stored one or
+        # one encoded for an identical text earlier in this batch
+        reused = len(messages) - len(pending)
+        if pending:
+            encoded = self._encode_sorted(list(pending.values()))
+            vectors_by_hash.update(zip(pending.keys(), encoded))
+
+        rows = [
+            {
+                "message_id": message.id,
+                "embedding": vectors_by_hash[digest].tolist(),
+                "content_hash": digest,
+                "user_id": message.user_id,
+                "agent_id": message.agent_id,
+                "model_name": self.model_name,
+                "model_version": self.model_version
+            }
+            for message, digest in zip(messages, hashes)
+        ]
+
+        stmt = pg_insert(Embedding).values(rows).on_conflict_do_nothing(
+            index_elements=["message_id", "model_name", "model_version"]
+        ).returning(Embedding.message_id)
+        inserted = set(self.db.execute(stmt).scalars().all())
+        
+        # Only rows this call inserted are folded into the centroids
+        self._update_conversation_centroids([
+            (m.conversation_id, m.user_id, m.agent_id, len(m.content), vectors_by_hash[digest])
+            for m, digest in zip(messages, hashes)
+            if m.id in inserted
+        ])
+        self.db.commit()
+
+        vector_indexes.add(self.model_name, self.model_version, [
+            dict(row, project_id=message.project_id)
+            for row, message in zip(rows, messages)
+        ])
+        embedding_snapshots.mark_stale({message.user_id for message in messages})
+        dedup_stats.record(encoded=len(pending), reused=reused)
+        return {"inserted": len(inserted), "encoded": len(pending), "reused": reused}
+
+    @staticmethod
+    def _accumulate_centroids(entries: List) -> Dict:
+        """
+        Group (conversation_id, user_id, agent_id, content_length, vector)
+        entries into per-conversation weighted sums of normalized vectors
+        """
+        groups: Dict = {}
+        for conversation_id, user_id, agent_id, length, vector in entries:
+            vector = np.asarray(vector, dtype=np.float64)
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                continue
+            weight = float(max(1, min(length or 0, CENTROID_MAX_WEIGHT_CHARS)))
+            group = groups.get(conversation_id)
+            if group is None:
+                group = groups[conversation_id] = {
+                    "user_id": user_id,
+                    "agent_id": agent_id,
+                    "sum": np.zeros_like(vector),
+                    "weight": 0.0,
+                    "count": 0
+                }
+            group["sum"] += vector / norm * weight
+            group["weight"] += weight
+            group["count"] += 1
+        return groups
+
+    def _update_conversation_centroids(self, entries: List, replace: bool = False):
+        """
+        Fold newly embedded messages into their conversations' centroids
+        (or, with replace, overwrite them) with one upsert. Centroids hold
+        the weighted sum, which cosine distance does not need normalized,
+        so the merge is an addition inside ON CONFLICT and concurrent
+        passes over the same conversation cannot overwrite each other.
+        """
+        groups = self._accumulate_centroids(entries)
+        if not groups:
+            return
+        
+        rows = [
+            {
+                "conversation_id": conversation_id,
+                "embedding": group["sum"].astype(np.float32).tolist(),
+                "weight_sum": group["weight"],
+                "message_count": group["count"],
+                "user_id": group["user_id"],
+                "agent_id": group["agent_id"],
+                "model_name": self.model_name,
+                "model_version": self.model_version
+            }
+            for conversation_id, group in sorted(groups.items(), key=lambda item: str(item[0]))
+        ]
+        
+        stmt = pg_insert(ConversationEmbedding).values(rows)
+        current = ConversationEmbedding.__table__.c
+        if replace:
+            merged = {
+                "embedding": stmt.excluded.embedding,
+                "weight_sum": stmt.excluded.weight_sum,
+                "message_count": stmt.excluded.message_count
+            }
+        else:
+            merged = {
+                "embedding": current.embedding.op("+")(stmt.excluded.embedding),
+                "weight_sum": current.weight_sum + stmt.excluded.weight_sum,
+                "message_count": current.message_count + stmt.excluded.message_count
+            }
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["conversation_id", "model_name", "model_version"],
+            set_=dict(merged, agent_id=stmt.excluded.agent_id, updated_at=func.now())
+        )
+        self.db.execute(stmt)
+
+    def rebuild_conversation_centroids(self, conversation_ids: List) -> int:
+        """Recompute conversation centroids from their message embeddings"""
+        if not conversation_ids:
+            return 0
+        entries = self.db.query(
+            Message.conversation_id,
+            Conversation.user_id,
+            Conversation.agent_id,
+            func.length(Message.content),
+            Embedding.embedding
+        ).join(
+            Message, Message.id == Embedding.message_id
+        ).join(
+            Conversation, Conversation.id == Message.conversation_id
+        ).filter(
+            Message.conversation_id.in_(conversation_ids),
+            Embedding.model_name == self.model_name,
+            Embedding.model_version == self.model_version
+        ).all()
+        self._update_conversation_centroids(entries, replace=True)
+        self.db.commit()
+        return len({entry[0] for entry in entries})
+
+    def dedup_report(self) -> Dict:
+        """
+        How many stored embeddings for the current model share their text
+        with another message
+        """
+        row = self.db.query(
+            func.count(Embedding.id).label("total"),
+            func.count(func.distinct(Embedding.content_hash)).label("distinct_hashes"),
+            func.count(Embedding.content_hash).label("hashed")
+        ).filter(
+            Embedding.model_name == self.model_name,
+            Embedding.model_version == self.model_version
+        ).one()
+        duplicates = row.hashed - row.distinct_hashes
+        return {
+            "model_name": self.model_name,
+            "model_version": self.model_version,
+            "total_embeddings": row.total,
+            "hashed_embeddings": row.hashed,
+            "distinct_contents": row.distinct_hashes,
+            "duplicate_embeddings": duplicates,
+            "dedup_ratio": duplicates / row.hashed if row.hashed else 0.0
+        }
+
     def generate_embeddings_for_conversation(self, conversation_id: str) -> Dict:
         """
         Generate embeddings for all messages in a conversation
+        that do not have one yet
         """
         logger.info(f"Generating embeddings for conversation {conversation_id}")
         
-        # Get conversation with messages
         conversation = self.db.query(Conversation).filter(
             Conversation.id == conversation_id
         ).first()
@@ -42,28 +484,44 @@ class EmbeddingService:
             logger.error(f"Conversation {conversation_id} not found")
             return {"error": "Conversation not found"}
         
-        generated_count = 0
-        for message in conversation.messages:
-            try:
-                self.generate_embedding(message.id)
-                generated_count += 1
-            except Exception as e:
-                logger.error(f"Failed to generate embedding for message {message.id}: {e}")
+        missing = self._missing_messages_query().filter(
+            Message.conversation_id == conversation_id
+        ).all()
+        
+        try:
+            result = self._embed_messages(missing)
+        except Exception as e:
+            logger.error(f"Failed to generate embeddings for conversation {conversation_id}: {e}")
+            self.db.rollback()
+            raise
                 
-        logger.info(f"Generated {generated_count} embeddings for conversation {conversation_id}")
+        logger.info(
+            f"Generated {result['inserted']} embeddings for conversation {conversation_id} "
+            f"({result['reused']} reused by content hash)"
+        )
         
         return {
             "conversation_id": str(conversation_id),
-            "embeddings_generated": generated_count,
-            "total_messages": len(conversation.messages)
+            "embeddings_generated": result["inserted"],
+            "embeddings_reused": result["reused"],
+            "total_messages": conversation.message_count
         }
 
     def generate_embedding(self, message_id: str) -> Embedding:
         """
         Generate embedding for a single message
         """
-        # Get message
-        message = self.db.query(Message).filter(Message.id == message_id).first()
+        # Get message with its tenant
+        message = self.db.query(
+            Message.id,
+            Message.content,
+            Message.conversation_id,
+            Conversation.user_id,
+            Conversation.agent_id,
+            Conversation.project_id
+        ).join(
+            Conversation, Conversation.id == Message.conversation_id
+        ).filter(Message.id == message_id).first()
         if not message:
             raise ValueError(f"Message {message_id} not found")
         
@@ -78,22 +536,44 @@ class EmbeddingService:
             logger.info(f"Embedding already exists for message {message_id}")
             return existing
         
-        # Generate embedding
-        model = self._load_model()
-        embedding_vector = model.encode(message.content)
+        # Reuse the vector of identical text, otherwise encode it
+        # (sharing a forward pass with concurrent callers)
+        digest = content_hash(message.content)
+        embedding_vector = self._find_vectors_by_hash([digest]).get(digest)
+        if embedding_vector is None:
+            embedding_vector = self._batch_encoder().encode(message.content)
+            dedup_stats.record(encoded=1, reused=0)
+        else:
+            dedup_stats.record(encoded=0, reused=1)
         
         # Create embedding record
         embedding = Embedding(
             message_id=message_id,
             embedding=embedding_vector.tolist(),
+            content_hash=digest,
+            user_id=message.user_id,
+            agent_id=message.agent_id,
             model_name=self.model_name,
             model_version=self.model_version
         )
         
         self.db.add(embedding)
+        self.db.flush()
+        self._update_conversation_centroids([
+            (message.conversation_id, message.user_id, message.agent_id, len(message.content), embedding_vector)
+        ])
         self.db.commit()
         self.db.refresh(embedding)
         
+        vector_indexes.add(self.model_name, self.model_version, [{
+            "message_id": message.id,
+            "user_id": message.user_id,
+            "agent_id": message.agent_id,
+            "project_id": message.project_id,
+            "embedding": embedding_vector
+        }])
+        embedding_snapshots.mark_stale([message.user_id])
+        
         logger.info(f"Generated embedding for message {message_id}")
         
         return embedding
@@ -103,62 +583,40 @@ class EmbeddingService:
         Batch generate embeddings for multiple messages
         More efficient than individual generation
         """
-        # Get messages
-        messages = self.db.query(Message).filter(
-            Message.id.in_(message_ids)
-        ).all()
-        
-        if not messages:
+        if not message_ids:
             return {"success": 0, "failed": 0, "skipped": 0}
         
-        # Filter out messages that already have embeddings
-        existing_message_ids = set(
-            e.message_id for e in self.db.query(Embedding.message_id).filter(
-                Embedding.message_id.in_(message_ids),
-                Embedding.model_name == self.model_name,
-                Embedding.model_version == self.model_version
-            ).all()
-        )
-        
-        messages_to_process = [
-            m for m in messages if m.id not in existing_message_ids
-        ]
+        # Only fetch messages that still need an embedding
+        messages_to_process = []
+        for start in range(0, len(message_ids), EMBEDDING_ROWS_PER_STATEMENT):
+            messages_to_process.extend(self._missing_messages_query().filter(
+                Message.id.in_(message_ids[start:start + EMBEDDING_ROWS_PER_STATEMENT])
+            ).all())
+        skipped = len(set(message_ids)) - len(messages_to_process)
         
         if not messages_to_process:
             logger.info("All messages already have embeddings")
             return {
                 "success": 0,
                 "failed": 0,
-                "skipped": len(messages)
+                "skipped": skipped
             }
         
-        # Batch encode
-        model = self._load_model()
-        contents = [m.content for m in messages_to_process]
-        
         try:
-            embedding_vectors = model.encode(contents, show_progress_bar=False)
-            
-            # Create embedding records
-            embeddings = []
-            for message, vector in zip(messages_to_process, embedding_vectors):
-                embedding = Embedding(
-                    message_id=message.id,
-                    embedding=vector.tolist(),
-                    model_name=self.model_name,
-                    model_version=self.model_version
-                )
-                embeddings.append(embedding)
+            result = self._embed_messages(messages_to_process)
+            generated = result["inserted"]
             
-            self.db.bulk_save_objects(embeddings)
-            self.db.commit()
-            
-            logger.info(f"Batch generated {len(embeddings)} embeddings")
+            logger.info(
+                f"Batch generated {generated} embeddings "
+                f"({result['encoded']} encoded, {result['reused']} reused by content hash)"
+            )
             
             return {
-                "success": len(embeddings),
+                "success": generated,
                 "failed": 0,
-                "skipped": len(existing_message_ids)
+                "skipped": skipped + len(messages_to_process) - generated,
+                "encoded": result["encoded"],
+                "reused": result["reused"]
             }
             
         except Exception as e:
@@ -167,54 +625,506 @@ class EmbeddingService:
             return {
                 "success": 0,
                 "failed": len(messages_to_process),
-                "skipped": len(existing_message_ids)
+                "skipped": skipped
             }
     
+    def tenant_size(self, user_id: str) -> int:
+        """Number of embeddings a user has for the current model (cached briefly)"""
+        key = (str(user_id), self.model_name, self.model_version)
+        cached = _tenant_sizes.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        
+        size = self.db.query(func.count(Embedding.id)).filter(
+            Embedding.user_id == user_id,
+            Embedding.model_name == self.model_name,
+            Embedding.model_version == self.model_version
+        ).scalar()
+        _tenant_sizes[key] = (time.monotonic() + settings.SEARCH_TENANT_SIZE_TTL_SECONDS, size)
+        return size
+
+    def _choose_strategy(self, user_id: str, strategy: Optional[str]) -> str:
+        """
+        Exact scan for small tenants (the user_id index narrows the rows and a
+        sort is cheaper and exact), HNSW for large ones
+        """
+        if strategy in (EXACT_STRATEGY, HNSW_STRATEGY):
+            return strategy
+        if self.tenant_size(user_id) <= settings.SEARCH_EXACT_SCAN_MAX_ROWS:
+            return EXACT_STRATEGY
+        return HNSW_STRATEGY
+
+    def _snapshot_for(self, user_id: str):
+        """
+        The user's memory-mapped snapshot when they are small enough for an
+        exact scan. A missing snapshot is written, and a stale one refreshed,
+        in the background; until then this returns None (search falls back
+        to pgvector) or the current generation.
+        """
+        snapshot = embedding_snapshots.open(user_id, self.model_name, self.model_version)
+        if snapshot is None:
+            self._queue_snapshot_write(user_id)
+            return None
+        return _usable_snapshot(snapshot, user_id, self.model_name, self.model_version)
+
+    def _queue_snapshot_write(self, user_id: str):
+        """Write a first snapshot in the background if the tenant is small enough to scan"""
+        if self.tenant_size(user_id) <= settings.EMBEDDING_SNAPSHOT_MAX_ROWS:
+            embedding_snapshots.refresh_in_background(user_id, self.model_name, self.model_version)
+
+    def _configure_hnsw_scan(self, ef_search: Optional[int], candidates: int):
+        """
+        Transaction-local HNSW settings: iterative scan (pgvector >= 0.8) so
+        filtered scans keep walking the graph until LIMIT rows qualify, and
+        ef_search, never below the number of candidates requested
+        """
+        if settings.SEARCH_HNSW_ITERATIVE_SCAN != "off":
+            self.db.execute(
+                text("SELECT set_config('hnsw.iterative_scan', :mode, true)"),
+                {"mode": settings.SEARCH_HNSW_ITERATIVE_SCAN}
+            )
+        ef = min(max(ef_search or settings.SEARCH_EF_SEARCH_DEFAULT, candidates), 1000)
+        self.db.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef, true)"),
+            {"ef": str(ef)}
+        )
+
+    @staticmethod
+    def _tenant_filters(params: Dict, project_ids: Optional[List], agent_ids: Optional[List]):
+        """
+        SQL for the optional agent filter (on embeddings) and project filter
+        (on conversations); binds their params
+        """
+        embedding_filters = ""
+        conversation_filters = ""
+        if agent_ids:
+            embedding_filters += " AND e.agent_id = ANY(CAST(:agent_ids AS uuid[]))"
+            params["agent_ids"] = [str(a) for a in agent_ids]
+        if project_ids:
+            conversation_filters += " AND c.project_id = ANY(CAST(:project_ids AS uuid[]))"
+            params["project_ids"] = [str(p) for p in project_ids]
+        return embedding_filters, conversation_filters
+
+    def build_similar_query(
+        self,
+        user_id: str,
+        query_vector: np.ndarray,
+        limit: int = 20,
+        threshold: float = 0.5,
+        project_ids: Optional[List] = None,
+        agent_ids: Optional[List] = None,
+        strategy: Optional[str] = None,
+        after: Optional[Tuple[float, str]] = None
+    ):
+        """
+        SQL and params for search_similar, and the strategy it uses
+        
+        HNSW: a bare ORDER BY embedding <=> q LIMIT k over embeddings, so the
+        planner can walk idx_embeddings_vector as an ordered KNN scan; the
+        similarity threshold and conversation filters apply afterwards.
+        Exact: a MATERIALIZED CTE keeps the planner from swapping in the global
+        HNSW index, the tenant's rows are fetched by user_id, then sorted.
+        after is the (similarity, message_id) keyset position of the previous
+        page's last row; results are ordered by similarity, then message id.
+        """
+        params = {
+            "user_id": user_id,
+            "model_name": self.model_name,
+            "model_version": self.model_version,
+            "query_vector": vector_literal(query_vector),
+            "threshold": threshold,
+            "limit": limit,
+            "candidates": limit * settings.SEARCH_KNN_CANDIDATE_FACTOR
+        }
+        embedding_filters, conversation_filters = self._tenant_filters(params, project_ids, agent_ids)
+        strategy = self._choose_strategy(user_id, strategy)
+        
+        page_filter = ""
+        if after is not None:
+            params["after_similarity"], params["after_id"] = float(after[0]), str(after[1])
+            page_filter = """
+                AND (1 - {alias}.distance < :after_similarity
+                    OR (1 - {alias}.distance = :after_similarity
+                        AND {alias}.message_id > CAST(:after_id AS uuid)))"""
+            # Lets the KNN scan skip the earlier pages' rows as it walks the graph
+            embedding_filters += (
+                " AND 1 - (e.embedding <=> CAST(:query_vector AS vector)) <= :after_similarity"
+            )
+        
+        if strategy == EXACT_STRATEGY:
+            sql = f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT
+                    e.message_id,
+                    e.embedding <=> CAST(:query_vector AS vector) as distance
+                FROM embeddings e
+                JOIN messages m ON m.id = e.message_id
+                JOIN conversations c ON c.id = m.conversation_id
+                WHERE e.user_id = :user_id
+                    AND e.model_name = :model_name
+                    AND e.model_version = :model_version
+                    AND c.is_deleted = false
+                    {embedding_filters}
+                    {conversation_filters}
+            )
+            SELECT 
+                m.id as message_id,
+                m.content,
+                m.role,
+                c.id as conversation_id,
+                c.title,
+                a.display_name as agent_name,
+                1 - cand.distance as similarity
+            FROM candidates cand
+            JOIN messages m ON m.id = cand.message_id
+            JOIN conversations c ON c.id = m.conversation_id
+            JOIN agents a ON a.id = c.agent_id
+            WHERE 1 - cand.distance > :threshold
+                {page_filter.format(alias="cand")}
+            ORDER BY cand.distance, cand.message_id
+            LIMIT :limit
+            """
+        else:
+            # SQL query with pgvector
+            # Using cosine distance: 1 - (embedding <=> query_vector)
+            sql = f"""
+            WITH nearest AS (
+                SELECT
+                    e.message_id,
+                    e.embedding <=> CAST(:query_vector AS vector) as distance
+                FROM embeddings e
+                WHERE e.user_id = :user_id
+                    AND e.model_name = :model_name
+                    AND e.model_version = :model_version
+                    {embedding_filters}
+                ORDER BY e.embedding <=> CAST(:query_vector AS vector)
+                LIMIT :candidates
+            )
+            SELECT 
+                m.id as message_id,
+                m.content,
+                m.role,
+                c.id as conversation_id,
+                c.title,
+                a.display_name as agent_name,
+                1 - n.distance as similarity
+            FROM nearest n
+            JOIN messages m ON m.id = n.message_id
+            JOIN conversations c ON c.id = m.conversation_id
+            JOIN agents a ON a.id = c.agent_id
+            WHERE c.is_deleted = false
+                AND 1 - n.distance > :threshold
+                {conversation_filters}
+                {page_filter.format(alias="n")}
+            ORDER BY n.distance, n.message_id
+            LIMIT :limit
+            """
+        return sql, params, strategy
+
     def search_similar(
         self,
         query: str,
         user_id: str,
         limit: int = 20,
-        threshold: float = 0.5
+        threshold: float = 0.5,
+        query_vector: Optional[np.ndarray] = None,
+        project_ids: Optional[List] = None,
+        agent_ids: Optional[List] = None,
+        strategy: Optional[str] = None,
+        ef_search: Optional[int] = None,
+        after: Optional[Tuple[float, str]] = None
     ) -> List[Dict]:
         """
         Search for similar messages using vector similarity
+        Pass query_vector to skip encoding (e.g. when it was computed off the event loop)
+        
+        Tenant and agent filters apply to the denormalized columns on
+        embeddings. strategy forces "exact", "hnsw" or "snapshot"; by default
+        tenants under EMBEDDING_SNAPSHOT_MAX_ROWS are scanned from their
+        memory-mapped snapshot (when enabled) and the rest pick exact or HNSW
+        by corpus size. ef_search tunes HNSW recall. after continues from a
+        previous page (see build_similar_query). Scans the snapshot on the
+        calling thread: from the event loop use search_pgvector, or
+        search_memory with SEARCH_BACKEND=memory.
         """
         # Generate query embedding
-        model = self._load_model()
-        query_vector = model.encode(query)
+        if query_vector is None:
+            query_vector = self.encode_query(query)
+        
+        if settings.EMBEDDING_SNAPSHOTS_ENABLED and strategy in (None, SNAPSHOT_STRATEGY):
+            snapshot = self._snapshot_for(user_id)
+            if snapshot is not None:
+                hits = snapshot.search(
+                    query_vector,
+                    limit * settings.SEARCH_KNN_CANDIDATE_FACTOR,
+                    agent_ids=agent_ids,
+                    project_ids=project_ids,
+                    after=after
+                )
+                return self._hydrate_hits(user_id, hits, threshold, limit)
+            if strategy == SNAPSHOT_STRATEGY:
+                strategy = None
+        
+        sql, params, strategy = self.build_similar_query(
+            user_id, query_vector, limit, threshold, project_ids, agent_ids, strategy, after
+        )
+        if strategy == HNSW_STRATEGY:
+            self._configure_hnsw_scan(ef_search, params["candidates"])
+        
+        results = self.db.execute(text(sql), params).fetchall()
+        
+        return [
+            {
+                "message_id": str(r.message_id),
+                "content": r.content,
+                "role": r.role,
+                "conversation_id": str(r.conversation_id),
+                "conversation_title": r.title,
+                "agent_name": r.agent_name,
+                "similarity": float(r.similarity)
+            }
+            for r in results
+        ]
+
+    def _hydrate_hits(self, user_id: str, hits: List, threshold: float, limit: int) -> List[Dict]:
+        """
+        Result rows for (message_id, similarity) hits ranked outside
+        Postgres, in hit order, above threshold and at most limit of them
+        """
+        hits = [(message_id, similarity) for message_id, similarity in hits if similarity > threshold]
+        if not hits:
+            return []
         
-        # SQL query with pgvector
-        # Using cosine distance: 1 - (embedding <=> query_vector)
-        sql = """
-        SELECT 
-            m.id as message_id,
+        # Deleted conversations drop out here until the index is rebuilt
+        rows = self.db.execute(text("""
+            SELECT 
+                m.id as message_id,
+                m.content,
+                m.role,
+                c.id as conversation_id,
+                c.title,
+                a.display_name as agent_name
+            FROM messages m
+            JOIN conversations c ON c.id = m.conversation_id
+            JOIN agents a ON a.id = c.agent_id
+            WHERE m.id = ANY(CAST(:message_ids AS uuid[]))
+                AND c.user_id = :user_id
+                AND c.is_deleted = false
+        """), {
+            "message_ids": [message_id for message_id, _ in hits],
+            "user_id": user_id
+        }).fetchall()
+        by_id = {str(r.message_id): r for r in rows}
+        
+        results = []
+        for message_id, similarity in hits:
+            r = by_id.get(message_id)
+            if r is None:
+                continue
+            results.append({
+                "message_id": str(r.message_id),
+                "content": r.content,
+                "role": r.role,
+                "conversation_id": str(r.conversation_id),
+                "conversation_title": r.title,
+                "agent_name": r.agent_name,
+                "similarity": similarity
+            })
+            if len(results) == limit:
+                break
+        return results
+
+    def search_similar_conversations(
+        self,
+        conversation_id: str,
+        user_id: str,
+        limit: int = 10,
+        threshold: float = 0.0,
+        project_ids: Optional[List] = None,
+        agent_ids: Optional[List] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Conversations whose centroid is nearest to the given one's,
+        with one KNN lookup on idx_conversation_embeddings_vector
+        """
+        source = self.db.query(ConversationEmbedding.embedding).filter(
+            ConversationEmbedding.conversation_id == conversation_id,
+            ConversationEmbedding.model_name == self.model_name,
+            ConversationEmbedding.model_version == self.model_version
+        ).scalar()
+        if source is None:
+            return []
+        
+        params = {
+            "conversation_id": str(conversation_id),
+            "user_id": user_id,
+            "model_name": self.model_name,
+            "model_version": self.model_version,
+            "query_vector": vector_literal(source),
+            "threshold": threshold,
+            "limit": limit,
+            "candidates": limit * settings.SEARCH_KNN_CANDIDATE_FACTOR
+        }
+        embedding_filters, conversation_filters = self._tenant_filters(params, project_ids, agent_ids)
+        embedding_filters = embedding_filters.replace("e.agent_id", "ce.agent_id")
+        self._configure_hnsw_scan(ef_search, params["candidates"])
+        
+        sql = f"""
+        WITH nearest AS (
+            SELECT
+                ce.conversation_id,
+                ce.embedding <=> CAST(:query_vector AS vector) AS distance
+            FROM conversation_embeddings ce
+            WHERE ce.user_id = :user_id
+                AND ce.model_name = :model_name
+                AND ce.model_version = :model_version
+                AND ce.conversation_id <> CAST(:conversation_id AS uuid)
+                {embedding_filters}
+            ORDER BY ce.embedding <=> CAST(:query_vector AS vector)
+            LIMIT :candidates
+        )
+        SELECT
+            c.id AS conversation_id,
+            c.title,
+            c.message_count,
+            c.last_message_at,
+            a.display_name AS agent_name,
+            1 - n.distance AS similarity
+        FROM nearest n
+        JOIN conversations c ON c.id = n.conversation_id
+        JOIN agents a ON a.id = c.agent_id
+        WHERE c.is_deleted = false
+            AND 1 - n.distance > :threshold
+            {conversation_filters}
+        ORDER BY n.distance
+        LIMIT :limit
+        """
+        results = self.db.execute(text(sql), params).fetchall()
+        
+        return [
+            {
+                "conversation_id": str(r.conversation_id),
+                "conversation_title": r.title,
+                "agent_name": r.agent_name,
+                "message_count": r.message_count,
+                "last_message_at": r.last_message_at,
+                "similarity": float(r.similarity)
+            }
+            for r in results
+        ]
+
+    def search_hybrid(
+        self,
+        query: str,
+        user_id: str,
+        limit: int = 20,
+        threshold: float = 0.5,
+        rrf_k: int = 60,
+        candidate_depth: Optional[int] = None,
+        project_ids: Optional[List] = None,
+        agent_ids: Optional[List] = None,
+        query_vector: Optional[np.ndarray] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Hybrid semantic + keyword search fused with Reciprocal Rank Fusion
+        in a single statement. Each leg ranks only message ids; content,
+        conversation and agent data are joined for the final top-k only.
+        """
+        if query_vector is None:
+            query_vector = self.encode_query(query)
+        
+        params = {
+            "query": query,
+            "query_vector": vector_literal(query_vector),
+            "user_id": user_id,
+            "model_name": self.model_name,
+            "model_version": self.model_version,
+            "threshold": threshold,
+            "rrf_k": rrf_k,
+            "depth": candidate_depth or limit * 2,
+            "limit": limit
+        }
+        params["knn_depth"] = params["depth"] * settings.SEARCH_KNN_CANDIDATE_FACTOR
+        
+        embedding_filters, conversation_filters = self._tenant_filters(params, project_ids, agent_ids)
+        # The keyword leg has no embeddings row; filter agents on the conversation
+        keyword_filters = embedding_filters.replace("e.agent_id", "c.agent_id") + conversation_filters
+        self._configure_hnsw_scan(ef_search, params["knn_depth"])
+        
+        sql = f"""
+        WITH nearest AS (
+            SELECT
+                e.message_id,
+                e.embedding <=> CAST(:query_vector AS vector) AS distance
+            FROM embeddings e
+            WHERE e.user_id = :user_id
+                AND e.model_name = :model_name
+                AND e.model_version = :model_version
+                {embedding_filters}
+            ORDER BY e.embedding <=> CAST(:query_vector AS vector)
+            LIMIT :knn_depth
+        ),
+        semantic_candidates AS (
+            SELECT n.message_id, n.distance
+            FROM nearest n
+            JOIN messages m ON m.id = n.message_id
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE c.is_deleted = false
+                AND 1 - n.distance > :threshold
+                {conversation_filters}
+            ORDER BY n.distance
+            LIMIT :depth
+        ),
+        semantic AS (
+            SELECT
+                message_id,
+                1 - distance AS similarity,
+                row_number() OVER (ORDER BY distance) AS rank
+            FROM semantic_candidates
+        ),
+        keyword AS (
+            SELECT
+                m.id AS message_id,
+                row_number() OVER (ORDER BY ts_rank_cd(m.search_vector, q.query) DESC, m.id) AS rank
+            FROM messages m
+            JOIN conversations c ON c.id = m.conversation_id
+            CROSS JOIN plainto_tsquery('english', :query) AS q(query)
+            WHERE c.user_id = :user_id
+                AND c.is_deleted = false
+                AND m.search_vector @@ q.query
+                {keyword_filters}
+            ORDER BY ts_rank_cd(m.search_vector, q.query) DESC, m.id
+            LIMIT :depth
+        ),
+        fused AS (
+            SELECT
+                COALESCE(s.message_id, k.message_id) AS message_id,
+                s.similarity,
+                COALESCE(1.0 / (:rrf_k + s.rank), 0) + COALESCE(1.0 / (:rrf_k + k.rank), 0) AS score
+            FROM semantic s
+            FULL OUTER JOIN keyword k ON k.message_id = s.message_id
+            ORDER BY score DESC, message_id
+            LIMIT :limit
+        )
+        SELECT
+            f.message_id,
             m.content,
             m.role,
             c.id as conversation_id,
             c.title,
             a.display_name as agent_name,
-            1 - (e.embedding <=> :query_vector) as similarity
-        FROM messages m
-        JOIN embeddings e ON e.message_id = m.id
+            f.similarity,
+            f.score
+        FROM fused f
+        JOIN messages m ON m.id = f.message_id
         JOIN conversations c ON c.id = m.conversation_id
         JOIN agents a ON a.id = c.agent_id
-        WHERE c.user_id = :user_id
-            AND c.is_deleted = false
-            AND 1 - (e.embedding <=> :query_vector) > :threshold
-        ORDER BY similarity DESC
-        LIMIT :limit
+        ORDER BY f.score DESC, f.message_id
         """
         
-        results = self.db.execute(
-            sql,
-            {
-                "user_id": user_id,
-                "query_vector": query_vector.tolist(),
-                "threshold": threshold,
-                "limit": limit
-            }
-        ).fetchall()
+        results = self.db.execute(text(sql), params).fetchall()
         
         return [
             {
@@ -224,7 +1134,7 @@ class EmbeddingService:
                 "conversation_id": str(r.conversation_id),
                 "conversation_title": r.title,
                 "agent_name": r.agent_name,
-                "similarity": float(r.similarity)
+                "similarity": float(r.similarity) if r.similarity is not None else None
             }
             for r in results
         ]
@@ -0,0 +1,431 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.executors import executors, INDEX_POOL
+from app.models.conversation import Conversation, Message
+from app.models.embedding import Embedding
+
+logger = logging.getLogger(__name__)
+
+# UUIDs are stored as their 16 raw bytes; a missing agent/project is all zeros.
+# They are mapped as two big-endian uint64 words per row: unlike "S16", which
+# drops trailing NUL bytes, this keeps all 16 bytes, and (high, low) order is
+# byte order, i.e. Postgres' uuid order
+UUID_DTYPE = np.dtype(">u8")
+UUID_WORDS = 2
+NULL_UUID = bytes(16)
+
+VECTORS_FILE = "vectors.f16"
+MESSAGE_IDS_FILE = "message_ids.bin"
+AGENT_IDS_FILE = "agent_ids.bin"
+PROJECT_IDS_FILE = "project_ids.bin"
+META_FILE = "meta.json"
+# Present in a user directory when the next refresh must write a new generation
+REBUILD_FILE = "rebuild"
+
+# Rows committed slightly out of created_at order are picked up by re-reading
+# this far behind the watermark; already present ids are skipped. created_at
+# defaults to clock_timestamp(), so the overlap only has to cover the time
+# between an insert and its commit, not the whole embed transaction
+WATERMARK_OVERLAP = timedelta(seconds=60)
+
+SnapshotKey = Tuple[str, str, str]
+
+def _uuid_bytes(value) -> bytes:
+    if value is None:
+        return NULL_UUID
+    return value.bytes if isinstance(value, uuid.UUID) else uuid.UUID(str(value)).bytes
+
+def _uuid_words(values) -> np.ndarray:
+    """(n, 2) id array for UUIDs (or None)"""
+    values = list(values)
+    return np.frombuffer(
+        b"".join(_uuid_bytes(v) for v in values), dtype=UUID_DTYPE
+    ).reshape(len(values), UUID_WORDS)
+
+def _ids_in(ids: np.ndarray, values) -> np.ndarray:
+    """Row mask of ids equal to any of a few UUIDs"""
+    mask = np.zeros(len(ids), dtype=bool)
+    for high, low in _uuid_words(values):
+        mask |= (ids[:, 0] == high) & (ids[:, 1] == low)
+    return mask
+
+def _map(path: str, dtype, shape):
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+class EmbeddingSnapshot:
+    """
+    Read-only view of one user's snapshot
+
+    The float16 matrix and the id arrays are memory-mapped, so the corpus is
+    never copied into the process and its pages are shared through the OS
+    page cache by every worker on the host.
+    """
+
+    def __init__(self, path: str, meta: Dict):
+        self.path = path
+        self.meta = meta
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        if self.count:
+            self.vectors = _map(os.path.join(path, VECTORS_FILE), np.float16, (self.count, self.dim))
+            id_shape = (self.count, UUID_WORDS)
+            self.message_ids = _map(os.path.join(path, MESSAGE_IDS_FILE), UUID_DTYPE, id_shape)
+            self.agent_ids = _map(os.path.join(path, AGENT_IDS_FILE), UUID_DTYPE, id_shape)
+            self.project_ids = _map(os.path.join(path, PROJECT_IDS_FILE), UUID_DTYPE, id_shape)
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float16)
+            self.message_ids = self.agent_ids = self.project_ids = np.zeros((0, UUID_WORDS), dtype=UUID_DTYPE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def age_seconds(self) -> float:
+        return time.time() - self.meta["refreshed_at"]
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        agent_ids: Optional[List] = None,
+        project_ids: Optional[List] = None,
+        after: Optional[Tuple[float, str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Exact top-k (message_id, cosine similarity), best first with ties by
+        id; after skips everything up to a previous page's last (similarity, id)
+        """
+        if not self.count or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        mask = None
+        if agent_ids:
+            mask = _ids_in(self.agent_ids, agent_ids)
+        if project_ids:
+            project_mask = _ids_in(self.project_ids, project_ids)
+            mask = project_mask if mask is None else mask & project_mask
+
+        # Upcast a bounded chunk at a time instead of the whole corpus
+        scores = np.empty(self.count, dtype=np.float32)
+        chunk = settings.EMBEDDING_SNAPSHOT_CHUNK_ROWS
+        for start in range(0, self.count, chunk):
+            block = self.vectors[start:start + chunk]
+            np.dot(block.astype(np.float32), query, out=scores[start:start + len(block)])
+        if mask is not None:
+            scores[~mask] = -np.inf
+        if after is not None:
+            after_score = np.float32(after[0])
+            (after_high, after_low), = _uuid_words([after[1]])
+            ties = np.flatnonzero(scores == after_score)
+            tie_ids = self.message_ids[ties]
+            seen = (tie_ids[:, 0] < after_high) | ((tie_ids[:, 0] == after_high) & (tie_ids[:, 1] <= after_low))
+            scores[scores > after_score] = -np.inf
+            scores[ties[seen]] = -np.inf
+
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        # argpartition cuts through a run of equal scores arbitrarily; take
+        # the whole run so the id tie-break decides which rows make the page
+        kth = scores[top].min()
+        if kth != -np.inf:
+            top = np.flatnonzero(scores >= kth)
+        top_ids = self.message_ids[top]
+        top = top[np.lexsort((top_ids[:, 1], top_ids[:, 0], -scores[top]))][:k]
+        return [
+            (str(uuid.UUID(bytes=self.message_ids[i].tobytes())), float(scores[i]))
+            for i in top
+            if scores[i] != -np.inf
+        ]
+
+class EmbeddingSnapshotStore:
+    """
+    Per-user float16 snapshots of the embeddings table on local disk
+
+    Layout: {EMBEDDING_SNAPSHOT_DIR}/{model}@{version}/{user_id}/ holds
+    meta.json, which names the current generation directory and its row
+    count, and one directory per generation with the raw arrays. Refreshes
+    append new rows to the current generation and then rewrite meta.json
+    atomically, so readers that mapped the old count are never disturbed;
+    a rebuild writes a fresh generation and drops deleted rows. Appends
+    only ever add rows, so changes to rows already in the snapshot (edited
+    or deleted messages, conversations moved between projects) go through
+    mark_rebuild.
+
+    Searches never refresh inline: refresh_in_background queues the work on
+    the index pool and the current generation keeps serving until it lands.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        # key -> (meta mtime_ns, snapshot)
+        self._open: Dict[SnapshotKey, Tuple[int, EmbeddingSnapshot]] = {}
+        self._stale: Set[str] = set()
+        self._refreshing: Set[SnapshotKey] = set()
+        self._lock = threading.Lock()
+
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.rows_appended = 0
+
+    def _user_dir(self, key: SnapshotKey) -> str:
+        user_id, model_name, model_version = key
+        model_dir = f"{model_name.replace('/', '__')}@{model_version}"
+        return os.path.join(self.root, model_dir, user_id)
+
+    def open(self, user_id: str, model_name: str, model_version: str) -> Optional[EmbeddingSnapshot]:
+        """The user's current snapshot, or None if none was written yet"""
+        key = (str(user_id), model_name, model_version)
+        meta_path = os.path.join(self._user_dir(key), META_FILE)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._open.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        snapshot = EmbeddingSnapshot(os.path.join(self._user_dir(key), meta["generation"]), meta)
+        with self._lock:
+            self._open[key] = (mtime, snapshot)
+        return snapshot
+
+    def needs_refresh(self, snapshot: EmbeddingSnapshot, user_id: str) -> bool:
+        return (
+            str(user_id) in self._stale
+            or snapshot.age_seconds() > settings.EMBEDDING_SNAPSHOT_REFRESH_SECONDS
+            or os.path.exists(os.path.join(os.path.dirname(snapshot.path), REBUILD_FILE))
+        )
+
+    def mark_stale(self, user_ids):
+        """Refresh these users' snapshots on their next search"""
+        with self._lock:
+            self._stale.update(str(u) for u in user_ids if u is not None)
+
+    def mark_rebuild(self, user_ids):
+        """
+        Write a new generation on these users' next refresh, for every model
+        they have a snapshot for. The marker is a file, so every process
+        sharing the snapshot directory sees it.
+        """
+        user_ids = {str(u) for u in user_ids if u is not None}
+        try:
+            model_dirs = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for model_dir in model_dirs:
+            for user_id in user_ids:
+                user_dir = os.path.join(self.root, model_dir, user_id)
+                if os.path.isdir(user_dir):
+                    with open(os.path.join(user_dir, REBUILD_FILE), "w"):
+                        pass
+
+    def refresh_in_background(
+        self,
+        user_id: str,
+        model_name: str,
+        model_version: str,
+        rebuild: bool = False
+    ) -> bool:
+        """
+        Queue a refresh in its own session on the index pool, unless one is
+        already queued for this snapshot or the pool is saturated
+        """
+        key = (str(user_id), model_name, model_version)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+        try:
+            executors.get(INDEX_POOL).submit(self._refresh_job, key, rebuild)
+        except Exception as e:
+            with self._lock:
+                self._refreshing.discard(key)
+            logger.warning(f"Embedding snapshot refresh not queued for user {key[0]}: {e}")
+            return False
+        return True
+
+    def _refresh_job(self, key: SnapshotKey, rebuild: bool):
+        db = SessionLocal()
+        try:
+            self.refresh(db, *key, rebuild=rebuild)
+        except Exception as e:
+            logger.warning(f"Embedding snapshot refresh failed for user {key[0]}: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def refresh(
+        self,
+        db: Session,
+        user_id: str,
+        model_name: str,
+        model_version: str,
+        rebuild: bool = False
+    ) -> EmbeddingSnapshot:
+        """
+        Bring the snapshot up to date: append embeddings created since the
+        last refresh, or write a new generation when there is none yet,
+        rebuild is set or mark_rebuild was called. Serialized across processes with a blocking file
+        lock, so call it from a worker thread or Celery, not the event loop.
+        """
+        key = (str(user_id), model_name, model_version)
+        user_dir = self._user_dir(key)
+        os.makedirs(user_dir, exist_ok=True)
+
+        with self._lock:
+            self._stale.discard(key[0])
+
+        with open(os.path.join(user_dir, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Cleared before reading rows, so a mark made during the rebuild
+            # triggers another one
+            marker = os.path.join(user_dir, REBUILD_FILE)
+            if os.path.exists(marker):
+                os.remove(marker)
+                rebuild = True
+            current = None if rebuild else self.open(*key)
+            if current is None:
+                self._write_generation(db, key, user_dir)
+                self.rebuilds += 1
+            else:
+                self._append(db, key, user_dir, current)
+                self.refreshes += 1
+        return self.open(*key)
+
+    def _rows_query(self, db: Session, key: SnapshotKey):
+        user_id, model_name, model_version = key
+        return db.query(
+            Embedding.message_id,
+            Embedding.agent_id,
+            Conversation.project_id,
+            Embedding.embedding,
+            Embedding.created_at
+        ).join(
+            Message, Message.id == Embedding.message_id
+        ).join(
+            Conversation, Conversation.id == Message.conversation_id
+        ).filter(
+            Embedding.user_id == user_id,
+            Embedding.model_name == model_name,
+            Embedding.model_version == model_version,
+            Conversation.is_deleted == False
+        ).order_by(Embedding.created_at)
+
+    @staticmethod
+    def _write_rows(path: str, rows: list, dim: int, start: int):
+        """
+        Write rows at row offset start; anything past it (left by an append
+        that died before updating meta.json) is truncated first
+        """
+        vectors = np.asarray([r.embedding for r in rows], dtype=np.float32).reshape(-1, dim)
+        norms = np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        arrays = [
+            (VECTORS_FILE, (vectors / norms).astype(np.float16).tobytes(), dim * 2),
+            (MESSAGE_IDS_FILE, b"".join(_uuid_bytes(r.message_id) for r in rows), 16),
+            (AGENT_IDS_FILE, b"".join(_uuid_bytes(r.agent_id) for r in rows), 16),
+            (PROJECT_IDS_FILE, b"".join(_uuid_bytes(r.project_id) for r in rows), 16),
+        ]
+        for name, data, row_bytes in arrays:
+            with open(os.path.join(path, name), "r+b" if start else "wb") as f:
+                f.truncate(start * row_bytes)
+                f.seek(start * row_bytes)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _write_meta(user_dir: str, meta: Dict):
+        tmp_path = os.path.join(user_dir, f"{META_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(user_dir, META_FILE))
+
+    @staticmethod
+    def _watermark(rows: list, previous: Optional[str]) -> Optional[str]:
+        stamps = [r.created_at for r in rows if r.created_at is not None]
+        if not stamps:
+            return previous
+        latest = max(stamps)
+        if previous is not None:
+            latest = max(latest, datetime.fromisoformat(previous))
+        return latest.isoformat()
+
+    def _write_generation(self, db: Session, key: SnapshotKey, user_dir: str):
+        rows = self._rows_query(db, key).all()
+        dim = len(rows[0].embedding) if rows else settings.EMBEDDING_DIMENSION
+        generation = f"gen-{time.time_ns()}"
+        path = os.path.join(user_dir, generation)
+        os.makedirs(path)
+        self._write_rows(path, rows, dim, 0)
+        self._write_meta(user_dir, {
+            "generation": generation,
+            "count": len(rows),
+            "dim": dim,
+            "watermark": self._watermark(rows, None),
+            "refreshed_at": time.time(),
+        })
+        self.rows_appended += len(rows)
+
+        # Older generations stay valid for readers that still map them
+        for name in os.listdir(user_dir):
+            if name.startswith("gen-") and name != generation:
+                shutil.rmtree(os.path.join(user_dir, name), ignore_errors=True)
+
+        logger.info(f"Wrote embedding snapshot for user {key[0]}: {len(rows)} vectors")
+
+    def _append(self, db: Session, key: SnapshotKey, user_dir: str, current: EmbeddingSnapshot):
+        query = self._rows_query(db, key)
+        if current.meta["watermark"] is not None:
+            since = datetime.fromisoformat(current.meta["watermark"]) - WATERMARK_OVERLAP
+            query = query.filter(Embedding.created_at >= since)
+        rows = query.all()
+
+        if rows and current.count:
+            known = {row.tobytes() for row in current.message_ids}
+            rows = [r for r in rows if _uuid_bytes(r.message_id) not in known]
+
+        if rows:
+            self._write_rows(current.path, rows, current.dim, current.count)
+            self.rows_appended += len(rows)
+        self._write_meta(user_dir, dict(
+            current.meta,
+            count=current.count + len(rows),
+            watermark=self._watermark(rows, current.meta["watermark"]),
+            refreshed_at=time.time()
+        ))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "open_snapshots": len(self._open),
+                "mapped_bytes": sum(s.vectors.nbytes for _, s in self._open.values()),
+                "refreshes": self.refreshes,
+                "rebuilds": self.rebuilds,
+                "rows_appended": self.rows_appended,
+                "stale_users": len(self._stale),
+                "refreshing": len(self._refreshing),
+            }
+
+embedding_snapshots = EmbeddingSnapshotStore(settings.EMBEDDING_SNAPSHOT_DIR)
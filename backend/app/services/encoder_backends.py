@@ -0,0 +1,222 @@
+from typing import Dict, List, Optional
+import numpy as np
+import json
+import os
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TORCH_BACKEND = "torch"
+ONNX_BACKEND = "onnx"
+ONNX_INT8_BACKEND = "onnx-int8"
+BACKENDS = (TORCH_BACKEND, ONNX_BACKEND, ONNX_INT8_BACKEND)
+
+# Small built-in corpus for parity checks between backends
+PARITY_SAMPLE = [
+    "How do I reverse a linked list in Python?",
+    "Here is an iterative solution that keeps track of the previous node.",
+    "Summarize the main causes of the French Revolution.",
+    "continue",
+    "You are a helpful assistant.",
+    "Write a SQL query that returns the top 10 customers by revenue.",
+    "The function raises a KeyError when the dictionary does not contain the key.",
+    "Can you explain the difference between a process and a thread?",
+    "Sure! Let's break the problem down into smaller steps.",
+    "Translate 'good morning' into Spanish, French and German.",
+    "What is the time complexity of binary search?",
+    "I'm getting a CORS error when calling the API from the browser extension.",
+]
+
+class TorchBackend:
+    """Reference backend: sentence-transformers on PyTorch"""
+
+    name = TORCH_BACKEND
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        return self.model.encode(
+            sentences,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            **kwargs
+        )
+
+    def memory_bytes(self) -> int:
+        return sum(p.numel() * p.element_size() for p in self.model.parameters())
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(settings.EMBEDDING_ONNX_DIR, model_name.replace("/", "__"))
+
+def export_onnx(model_name: str) -> str:
+    """
+    Export the transformer of a sentence-transformers model to ONNX, together
+    with its tokenizer and pooling settings. Returns the export directory.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize
+
+    export_dir = _export_dir(model_name)
+    model_path = os.path.join(export_dir, "model.onnx")
+    if os.path.exists(model_path):
+        return export_dir
+
+    os.makedirs(export_dir, exist_ok=True)
+    logger.info(f"Exporting {model_name} to ONNX in {export_dir}")
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer),
+            tuple(dummy[n] for n in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    tokenizer.save_pretrained(export_dir)
+    with open(os.path.join(export_dir, "pooling.json"), "w") as f:
+        json.dump({
+            "max_seq_length": st_model.max_seq_length,
+            "normalize": any(isinstance(m, Normalize) for m in st_model),
+        }, f)
+    return export_dir
+
+def quantize_onnx(export_dir: str) -> str:
+    """Dynamically quantize the exported model's weights to int8"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = os.path.join(export_dir, "model.onnx")
+    target = os.path.join(export_dir, "model.int8.onnx")
+    if not os.path.exists(target):
+        logger.info(f"Quantizing {source} to int8")
+        quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    return target
+
+class OnnxBackend:
+    """ONNX Runtime CPU backend with mean pooling, optionally int8-quantized"""
+
+    def __init__(self, model_name: str, quantized: bool = False):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND requires onnxruntime; install it or use the torch backend"
+            ) from e
+        from transformers import AutoTokenizer
+
+        self.name = ONNX_INT8_BACKEND if quantized else ONNX_BACKEND
+        export_dir = export_onnx(model_name)
+        self.model_path = (
+            quantize_onnx(export_dir) if quantized else os.path.join(export_dir, "model.onnx")
+        )
+        with open(os.path.join(export_dir, "pooling.json")) as f:
+            pooling = json.load(f)
+        self.max_seq_length = pooling["max_seq_length"]
+        self.normalize = pooling["normalize"]
+
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.EMBEDDING_ONNX_THREADS:
+            options.intra_op_num_threads = settings.EMBEDDING_ONNX_THREADS
+        self.session = ort.InferenceSession(
+            self.model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            sentences,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean pooling over non-padding tokens
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Length-sorted batches keep padding small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            for i, vector in zip(chunk, self._encode_batch([texts[i] for i in chunk])):
+                out[i] = vector
+        vectors = np.stack(out)
+        return vectors[0] if single else vectors
+
+    def memory_bytes(self) -> int:
+        return os.path.getsize(self.model_path)
+
+def embedding_version(model_version: Optional[str] = None, backend: Optional[str] = None) -> str:
+    """
+    Version tag stored on embeddings and used in query cache, index and
+    snapshot keys. Vectors from non-torch backends (quantized ones in
+    particular) are not interchangeable with torch's, so they are tagged
+    with the backend, e.g. "1.0+onnx-int8"; torch keeps the plain version.
+    """
+    model_version = model_version or settings.EMBEDDING_MODEL_VERSION
+    backend = backend or settings.EMBEDDING_BACKEND
+    return model_version if backend == TORCH_BACKEND else f"{model_version}+{backend}"
+
+def load_backend(model_name: str, backend: str):
+    """Instantiate an encoder backend by name"""
+    if backend == TORCH_BACKEND:
+        return TorchBackend(model_name)
+    if backend == ONNX_BACKEND:
+        return OnnxBackend(model_name, quantized=False)
+    if backend == ONNX_INT8_BACKEND:
+        return OnnxBackend(model_name, quantized=True)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+def parity_check(candidate, reference, sentences: List[str] = PARITY_SAMPLE) -> Dict:
+    """Cosine drift of a backend's vectors against a reference backend"""
+    a = np.asarray(candidate.encode(sentences), dtype=np.float32)
+    b = np.asarray(reference.encode(sentences), dtype=np.float32)
+    a /= np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b /= np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    cosines = (a * b).sum(axis=1)
+    return {
+        "sentences": len(sentences),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "max_drift": float(1.0 - cosines.min()),
+    }
@@ -0,0 +1,270 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import UUID
+import io
+import json
+
+from app.core.config import settings
+from app.models.conversation import Conversation, Message
+from app.models.embedding import Embedding
+from app.services.encoder_backends import embedding_version
+from app.services.ingestion import format_digest
+
+NDJSON_FORMAT = "ndjson"
+ARROW_FORMAT = "arrow"
+PARQUET_FORMAT = "parquet"
+EXPORT_FORMATS = (NDJSON_FORMAT, ARROW_FORMAT, PARQUET_FORMAT)
+
+# Coalesce NDJSON lines into response chunks of about this size
+_NDJSON_FLUSH_BYTES = 64 * 1024
+
+def load_pyarrow():
+    """pyarrow is optional; Arrow and Parquet exports are 501 without it"""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+        return pyarrow
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Arrow/Parquet export requires pyarrow on the server"
+        )
+
+def _export_query(
+    user_id: UUID,
+    agent_id: Optional[UUID],
+    project_id: Optional[UUID],
+    include_deleted: bool,
+    include_embeddings: bool
+):
+    """
+    Conversation and message columns (no ORM entities), one row per message
+    and conversations without messages once, in (created_at, id, sequence)
+    order. That order follows idx_conversations_user_created and the
+    (conversation_id, sequence_number) unique index, so a cursor can start
+    returning rows without sorting the whole corpus.
+    """
+    columns = [
+        Conversation.id.label("conversation_id"),
+        Conversation.agent_id,
+        Conversation.project_id,
+        Conversation.external_id.label("conversation_external_id"),
+        Conversation.title,
+        Conversation.created_at.label("conversation_created_at"),
+        Conversation.updated_at,
+        Conversation.is_archived,
+        Conversation.is_deleted,
+        Conversation.content_digest,
+        Conversation.metadata.label("conversation_metadata"),
+        Message.id.label("message_id"),
+        Message.role,
+        Message.content,
+        Message.sequence_number,
+        Message.external_id.label("message_external_id"),
+        Message.model,
+        Message.tokens,
+        Message.created_at.label("message_created_at"),
+        Message.metadata.label("message_metadata"),
+    ]
+    if include_embeddings:
+        columns.append(Embedding.embedding)
+
+    query = select(*columns).select_from(Conversation).outerjoin(
+        Message, Message.conversation_id == Conversation.id
+    )
+    if include_embeddings:
+        query = query.outerjoin(
+            Embedding,
+            and_(
+                Embedding.message_id == Message.id,
+                Embedding.model_name == settings.EMBEDDING_MODEL,
+                Embedding.model_version == embedding_version()
+            )
+        )
+
+    query = query.where(Conversation.user_id == user_id)
+    if agent_id:
+        query = query.where(Conversation.agent_id == agent_id)
+    if project_id:
+        query = query.where(Conversation.project_id == project_id)
+    if not include_deleted:
+        query = query.where(Conversation.is_deleted == False)
+
+    return query.order_by(
+        Conversation.created_at, Conversation.id, Message.sequence_number
+    ).execution_options(yield_per=settings.EXPORT_YIELD_PER)
+
+async def _stream_rows(db: AsyncSession, query) -> AsyncIterator[List]:
+    """Partitions of EXPORT_YIELD_PER rows from a server-side cursor"""
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield partition
+
+def _vector_list(value) -> Optional[List[float]]:
+    return None if value is None else [float(x) for x in value]
+
+def _conversation_record(row) -> Dict:
+    return {
+        "id": row.conversation_id,
+        "agent_id": row.agent_id,
+        "project_id": row.project_id,
+        "external_id": row.conversation_external_id,
+        "title": row.title,
+        "created_at": row.conversation_created_at,
+        "updated_at": row.updated_at,
+        "is_archived": bool(row.is_archived),
+        "is_deleted": bool(row.is_deleted),
+        "content_digest": format_digest(row.content_digest),
+        "metadata": row.conversation_metadata or {},
+        "messages": []
+    }
+
+def _message_record(row, include_embeddings: bool) -> Dict:
+    record = {
+        "id": row.message_id,
+        "role": row.role,
+        "content": row.content,
+        "sequence_number": row.sequence_number,
+        "external_id": row.message_external_id,
+        "model": row.model,
+        "tokens": row.tokens,
+        "created_at": row.message_created_at,
+        "metadata": row.message_metadata or {}
+    }
+    if include_embeddings:
+        record["embedding"] = _vector_list(row.embedding)
+    return record
+
+async def export_ndjson(db: AsyncSession, include_embeddings: bool, **filters) -> AsyncIterator[bytes]:
+    """
+    One JSON object per conversation with its messages nested, in the
+    ConversationCreate shape, so an export can be fed back to /import.
+    Only the conversation being assembled is held in memory.
+    """
+    query = _export_query(include_embeddings=include_embeddings, **filters)
+    current = None
+    buffer = io.StringIO()
+
+    def write(record):
+        buffer.write(json.dumps(record, default=str))
+        buffer.write("\n")
+
+    async for partition in _stream_rows(db, query):
+        for row in partition:
+            if current is None or current["id"] != row.conversation_id:
+                if current is not None:
+                    write(current)
+                current = _conversation_record(row)
+            if row.message_id is not None:
+                current["messages"].append(_message_record(row, include_embeddings))
+        if buffer.tell() >= _NDJSON_FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer = io.StringIO()
+
+    if current is not None:
+        write(current)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out and dropped"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _arrow_schema(pa, include_embeddings: bool):
+    fields = [
+        pa.field("conversation_id", pa.string()),
+        pa.field("agent_id", pa.string()),
+        pa.field("project_id", pa.string()),
+        pa.field("conversation_external_id", pa.string()),
+        pa.field("title", pa.string()),
+        pa.field("conversation_created_at", pa.timestamp("us", tz="UTC")),
+        pa.field("is_deleted", pa.bool_()),
+        pa.field("message_id", pa.string()),
+        pa.field("role", pa.string()),
+        pa.field("content", pa.large_string()),
+        pa.field("sequence_number", pa.int32()),
+        pa.field("model", pa.string()),
+        pa.field("tokens", pa.int32()),
+        pa.field("message_created_at", pa.timestamp("us", tz="UTC")),
+    ]
+    if include_embeddings:
+        fields.append(pa.field("embedding", pa.list_(pa.float32(), settings.EMBEDDING_DIMENSION)))
+    return pa.schema(fields)
+
+def _arrow_batch(pa, schema, partition, include_embeddings: bool):
+    def text(value):
+        return None if value is None else str(value)
+
+    columns = {
+        "conversation_id": [text(r.conversation_id) for r in partition],
+        "agent_id": [text(r.agent_id) for r in partition],
+        "project_id": [text(r.project_id) for r in partition],
+        "conversation_external_id": [r.conversation_external_id for r in partition],
+        "title": [r.title for r in partition],
+        "conversation_created_at": [r.conversation_created_at for r in partition],
+        "is_deleted": [bool(r.is_deleted) for r in partition],
+        "message_id": [text(r.message_id) for r in partition],
+        "role": [r.role for r in partition],
+        "content": [r.content for r in partition],
+        "sequence_number": [r.sequence_number for r in partition],
+        "model": [r.model for r in partition],
+        "tokens": [r.tokens for r in partition],
+        "message_created_at": [r.message_created_at for r in partition],
+    }
+    if include_embeddings:
+        columns["embedding"] = [_vector_list(r.embedding) for r in partition]
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+async def export_arrow(db: AsyncSession, fmt: str, include_embeddings: bool, **filters) -> AsyncIterator[bytes]:
+    """
+    Flat message rows (one per message, conversation columns repeated) as an
+    Arrow IPC stream or a Parquet file, one record batch / row group per
+    cursor partition. Call load_pyarrow() before starting the response.
+    """
+    pa = load_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, include_embeddings)
+    sink = _DrainableSink()
+    if fmt == PARQUET_FORMAT:
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+        write = lambda batch: writer.write_table(pa.Table.from_batches([batch]))  # noqa: E731
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+        write = writer.write_batch
+
+    try:
+        query = _export_query(include_embeddings=include_embeddings, **filters)
+        async for partition in _stream_rows(db, query):
+            write(_arrow_batch(pa, schema, partition, include_embeddings))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
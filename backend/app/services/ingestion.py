@@ -0,0 +1,346 @@
+from sqlalchemy import select, delete, func, literal_column, or_, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+import hashlib
+import logging
+
+from app.core.cache import AGENTS_NAMESPACE, response_cache, user_namespace
+from app.core.config import settings
+from app.models.conversation import Conversation, Message
+from app.models.embedding import Embedding
+from app.services.agent_registry import agent_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TITLE = "Untitled Conversation"
+
+# Postgres caps a statement at 32767 bind parameters; messages bind 8 each
+MESSAGE_COLUMNS = 8
+
+DIGEST_MASK = 0xFFFFFFFFFFFFFFFF
+
+def message_digest(sequence_number: int, role: str, content: str) -> int:
+    """
+    Python twin of the message_content_digest() SQL function: first 8 bytes
+    of sha256("<sequence_number>:<role>:<content>"). A conversation digest is
+    the XOR of its messages' digests.
+    """
+    raw = hashlib.sha256(f"{sequence_number}:{role}:{content}".encode("utf-8")).digest()
+    return int.from_bytes(raw[:8], "big")
+
+def format_digest(value: Optional[int]) -> str:
+    """Stored (signed bigint) digest as 16 hex chars"""
+    return f"{(value or 0) & DIGEST_MASK:016x}"
+
+def parse_digest(value: str) -> int:
+    """16 hex chars back to the signed bigint stored in Postgres"""
+    digest = int(value, 16) & DIGEST_MASK
+    return digest - (1 << 64) if digest >= (1 << 63) else digest
+
+def _error_message(error: Exception) -> str:
+    # First line of the driver error; the rest repeats SQL and parameters
+    return str(getattr(error, "orig", None) or error).strip().splitlines()[0]
+
+def _waves(entries: List) -> List[List]:
+    """
+    Split entries so no (agent, external_id) key repeats within one
+    statement; ON CONFLICT DO UPDATE cannot touch a row twice
+    """
+    waves: List[List] = []
+    seen: List[set] = []
+    for entry in entries:
+        key = (entry[2], entry[1].external_id) if entry[1].external_id else None
+        for wave, keys in zip(waves, seen):
+            if key is None or key not in keys:
+                break
+        else:
+            wave, keys = [], set()
+            waves.append(wave)
+            seen.append(keys)
+        wave.append(entry)
+        if key is not None:
+            keys.add(key)
+    return waves
+
+async def _upsert_conversations(db: AsyncSession, user_id: UUID, wave: List) -> List[Tuple[int, UUID, bool]]:
+    rows = [
+        {
+            "id": uuid4(),
+            "user_id": user_id,
+            "agent_id": agent_id,
+            "project_id": item.project_id,
+            "external_id": item.external_id,
+            "title": item.title or DEFAULT_TITLE,
+            "metadata": item.metadata or {},
+            "message_count": 0
+        }
+        for _, item, agent_id in wave
+    ]
+    stmt = pg_insert(Conversation).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "agent_id", "external_id"],
+        set_={
+            "title": func.coalesce(func.nullif(stmt.excluded.title, DEFAULT_TITLE), Conversation.title),
+            "project_id": func.coalesce(stmt.excluded.project_id, Conversation.project_id),
+            "metadata": text(
+                "COALESCE(conversations.metadata::jsonb, '{}'::jsonb)"
+                " || COALESCE(excluded.metadata::jsonb, '{}'::jsonb)"
+            ),
+            "updated_at": func.now()
+        }
+    ).returning(
+        Conversation.id,
+        Conversation.agent_id,
+        Conversation.external_id,
+        literal_column("(xmax = 0)").label("inserted")
+    )
+    returned = (await db.execute(stmt)).all()
+
+    # New rows come back with the id we generated, updated ones by their key
+    by_id = {r.id: r for r in returned}
+    by_key = {(r.agent_id, r.external_id): r for r in returned if r.external_id}
+    outcomes = []
+    for (index, item, agent_id), row in zip(wave, rows):
+        r = by_id.get(row["id"]) or by_key[(agent_id, item.external_id)]
+        outcomes.append((index, r.id, bool(r.inserted)))
+    return outcomes
+
+async def _insert_messages(
+    db: AsyncSession,
+    items_by_conversation: List[Tuple[UUID, object]],
+    patch: bool = False
+) -> Tuple[set, List[UUID]]:
+    """
+    Multi-row message inserts; returns conversations that gained or changed
+    messages and the ids of existing messages that were edited. Without
+    patch, messages already stored at a sequence number are left alone;
+    with patch, they are overwritten when role or content differ.
+    """
+    rows = [
+        {
+            "conversation_id": conversation_id,
+            "role": msg.role,
+            "content": msg.content,
+            "sequence_number": msg.sequence_number,
+            "external_id": msg.external_id,
+            "model": msg.model,
+            "tokens": msg.tokens,
+            "metadata": msg.metadata or {}
+        }
+        for conversation_id, item in items_by_conversation
+        for msg in item.messages
+    ]
+    per_statement = min(settings.INGEST_MESSAGE_ROWS_PER_INSERT, 32767 // MESSAGE_COLUMNS)
+    touched = set()
+    edited = []
+    for start in range(0, len(rows), per_statement):
+        stmt = pg_insert(Message).values(rows[start:start + per_statement])
+        if patch:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["conversation_id", "sequence_number"],
+                set_={
+                    "role": stmt.excluded.role,
+                    "content": stmt.excluded.content,
+                    "external_id": func.coalesce(stmt.excluded.external_id, Message.external_id),
+                    "model": func.coalesce(stmt.excluded.model, Message.model),
+                    "tokens": func.coalesce(stmt.excluded.tokens, Message.tokens),
+                    "edited_at": func.now()
+                },
+                where=or_(Message.content != stmt.excluded.content, Message.role != stmt.excluded.role)
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["conversation_id", "sequence_number"])
+        stmt = stmt.returning(
+            Message.id,
+            Message.conversation_id,
+            literal_column("(xmax = 0)").label("inserted")
+        )
+        for row in (await db.execute(stmt)).all():
+            touched.add(row.conversation_id)
+            if not row.inserted:
+                edited.append(row.id)
+    return touched, edited
+
+async def _ingest_entries(db: AsyncSession, user_id: UUID, entries: List, patch: bool = False) -> Tuple[List, set, set]:
+    """
+    Upsert (index, item, agent_id) entries and their messages inside the
+    current transaction; returns per-entry outcomes, the conversations that
+    gained or changed messages, and those with edited messages
+    """
+    outcomes = []
+    for wave in _waves(entries):
+        outcomes.extend(await _upsert_conversations(db, user_id, wave))
+
+    conversation_by_index = {index: conversation_id for index, conversation_id, _ in outcomes}
+    touched, edited = await _insert_messages(
+        db, [(conversation_by_index[index], item) for index, item, _ in entries], patch
+    )
+
+    edited_conversations = set()
+    if edited:
+        # Edited content needs new embeddings; the embedding pass fills the gaps
+        deleted = await db.execute(
+            delete(Embedding).where(Embedding.message_id.in_(edited)).returning(Embedding.message_id)
+        )
+        if deleted.scalars().all():
+            rows = await db.execute(select(Message.conversation_id).where(Message.id.in_(edited)).distinct())
+            edited_conversations.update(rows.scalars().all())
+
+    if touched:
+        counts = (
+            select(Message.conversation_id, func.count(Message.id).label("total"))
+            .where(Message.conversation_id.in_(touched))
+            .group_by(Message.conversation_id)
+            .subquery()
+        )
+        await db.execute(
+            Conversation.__table__.update()
+            .where(Conversation.id == counts.c.conversation_id)
+            .values(message_count=counts.c.total, updated_at=func.now())
+        )
+    return outcomes, touched, edited_conversations
+
+def _patch_lock_key(user_id: UUID, agent_id: UUID, external_id: str) -> int:
+    """Signed 64-bit advisory lock key for one (user, agent, external_id) conversation"""
+    raw = hashlib.sha256(f"sync:{user_id}:{agent_id}:{external_id}".encode("utf-8")).digest()
+    return int.from_bytes(raw[:8], "big", signed=True)
+
+async def _digest_conflicts(db: AsyncSession, user_id: UUID, entries: List) -> Dict[int, Dict]:
+    """
+    Entries whose base_digest no longer matches the stored conversation,
+    keyed by index, with the server's current digest and last sequence
+
+    Each checked conversation is first locked with a transaction-level
+    advisory lock, so the check and the patch applied after it in the same
+    transaction are atomic against other deltas; unlike a row lock it also
+    covers conversations that do not exist yet. Keys are locked in sorted
+    order, so concurrent deltas cannot deadlock on each other.
+    """
+    expected = {
+        (agent_id, item.external_id): (index, item)
+        for index, item, agent_id in entries
+        if getattr(item, "base_digest", None) is not None and item.external_id
+    }
+    if not expected:
+        return {}
+
+    lock_keys = sorted({_patch_lock_key(user_id, *key) for key in expected})
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(key) FROM unnest(CAST(:keys AS bigint[])) AS key"),
+        {"keys": lock_keys}
+    )
+
+    rows = await db.execute(
+        select(
+            Conversation.agent_id,
+            Conversation.external_id,
+            Conversation.content_digest,
+            Conversation.last_sequence_number
+        ).where(
+            Conversation.user_id == user_id,
+            tuple_(Conversation.agent_id, Conversation.external_id).in_(list(expected))
+        )
+    )
+    stored = {(r.agent_id, r.external_id): r for r in rows.all()}
+
+    conflicts = {}
+    for key, (index, item) in expected.items():
+        row = stored.get(key)
+        current = row.content_digest if row else 0
+        if parse_digest(item.base_digest) != current:
+            conflicts[index] = {
+                "index": index,
+                "external_id": item.external_id,
+                "content_digest": format_digest(current),
+                "last_sequence_number": row.last_sequence_number if row else None
+            }
+    return conflicts
+
+async def _drop_conflicts(db: AsyncSession, user_id: UUID, entries: List, result: Dict) -> List:
+    """Lock and check patch entries, report conflicts and return the rest"""
+    conflicts = await _digest_conflicts(db, user_id, entries)
+    if conflicts:
+        result["conflicts"].extend(conflicts[index] for index in sorted(conflicts))
+    return [entry for entry in entries if entry[0] not in conflicts]
+
+async def ingest_conversations(db: AsyncSession, user_id: UUID, items: List, patch: bool = False) -> Dict:
+    """
+    Set-based bulk upsert of ConversationCreate items
+
+    Conversations are upserted on (user_id, agent_id, external_id) and their
+    messages inserted with ON CONFLICT (conversation_id, sequence_number)
+    DO NOTHING, so re-sending a conversation only adds the new turns. Items
+    are committed in chunks of INGEST_CHUNK_SIZE; if a chunk fails it is
+    replayed item by item in savepoints so only the bad items are reported.
+
+    With patch, items carry only new or changed messages: stored messages at
+    the same sequence number are overwritten when they differ, and items
+    with a base_digest that no longer matches the server are skipped and
+    reported in "conflicts" so the client can re-read the manifest.
+    """
+    result = {
+        "created": 0,
+        "updated": 0,
+        "failed": 0,
+        "conversation_ids": [],
+        "embed_conversation_ids": [],
+        "edited_conversation_ids": [],
+        "conflicts": [],
+        "errors": []
+    }
+    if not items:
+        return result
+
+    agent_ids, created_agents = await agent_registry.resolve(db, [item.agent_id for item in items])
+    await db.commit()
+    if created_agents:
+        await response_cache.invalidate(AGENTS_NAMESPACE)
+
+    chunk_size = max(1, settings.INGEST_CHUNK_SIZE)
+    for start in range(0, len(items), chunk_size):
+        entries = [
+            (index, item, agent_ids[item.agent_id if isinstance(item.agent_id, UUID) else str(item.agent_id)])
+            for index, item in enumerate(items[start:start + chunk_size], start=start)
+        ]
+        try:
+            if patch:
+                entries = await _drop_conflicts(db, user_id, entries, result)
+            outcomes, touched, edited = await _ingest_entries(db, user_id, entries, patch)
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.warning(f"Bulk ingest chunk at {start} failed, retrying per item: {_error_message(e)}")
+            outcomes, touched, edited = [], set(), set()
+            if patch:
+                # The rollback released the patch locks; take them and check again
+                entries = await _drop_conflicts(db, user_id, entries, result)
+            for entry in entries:
+                try:
+                    async with db.begin_nested():
+                        entry_outcomes, entry_touched, entry_edited = await _ingest_entries(
+                            db, user_id, [entry], patch
+                        )
+                    outcomes.extend(entry_outcomes)
+                    touched.update(entry_touched)
+                    edited.update(entry_edited)
+                except SQLAlchemyError as item_error:
+                    result["failed"] += 1
+                    result["errors"].append({
+                        "index": entry[0],
+                        "external_id": entry[1].external_id,
+                        "error": _error_message(item_error)
+                    })
+            await db.commit()
+
+        if outcomes:
+            await response_cache.invalidate(user_namespace(user_id))
+        for _, conversation_id, inserted in sorted(outcomes):
+            result["created" if inserted else "updated"] += 1
+            result["conversation_ids"].append(conversation_id)
+        result["embed_conversation_ids"].extend(touched)
+        result["edited_conversation_ids"].extend(edited)
+
+    return result
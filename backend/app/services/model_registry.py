@@ -0,0 +1,98 @@
+from typing import Dict, Optional, Tuple
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.services.encoder_backends import TORCH_BACKEND, load_backend, parity_check
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str, str]
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded embedding models
+
+    Models are keyed by (model_name, model_version, backend) and loaded at most
+    once per process, so every EmbeddingService instance shares the same weights.
+    """
+
+    def __init__(self):
+        self._models: Dict[ModelKey, object] = {}
+        self._stats: Dict[ModelKey, Dict] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[ModelKey, threading.Lock] = {}
+
+    def _key_lock(self, key: ModelKey) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def get(self, model_name: str, model_version: str, backend: Optional[str] = None):
+        """Return the shared model, loading it on first use"""
+        key = (model_name, model_version, backend or settings.EMBEDDING_BACKEND)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        # Per-key lock so a slow load does not block lookups of other models
+        with self._key_lock(key):
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(*key)
+        return model
+
+    def _load(self, model_name: str, model_version: str, backend: str):
+        logger.info(f"Loading embedding model: {model_name} (version {model_version}, {backend} backend)")
+        started = time.perf_counter()
+        model = load_backend(model_name, backend)
+        load_seconds = time.perf_counter() - started
+        memory_bytes = model.memory_bytes()
+
+        stats = {
+            "model_name": model_name,
+            "model_version": model_version,
+            "backend": backend,
+            "load_seconds": round(load_seconds, 3),
+            "memory_bytes": memory_bytes,
+            "loaded_at": time.time(),
+        }
+
+        if backend != TORCH_BACKEND and settings.EMBEDDING_PARITY_CHECK_ON_LOAD:
+            parity = parity_check(model, self.get(model_name, model_version, TORCH_BACKEND))
+            stats["parity"] = parity
+            if parity["min_cosine"] < settings.EMBEDDING_PARITY_MIN_COSINE:
+                logger.warning(
+                    f"{backend} backend for {model_name} drifts from torch: "
+                    f"min cosine {parity['min_cosine']:.4f}"
+                )
+
+        key = (model_name, model_version, backend)
+        with self._lock:
+            self._models[key] = model
+            self._stats[key] = stats
+
+        logger.info(
+            f"Loaded embedding model {model_name} in {load_seconds:.2f}s "
+            f"({memory_bytes / (1024 * 1024):.1f} MiB)"
+        )
+        return model
+
+    def warm_up(self, model_name: str, model_version: str, backend: Optional[str] = None) -> Dict:
+        """Load the model and run one forward pass so the first query is fast"""
+        backend = backend or settings.EMBEDDING_BACKEND
+        model = self.get(model_name, model_version, backend)
+        model.encode("warm up", show_progress_bar=False)
+        return self._stats[(model_name, model_version, backend)]
+
+    def is_loaded(self, model_name: str, model_version: str, backend: Optional[str] = None) -> bool:
+        return (model_name, model_version, backend or settings.EMBEDDING_BACKEND) in self._models
+
+    def stats(self) -> list:
+        """Load time and memory footprint of every loaded model"""
+        with self._lock:
+            return [dict(s) for s in self._stats.values()]
+
+model_registry = ModelRegistry()
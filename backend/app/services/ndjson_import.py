@@ -0,0 +1,131 @@
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Callable, Dict, List, Tuple
+from uuid import UUID
+import time
+import zlib
+
+from app.core.config import settings
+from app.schemas.conversation import ConversationCreate
+from app.services.ingestion import ingest_conversations
+
+# Largest piece of decompressed output produced at once
+_GUNZIP_PIECE_BYTES = 64 * 1024
+
+class ImportLineTooLong(ValueError):
+    pass
+
+async def gunzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Incrementally decompress a gzip (or zlib) byte stream in pieces of at
+    most _GUNZIP_PIECE_BYTES, so a highly compressed chunk is inflated only
+    as fast as the reader consumes it
+    """
+    decompressor = zlib.decompressobj(wbits=47)  # 32 + 15: detect gzip/zlib header
+    async for chunk in chunks:
+        data = chunk
+        while data:
+            piece = decompressor.decompress(data, _GUNZIP_PIECE_BYTES)
+            if piece:
+                yield piece
+            data = decompressor.unconsumed_tail
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Split a byte stream into (line_number, line) pairs, skipping blank lines.
+    Only the current partial line is buffered, and it is never rescanned, so
+    memory is bounded by max_line_bytes and work is linear in the input.
+    """
+    buffer = bytearray()
+    line_number = 0
+    async for chunk in chunks:
+        search_from = len(buffer)
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", max(start, search_from))
+            if end < 0:
+                break
+            line_number += 1
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.strip():
+                yield line_number, line
+        if start:
+            del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ImportLineTooLong(f"Line {line_number + 1} exceeds {max_line_bytes} bytes")
+    if buffer.strip():
+        yield line_number + 1, bytes(buffer)
+
+async def import_ndjson(
+    db: AsyncSession,
+    user_id: UUID,
+    lines: AsyncIterator[Tuple[int, bytes]],
+    queue_embeddings: Callable[[List[UUID]], None]
+) -> AsyncIterator[Dict]:
+    """
+    Ingest one ConversationCreate per line through the bulk write path,
+    yielding a progress event after every chunk and a final "done" event
+
+    A chunk is flushed at INGEST_CHUNK_SIZE lines or IMPORT_CHUNK_BYTES,
+    whichever comes first, so at most one chunk of parsed models is held in
+    memory. Lines that fail to parse or ingest are reported with their line
+    number and skipped; the rest of the import carries on.
+    """
+    started = time.perf_counter()
+    totals = {"lines": 0, "bytes": 0, "created": 0, "updated": 0, "failed": 0, "chunks": 0}
+    chunk_items: List[ConversationCreate] = []
+    chunk_lines: List[int] = []
+    chunk_errors: List[Dict] = []
+    chunk_bytes = 0
+    max_items = max(1, settings.INGEST_CHUNK_SIZE)
+
+    async def flush() -> Dict:
+        nonlocal chunk_items, chunk_lines, chunk_errors, chunk_bytes
+        if chunk_items:
+            result = await ingest_conversations(db, user_id, chunk_items)
+            totals["created"] += result["created"]
+            totals["updated"] += result["updated"]
+            totals["failed"] += result["failed"]
+            chunk_errors.extend(
+                {"line": chunk_lines[error["index"]], "external_id": error["external_id"], "error": error["error"]}
+                for error in result["errors"]
+            )
+            if result["embed_conversation_ids"]:
+                queue_embeddings(result["embed_conversation_ids"])
+        totals["chunks"] += 1
+        event = {
+            "event": "progress",
+            **totals,
+            "errors": sorted(chunk_errors, key=lambda error: error["line"]),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+        chunk_items, chunk_lines, chunk_errors, chunk_bytes = [], [], [], 0
+        return event
+
+    async for line_number, line in lines:
+        totals["lines"] += 1
+        totals["bytes"] += len(line) + 1
+        try:
+            chunk_items.append(ConversationCreate.model_validate_json(line))
+            chunk_lines.append(line_number)
+            chunk_bytes += len(line)
+        except ValidationError as e:
+            totals["failed"] += 1
+            chunk_errors.append({"line": line_number, "external_id": None, "error": str(e.errors()[0]["msg"])})
+
+        if len(chunk_items) >= max_items or chunk_bytes >= settings.IMPORT_CHUNK_BYTES:
+            yield await flush()
+
+    if chunk_items or chunk_errors:
+        yield await flush()
+
+    yield {
+        "event": "done",
+        **totals,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+import hashlib
+import threading
+import time
+import unicodedata
+import logging
+
+from app.core.config import settings
+from app.core.redis import get_redis, redis_breaker
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different spellings share a cache entry"""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+class QueryEmbeddingCache:
+    """
+    Two-tier query -> vector cache
+
+    The first tier is an in-process LRU with a TTL. The second tier is Redis,
+    shared by all uvicorn workers. Entries are keyed by normalized query text,
+    model name and model version, so a model upgrade never serves stale vectors.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, use_redis: bool = True):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def make_key(query: str, model_name: str, model_version: str) -> str:
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"qe:{model_name}:{model_version}:{digest}"
+
+    def _get_local(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _set_local(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _redis_client(self):
+        """Redis client, or None when disabled or the circuit breaker is open"""
+        if not self.use_redis or redis_breaker.is_open():
+            return None
+        return get_redis()
+
+    def _get_redis(self, key: str) -> Optional[np.ndarray]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            with redis_breaker.guard():
+                raw = client.get(key)
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Query cache Redis lookup failed: {e}")
+            return None
+        if raw is None:
+            return None
+        return np.frombuffer(raw, dtype=np.float32)
+
+    def _set_redis(self, key: str, vector: np.ndarray):
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            with redis_breaker.guard():
+                client.setex(key, self.ttl_seconds, vector.astype(np.float32).tobytes())
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Query cache Redis write failed: {e}")
+
+    def get_or_compute(
+        self,
+        query: str,
+        model_name: str,
+        model_version: str,
+        compute: Callable[[str], np.ndarray]
+    ) -> np.ndarray:
+        """Return the cached vector for a query, encoding it on a miss"""
+        key = self.make_key(query, model_name, model_version)
+
+        vector = self._get_local(key)
+        if vector is not None:
+            self.local_hits += 1
+            return vector
+
+        vector = self._get_redis(key)
+        if vector is not None:
+            self.redis_hits += 1
+            self._set_local(key, vector)
+            return vector
+
+        self.misses += 1
+        vector = np.asarray(compute(query), dtype=np.float32)
+        self._set_local(key, vector)
+        self._set_redis(key, vector)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "redis_errors": self.redis_errors,
+        }
+
+query_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+    use_redis=settings.QUERY_CACHE_REDIS_ENABLED
+)
@@ -0,0 +1,357 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import asyncio
+import threading
+import time
+import logging
+
+from sqlalchemy import Text, cast, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.executors import executors, INDEX_POOL
+from app.models.conversation import Conversation, Message
+from app.models.embedding import Embedding
+
+logger = logging.getLogger(__name__)
+
+NUMPY_ENGINE = "numpy"
+HNSWLIB_ENGINE = "hnswlib"
+
+IndexKey = Tuple[str, str, str]
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+def _resolve_engine() -> str:
+    """hnswlib when configured and installed, NumPy brute force otherwise"""
+    engine = settings.VECTOR_INDEX_ENGINE
+    if engine == NUMPY_ENGINE:
+        return NUMPY_ENGINE
+    try:
+        import hnswlib  # noqa: F401
+        return HNSWLIB_ENGINE
+    except ImportError:
+        if engine == HNSWLIB_ENGINE:
+            logger.warning("VECTOR_INDEX_ENGINE=hnswlib but hnswlib is not installed; using NumPy")
+        return NUMPY_ENGINE
+
+def _parse_vectors(texts: List[str]) -> np.ndarray:
+    """Matrix of pgvector text values ("[0.1,0.2,...]"), parsed in one pass"""
+    if not texts:
+        return np.zeros((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+    flat = np.array(",".join(t[1:-1] for t in texts).split(","), dtype=np.float32)
+    return flat.reshape(len(texts), -1)
+
+class UserVectorIndex:
+    """
+    One user's embeddings for one model, held in memory
+
+    Vectors are kept L2-normalized in a float32 matrix, so cosine similarity
+    is a dot product. The matrix is a buffer grown geometrically: only its
+    first len(self) rows are live, and incremental adds copy it O(log n)
+    times rather than once per add. With hnswlib installed, unfiltered queries go through an
+    HNSW graph; filtered queries (agents / projects) scan the masked matrix
+    exactly, which is cheap at per-user sizes.
+    """
+
+    def __init__(self, engine: str, dim: int):
+        self.engine = engine
+        self.dim = dim
+        self.message_ids: List[str] = []
+        self.agent_ids: List[Optional[str]] = []
+        self.project_ids: List[Optional[str]] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._hnsw = None
+        self._lock = threading.Lock()
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.message_ids)
+
+    def memory_bytes(self) -> int:
+        # Allocated capacity, not just the live rows
+        size = self._matrix.nbytes
+        if self._hnsw is not None:
+            # Vector copy plus roughly 2*M neighbour links per element on level 0
+            size += len(self) * (self.dim * 4 + settings.VECTOR_INDEX_HNSW_M * 2 * 4)
+        return size
+
+    def add(self, rows: Iterable) -> int:
+        """Append (message_id, agent_id, project_id, vector) rows; known ids are skipped"""
+        rows = list(rows)
+        with self._lock:
+            new = [r for r in rows if str(r[0]) not in self._positions]
+            if not new:
+                return 0
+            vectors = _normalize(np.stack([np.asarray(r[3], dtype=np.float32) for r in new]))
+
+            start = len(self.message_ids)
+            self._reserve(start + len(new))
+            self._matrix[start:start + len(new)] = vectors
+            for offset, (message_id, agent_id, project_id, _) in enumerate(new):
+                self._positions[str(message_id)] = start + offset
+                self.message_ids.append(str(message_id))
+                self.agent_ids.append(str(agent_id) if agent_id else None)
+                self.project_ids.append(str(project_id) if project_id else None)
+
+            if self.engine == HNSWLIB_ENGINE:
+                self._add_hnsw(vectors, start)
+        return len(new)
+
+    def _reserve(self, rows: int):
+        """Grow the matrix to hold at least rows rows, doubling its capacity"""
+        capacity = len(self._matrix)
+        if rows <= capacity:
+            return
+        matrix = np.empty((max(rows, capacity * 2), self.dim), dtype=np.float32)
+        live = len(self.message_ids)
+        matrix[:live] = self._matrix[:live]
+        self._matrix = matrix
+
+    def _add_hnsw(self, vectors: np.ndarray, start: int):
+        import hnswlib
+
+        labels = np.arange(start, start + len(vectors))
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self._hnsw.init_index(
+                max_elements=max(len(self.message_ids), 1024),
+                ef_construction=settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION,
+                M=settings.VECTOR_INDEX_HNSW_M
+            )
+        elif len(self.message_ids) > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(max(len(self.message_ids), self._hnsw.get_max_elements() * 2))
+        self._hnsw.add_items(vectors, labels)
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        agent_ids: Optional[List] = None,
+        project_ids: Optional[List] = None,
+        ef_search: Optional[int] = None,
+        after: Optional[Tuple[float, str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (message_id, cosine similarity), best first with ties by id;
+        after skips everything up to a previous page's last (similarity, id)
+        """
+        if not self.message_ids or k <= 0:
+            return []
+        query = _normalize(query_vector)
+
+        with self._lock:
+            if self._hnsw is not None and not agent_ids and not project_ids and after is None:
+                k = min(k, len(self.message_ids))
+                self._hnsw.set_ef(min(max(ef_search or settings.SEARCH_EF_SEARCH_DEFAULT, k), 1000))
+                labels, distances = self._hnsw.knn_query(query, k=k)
+                # "ip" space distance is 1 - dot product
+                return [
+                    (self.message_ids[label], 1.0 - float(distance))
+                    for label, distance in zip(labels[0], distances[0])
+                ]
+
+            candidates = np.arange(len(self.message_ids))
+            if agent_ids:
+                allowed = {str(a) for a in agent_ids}
+                candidates = candidates[[a in allowed for a in self.agent_ids]]
+            if project_ids:
+                allowed = {str(p) for p in project_ids}
+                candidates = candidates[[self.project_ids[i] in allowed for i in candidates]]
+            if len(candidates) == 0:
+                return []
+
+            scores = self._matrix[candidates] @ query
+            if after is not None:
+                after_score, after_id = np.float32(after[0]), str(after[1])
+                seen = scores > after_score
+                for i in np.flatnonzero(scores == after_score):
+                    seen[i] = self.message_ids[candidates[i]] <= after_id
+                candidates, scores = candidates[~seen], scores[~seen]
+                if len(candidates) == 0:
+                    return []
+
+            k = min(k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            # Take the whole run of scores equal to the kth so the id
+            # tie-break, not argpartition, decides which rows make the page
+            top = np.flatnonzero(scores >= scores[top].min())
+            ids = [self.message_ids[candidates[i]] for i in top]
+            top = top[np.lexsort((ids, -scores[top]))][:k]
+            return [(self.message_ids[candidates[i]], float(scores[i])) for i in top]
+
+class VectorIndexManager:
+    """
+    Lazily built per-user indexes, evicted LRU under a memory budget
+
+    Indexes are built from the embeddings table on first search for a user
+    and rebuilt once older than VECTOR_INDEX_TTL_SECONDS, which bounds how
+    stale they get when other processes (Celery workers) write embeddings.
+    Writes made in this process are applied incrementally through add().
+
+    Rows are read with an awaited query and the vectors are parsed and
+    indexed on the index pool, so a build never holds the event loop; a
+    per-key asyncio.Lock makes concurrent searches for the same user await
+    one build instead of starting their own.
+    """
+
+    def __init__(self, memory_budget_bytes: int, ttl_seconds: int):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.ttl_seconds = ttl_seconds
+        self._indexes: "OrderedDict[IndexKey, UserVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[IndexKey, asyncio.Lock] = {}
+
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+        self.incremental_rows = 0
+        self._build_seconds = 0.0
+
+    def _build_lock(self, key: IndexKey) -> asyncio.Lock:
+        with self._lock:
+            if key not in self._build_locks:
+                self._build_locks[key] = asyncio.Lock()
+            return self._build_locks[key]
+
+    def _drop_locked(self, key: IndexKey):
+        """Forget an index and its build lock, unless a build holds the lock"""
+        self._indexes.pop(key, None)
+        lock = self._build_locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._build_locks[key]
+
+    def _lookup(self, key: IndexKey) -> Optional[UserVectorIndex]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                return None
+            if time.monotonic() - index.loaded_at > self.ttl_seconds:
+                self._drop_locked(key)
+                return None
+            self._indexes.move_to_end(key)
+            return index
+
+    async def get(self, db: AsyncSession, user_id: str, model_name: str, model_version: str) -> UserVectorIndex:
+        """The user's index, building it from the database on a miss"""
+        key = (str(user_id), model_name, model_version)
+        index = self._lookup(key)
+        if index is not None:
+            self.hits += 1
+            return index
+
+        # One build per key; concurrent searches for the same user await it
+        async with self._build_lock(key):
+            index = self._lookup(key)
+            if index is None:
+                index = await self._build(db, key)
+                self._store(key, index)
+            return index
+
+    async def _build(self, db: AsyncSession, key: IndexKey) -> UserVectorIndex:
+        user_id, model_name, model_version = key
+        started = time.perf_counter()
+        # Vectors come back as text so they are parsed on the pool, not here
+        result = await db.execute(
+            select(
+                Embedding.message_id,
+                Embedding.agent_id,
+                Conversation.project_id,
+                cast(Embedding.embedding, Text).label("embedding")
+            ).join(
+                Message, Message.id == Embedding.message_id
+            ).join(
+                Conversation, Conversation.id == Message.conversation_id
+            ).where(
+                Embedding.user_id == user_id,
+                Embedding.model_name == model_name,
+                Embedding.model_version == model_version,
+                Conversation.is_deleted == False
+            )
+        )
+        index = await executors.run(INDEX_POOL, self._index_rows, result.all())
+
+        elapsed = time.perf_counter() - started
+        self.builds += 1
+        self._build_seconds += elapsed
+        logger.info(
+            f"Built {index.engine} vector index for user {user_id}: {len(index)} vectors "
+            f"in {elapsed:.2f}s ({index.memory_bytes() / (1024 * 1024):.1f} MiB)"
+        )
+        return index
+
+    @staticmethod
+    def _index_rows(rows: list) -> UserVectorIndex:
+        vectors = _parse_vectors([r.embedding for r in rows])
+        index = UserVectorIndex(_resolve_engine(), vectors.shape[1])
+        index.add((r.message_id, r.agent_id, r.project_id, vector) for r, vector in zip(rows, vectors))
+        return index
+
+    def _store(self, key: IndexKey, index: UserVectorIndex):
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        # Never evict the most recently used index, even if it alone exceeds the budget
+        while len(self._indexes) > 1 and self._memory_locked() > self.memory_budget_bytes:
+            evicted_key = next(iter(self._indexes))
+            self._drop_locked(evicted_key)
+            self.evictions += 1
+            logger.info(f"Evicted vector index for user {evicted_key[0]}")
+
+    def _memory_locked(self) -> int:
+        return sum(index.memory_bytes() for index in self._indexes.values())
+
+    def add(self, model_name: str, model_version: str, rows: Iterable[Dict]):
+        """
+        Apply newly written embeddings to the indexes that are loaded;
+        users without a loaded index pick the rows up on their next build
+        """
+        by_key: Dict[IndexKey, list] = {}
+        for row in rows:
+            key = (str(row["user_id"]), model_name, model_version)
+            by_key.setdefault(key, []).append(
+                (row["message_id"], row["agent_id"], row.get("project_id"), row["embedding"])
+            )
+
+        for key, key_rows in by_key.items():
+            with self._lock:
+                index = self._indexes.get(key)
+            if index is not None:
+                self.incremental_rows += index.add(key_rows)
+
+        with self._lock:
+            self._evict_locked()
+
+    def invalidate(self, user_id: str):
+        """Drop every index of a user, e.g. after conversations were deleted"""
+        with self._lock:
+            for key in [k for k in {**self._indexes, **self._build_locks} if k[0] == str(user_id)]:
+                self._drop_locked(key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "engine": _resolve_engine(),
+                "indexes": len(self._indexes),
+                "vectors": sum(len(index) for index in self._indexes.values()),
+                "memory_bytes": self._memory_locked(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "hits": self.hits,
+                "builds": self.builds,
+                "evictions": self.evictions,
+                "incremental_rows": self.incremental_rows,
+                "mean_build_seconds": self._build_seconds / self.builds if self.builds else 0.0,
+            }
+
+vector_indexes = VectorIndexManager(
+    memory_budget_bytes=settings.VECTOR_INDEX_MEMORY_BUDGET_MB * 1024 * 1024,
+    ttl_seconds=settings.VECTOR_INDEX_TTL_SECONDS
+)
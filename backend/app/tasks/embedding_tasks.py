@@ -32,34 +32,8 @@ def generate_embeddings_task(self, conversation_id: str):
     logger.info(f"Generating embeddings for conversation {conversation_id}")
     
     try:
-        # Get conversation with messages
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
-        
-        if not conversation:
-            logger.error(f"Conversation {conversation_id} not found")
-            return {"error": "Conversation not found"}
-        
-        # Initialize embedding service
         embedding_service = EmbeddingService(self.db)
-        
-        # Generate embeddings for each message
-        generated_count = 0
-        for message in conversation.messages:
-            try:
-                embedding_service.generate_embedding(message.id)
-                generated_count += 1
-            except Exception as e:
-                logger.error(f"Failed to generate embedding for message {message.id}: {e}")
-        
-        logger.info(f"Generated {generated_count} embeddings for conversation {conversation_id}")
-        
-        return {
-            "conversation_id": str(conversation_id),
-            "embeddings_generated": generated_count,
-            "total_messages": len(conversation.messages)
-        }
+        return embedding_service.generate_embeddings_for_conversation(conversation_id)
         
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
@@ -87,6 +61,159 @@ def batch_generate_embeddings_task(self, message_ids: list):
         logger.error(f"Error in batch embedding generation: {e}")
         raise
 
+@celery_app.task(base=DatabaseTask, bind=True)
+def embedding_dedup_report_task(self):
+    """
+    Report how many stored embeddings share their text with another message
+    """
+    embedding_service = EmbeddingService(self.db)
+    report = embedding_service.dedup_report()
+    logger.info(
+        f"Embedding dedup ratio {report['dedup_ratio']:.2%} "
+        f"({report['duplicate_embeddings']} of {report['hashed_embeddings']} hashed embeddings)"
+    )
+    return report
+
+@celery_app.task(base=DatabaseTask, bind=True)
+def backfill_embedding_tenants_task(self, batch_size: int = 10000):
+    """
+    Copy user_id/agent_id from conversations onto embeddings created
+    before those columns existed, in bounded batches
+    """
+    from sqlalchemy import text
+
+    total = 0
+    while True:
+        result = self.db.execute(text("""
+            UPDATE embeddings e
+            SET user_id = c.user_id, agent_id = c.agent_id
+            FROM messages m
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE m.id = e.message_id
+                AND e.id IN (
+                    SELECT id FROM embeddings WHERE user_id IS NULL LIMIT :batch_size
+                )
+        """), {"batch_size": batch_size})
+        self.db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    logger.info(f"Backfilled tenant columns on {total} embeddings")
+    return {"backfilled": total}
+
+@celery_app.task(base=DatabaseTask, bind=True)
+def backfill_conversation_embeddings_task(self, batch_size: int = 500, rebuild: bool = False):
+    """
+    Compute conversation-level embeddings for conversations that have
+    message embeddings but no centroid yet, in bounded batches; rebuild
+    recomputes every centroid (e.g. ones stored as a mean before centroids
+    held weighted sums)
+    """
+    from app.models.embedding import Embedding, ConversationEmbedding
+
+    embedding_service = EmbeddingService(self.db)
+    total = 0
+    last_id = None
+    while True:
+        # Keyset pagination, so conversations that yield no centroid are not revisited
+        query = self.db.query(Message.conversation_id).join(
+            Embedding, Embedding.message_id == Message.id
+        ).outerjoin(
+            ConversationEmbedding,
+            (ConversationEmbedding.conversation_id == Message.conversation_id)
+            & (ConversationEmbedding.model_name == embedding_service.model_name)
+            & (ConversationEmbedding.model_version == embedding_service.model_version)
+        ).filter(
+            Embedding.model_name == embedding_service.model_name,
+            Embedding.model_version == embedding_service.model_version
+        )
+        if not rebuild:
+            query = query.filter(ConversationEmbedding.id.is_(None))
+        if last_id is not None:
+            query = query.filter(Message.conversation_id > last_id)
+        conversation_ids = [
+            row[0] for row in query.distinct().order_by(Message.conversation_id).limit(batch_size).all()
+        ]
+        if not conversation_ids:
+            break
+        total += embedding_service.rebuild_conversation_centroids(conversation_ids)
+        last_id = conversation_ids[-1]
+
+    logger.info(f"Backfilled conversation embeddings for {total} conversations")
+    return {"backfilled": total}
+
+@celery_app.task(base=DatabaseTask, bind=True)
+def backfill_sync_digests_task(self, batch_size: int = 10000):
+    """
+    Fill messages.content_digest for rows written before the digest triggers
+    existed, then recompute conversation digests from scratch
+    """
+    from sqlalchemy import text
+
+    total = 0
+    while True:
+        updated = self.db.execute(text("""
+            UPDATE messages SET content_digest = message_content_digest(sequence_number, role, content)
+            WHERE id IN (SELECT id FROM messages WHERE content_digest IS NULL LIMIT :batch_size)
+        """), {"batch_size": batch_size}).rowcount
+        self.db.commit()
+        total += updated
+        if updated < batch_size:
+            break
+
+    # The update triggers folded partial XORs into conversations; start over
+    conversations = self.db.execute(text("""
+        UPDATE conversations c
+        SET content_digest = COALESCE(d.digest, 0), last_sequence_number = d.last_sequence
+        FROM (
+            SELECT conversations.id,
+                   bigint_xor(messages.content_digest) AS digest,
+                   max(messages.sequence_number) AS last_sequence
+            FROM conversations LEFT JOIN messages ON messages.conversation_id = conversations.id
+            GROUP BY conversations.id
+        ) d
+        WHERE c.id = d.id
+          AND (c.content_digest IS DISTINCT FROM COALESCE(d.digest, 0)
+               OR c.last_sequence_number IS DISTINCT FROM d.last_sequence)
+    """)).rowcount
+    self.db.commit()
+
+    logger.info(f"Backfilled {total} message digests, corrected {conversations} conversations")
+    return {"messages": total, "conversations": conversations}
+
+@celery_app.task(base=DatabaseTask, bind=True)
+def refresh_embedding_snapshots_task(self, rebuild: bool = False):
+    """
+    Refresh the float16 snapshots of every user under the snapshot size
+    cutoff; rebuild rewrites them and drops rows of deleted conversations
+    """
+    from sqlalchemy import func
+    from app.core.config import settings
+    from app.models.embedding import Embedding
+    from app.services.embedding_snapshots import embedding_snapshots
+    from app.services.encoder_backends import embedding_version
+
+    users = self.db.query(Embedding.user_id).filter(
+        Embedding.user_id.isnot(None),
+        Embedding.model_name == settings.EMBEDDING_MODEL,
+        Embedding.model_version == embedding_version()
+    ).group_by(Embedding.user_id).having(
+        func.count(Embedding.id) <= settings.EMBEDDING_SNAPSHOT_MAX_ROWS
+    ).all()
+
+    for (user_id,) in users:
+        embedding_snapshots.refresh(
+            self.db,
+            str(user_id),
+            settings.EMBEDDING_MODEL,
+            embedding_version(),
+            rebuild=rebuild
+        )
+
+    logger.info(f"Refreshed embedding snapshots for {len(users)} users")
+    return {"users": len(users), "rebuild": rebuild}
+
 @celery_app.task(base=DatabaseTask, bind=True)
 def cleanup_old_embeddings_task(self, days: int = 90):
     """
@@ -136,3 +263,26 @@ def run_sync_embeddings(conversation_id: str):
         logger.error(f"Error in sync embedding generation: {e}")
     finally:
         db.close()
+
+def run_sync_embeddings_batch(conversation_ids: list, rebuild_centroid_ids: list = None):
+    """
+    Run embedding generation for several conversations in one session
+    Used after bulk ingestion when Celery is not available; conversations
+    in rebuild_centroid_ids had messages edited, so their centroids are
+    recomputed instead of only accumulated
+    """
+    db = SessionLocal()
+    try:
+        service = EmbeddingService(db)
+        for conversation_id in conversation_ids:
+            try:
+                service.generate_embeddings_for_conversation(conversation_id)
+            except Exception as e:
+                logger.error(f"Error in sync embedding generation for {conversation_id}: {e}")
+        if rebuild_centroid_ids:
+            try:
+                service.rebuild_conversation_centroids(rebuild_centroid_ids)
+            except Exception as e:
+                logger.error(f"Error rebuilding conversation centroids: {e}")
+    finally:
+        db.close()
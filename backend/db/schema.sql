@@ -70,6 +70,9 @@ CREATE TABLE conversations (
     is_deleted BOOLEAN DEFAULT false,
     deleted_at TIMESTAMP WITH TIME ZONE,
     metadata JSONB DEFAULT '{}'::jsonb,
+    -- Delta sync: XOR of message content digests, highest sequence number; maintained by triggers below
+    content_digest BIGINT NOT NULL DEFAULT 0,
+    last_sequence_number INTEGER,
     UNIQUE(user_id, agent_id, external_id)
 );
 
@@ -77,6 +80,8 @@ CREATE INDEX idx_conversations_user_id ON conversations(user_id);
 CREATE INDEX idx_conversations_project_id ON conversations(project_id);
 CREATE INDEX idx_conversations_agent_id ON conversations(agent_id);
 CREATE INDEX idx_conversations_created_at ON conversations(created_at DESC);
+CREATE INDEX idx_conversations_user_created ON conversations(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_conversations_user_updated ON conversations(user_id, updated_at, id);
 CREATE INDEX idx_conversations_external_id ON conversations(external_id);
 CREATE INDEX idx_conversations_metadata ON conversations USING gin(metadata);
 
@@ -97,22 +102,31 @@ CREATE TABLE messages (
     version INTEGER DEFAULT 1,
     parent_message_id UUID REFERENCES messages(id),
     metadata JSONB DEFAULT '{}'::jsonb,
+    -- Conversation title (weight A) + content (weight B); maintained by triggers below
+    search_vector TSVECTOR,
+    -- First 8 bytes of sha256('<sequence_number>:<role>:<content>'); maintained by triggers below
+    content_digest BIGINT,
     UNIQUE(conversation_id, sequence_number)
 );
 
 CREATE INDEX idx_messages_conversation_id ON messages(conversation_id);
 CREATE INDEX idx_messages_created_at ON messages(created_at DESC);
 CREATE INDEX idx_messages_role ON messages(role);
-CREATE INDEX idx_messages_content_fts ON messages USING gin(to_tsvector('english', content));
+CREATE INDEX idx_messages_search_vector ON messages USING gin(search_vector);
 
 -- Embeddings table
 CREATE TABLE embeddings (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
     embedding vector(384),
+    content_hash VARCHAR(64),
+    -- Denormalized from the conversation so vector search can filter by tenant
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    agent_id UUID REFERENCES agents(id),
     model_name VARCHAR(100) NOT NULL,
     model_version VARCHAR(50) NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    -- Insert time, not transaction start: snapshot refreshes page on it
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT clock_timestamp(),
     UNIQUE(message_id, model_name, model_version)
 );
 
@@ -121,6 +135,29 @@ CREATE INDEX idx_embeddings_vector ON embeddings
     WITH (m = 16, ef_construction = 64);
 
 CREATE INDEX idx_embeddings_message_id ON embeddings(message_id);
+CREATE INDEX idx_embeddings_content_hash ON embeddings(content_hash, model_name, model_version);
+CREATE INDEX idx_embeddings_user_agent ON embeddings(user_id, agent_id);
+
+-- Conversation-level embeddings (length-weighted sum of normalized message embeddings)
+CREATE TABLE conversation_embeddings (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    embedding vector(384),
+    weight_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    agent_id UUID REFERENCES agents(id),
+    model_name VARCHAR(100) NOT NULL,
+    model_version VARCHAR(50) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(conversation_id, model_name, model_version)
+);
+
+CREATE INDEX idx_conversation_embeddings_vector ON conversation_embeddings
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX idx_conversation_embeddings_user_agent ON conversation_embeddings(user_id, agent_id);
 
 -- Tags table
 CREATE TABLE tags (
@@ -175,3 +212,116 @@ CREATE TRIGGER update_projects_updated_at BEFORE UPDATE ON projects
 
 CREATE TRIGGER update_conversations_updated_at BEFORE UPDATE ON conversations
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Full-text search vector: conversation title (weight A) + message content (weight B)
+CREATE OR REPLACE FUNCTION messages_search_vector_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(
+            (SELECT title FROM conversations WHERE id = NEW.conversation_id), '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.content, '')), 'B');
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER messages_search_vector_trigger BEFORE INSERT OR UPDATE OF content, conversation_id ON messages
+    FOR EACH ROW EXECUTE FUNCTION messages_search_vector_update();
+
+CREATE OR REPLACE FUNCTION conversations_title_search_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE messages
+    SET search_vector =
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    WHERE conversation_id = NEW.id;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER conversations_title_search_trigger AFTER UPDATE OF title ON conversations
+    FOR EACH ROW WHEN (OLD.title IS DISTINCT FROM NEW.title)
+    EXECUTE FUNCTION conversations_title_search_update();
+
+-- Delta sync digests: conversations.content_digest is the XOR of its messages'
+-- digests, so inserts, edits and deletes adjust it without rescanning history
+CREATE OR REPLACE FUNCTION message_content_digest(seq INTEGER, role TEXT, content TEXT)
+RETURNS BIGINT AS $$
+    SELECT ('x' || substr(encode(sha256(convert_to(seq || ':' || role || ':' || content, 'UTF8')), 'hex'), 1, 16))::bit(64)::bigint
+$$ language 'sql' IMMUTABLE;
+
+CREATE OR REPLACE AGGREGATE bigint_xor(BIGINT) (SFUNC = int8xor, STYPE = BIGINT, INITCOND = '0');
+
+CREATE OR REPLACE FUNCTION messages_content_digest_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.content_digest := message_content_digest(NEW.sequence_number, NEW.role, NEW.content);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER messages_content_digest_trigger BEFORE INSERT OR UPDATE OF content, role, sequence_number ON messages
+    FOR EACH ROW EXECUTE FUNCTION messages_content_digest_update();
+
+CREATE OR REPLACE FUNCTION conversations_digest_after_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE conversations c
+    SET content_digest = c.content_digest # d.digest,
+        last_sequence_number = GREATEST(c.last_sequence_number, d.last_sequence)
+    FROM (
+        SELECT conversation_id, bigint_xor(content_digest) AS digest, max(sequence_number) AS last_sequence
+        FROM new_messages GROUP BY conversation_id
+    ) d
+    WHERE c.id = d.conversation_id;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER messages_digest_insert_trigger AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_messages
+    FOR EACH STATEMENT EXECUTE FUNCTION conversations_digest_after_insert();
+
+CREATE OR REPLACE FUNCTION conversations_digest_after_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE conversations c
+    SET content_digest = c.content_digest # d.digest,
+        last_sequence_number = GREATEST(c.last_sequence_number, d.last_sequence)
+    FROM (
+        SELECT conversation_id, bigint_xor(content_digest) AS digest, max(sequence_number) AS last_sequence
+        FROM (
+            SELECT conversation_id, content_digest, NULL::integer AS sequence_number FROM old_messages
+            UNION ALL
+            SELECT conversation_id, content_digest, sequence_number FROM new_messages
+        ) changed
+        GROUP BY conversation_id
+    ) d
+    WHERE c.id = d.conversation_id AND d.digest <> 0;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER messages_digest_update_trigger AFTER UPDATE ON messages
+    REFERENCING OLD TABLE AS old_messages NEW TABLE AS new_messages
+    FOR EACH STATEMENT EXECUTE FUNCTION conversations_digest_after_update();
+
+CREATE OR REPLACE FUNCTION conversations_digest_after_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE conversations c
+    SET content_digest = c.content_digest # d.digest,
+        last_sequence_number = (SELECT max(sequence_number) FROM messages WHERE conversation_id = c.id)
+    FROM (
+        SELECT conversation_id, bigint_xor(content_digest) AS digest
+        FROM old_messages GROUP BY conversation_id
+    ) d
+    WHERE c.id = d.conversation_id;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER messages_digest_delete_trigger AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_messages
+    FOR EACH STATEMENT EXECUTE FUNCTION conversations_digest_after_delete();
@@ -0,0 +1,85 @@
+"""
+Concurrency benchmark for the API
+
+Fires a fixed number of requests at an endpoint with bounded concurrency and
+reports requests per second and latency percentiles. Run it once against the
+old build and once against the new one with the same arguments to compare.
+
+Usage:
+    python scripts/bench_concurrency.py --token <JWT> \
+        --path /api/v1/conversations/ --requests 2000 --concurrency 64
+    python scripts/bench_concurrency.py --token <JWT> --method POST \
+        --path /api/v1/search/keyword --json '{"query": "python"}'
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    body = json.loads(args.json) if args.json else None
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=60.0) as client:
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(args.method, args.path, json=body)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        # Warm up connections and caches before measuring
+        await asyncio.gather(*(one() for _ in range(min(args.concurrency, args.requests))))
+        latencies.clear()
+        errors = 0
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"label:        {args.label}")
+    print(f"endpoint:     {args.method} {args.path}")
+    print(f"requests:     {args.requests} (concurrency {args.concurrency}, errors {errors})")
+    print(f"throughput:   {args.requests / elapsed:.1f} req/s")
+    print(f"latency mean: {statistics.mean(latencies) * 1000:.1f} ms")
+    print(f"latency p50:  {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"latency p99:  {percentile(latencies, 99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/v1/conversations/")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--json", default=None, help="JSON request body")
+    parser.add_argument("--token", default=None, help="JWT access token")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--label", default="run")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Embedding backend benchmark and parity check
+
+For each backend (torch, onnx, onnx-int8) reports sentences per second at
+several batch sizes, and the cosine drift of its vectors against torch.
+
+Usage (from backend/):
+    python scripts/bench_encoders.py
+    python scripts/bench_encoders.py --backends torch onnx-int8 --batch-sizes 1 32 --sentences 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services.encoder_backends import BACKENDS, PARITY_SAMPLE, TORCH_BACKEND, load_backend, parity_check  # noqa: E402
+
+
+def make_corpus(size, seed=0):
+    """Synthetic corpus of mixed-length sentences built from the parity sample"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        parts = rng.randint(1, 6)
+        corpus.append(" ".join(rng.choice(PARITY_SAMPLE) for _ in range(parts)))
+    return corpus
+
+
+def throughput(backend, corpus, batch_size):
+    backend.encode(corpus[:batch_size], batch_size=batch_size)  # warm up
+    started = time.perf_counter()
+    backend.encode(corpus, batch_size=batch_size)
+    return len(corpus) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32, 64])
+    parser.add_argument("--sentences", type=int, default=1000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.sentences)
+    reference = load_backend(args.model, TORCH_BACKEND)
+
+    print(f"model: {args.model}, corpus: {len(corpus)} sentences\n")
+    print(f"{'backend':<10} {'batch':>6} {'sent/s':>10}")
+    parity = {}
+    for name in args.backends:
+        backend = reference if name == TORCH_BACKEND else load_backend(args.model, name)
+        for batch_size in args.batch_sizes:
+            print(f"{name:<10} {batch_size:>6} {throughput(backend, corpus, batch_size):>10.1f}")
+        if name != TORCH_BACKEND:
+            parity[name] = parity_check(backend, reference, PARITY_SAMPLE + corpus[:200])
+
+    if parity:
+        print(f"\n{'backend':<10} {'mean cos':>10} {'min cos':>10} {'max drift':>10}")
+        for name, report in parity.items():
+            print(
+                f"{name:<10} {report['mean_cosine']:>10.5f} "
+                f"{report['min_cosine']:>10.5f} {report['max_drift']:>10.5f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Ingestion throughput benchmark for /conversations/batch
+
+Sends synthetic extension-sync batches and reports conversations and
+messages ingested per second. Each round first creates fresh conversations,
+then re-sends them with extra turns appended (the upsert path), the way an
+extension flushes its backlog. Run it against the old and the new build with
+the same arguments to compare.
+
+Usage:
+    python scripts/bench_ingestion.py --token <JWT> --batches 10 \
+        --batch-size 500 --messages 20
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def make_conversation(run_id, index, messages, agent):
+    return {
+        "agent_id": agent,
+        "external_id": f"bench-{run_id}-{index}",
+        "title": f"Benchmark conversation {index}",
+        "metadata": {"source": "bench_ingestion"},
+        "messages": [
+            {
+                "role": "user" if turn % 2 == 0 else "assistant",
+                "content": f"Benchmark message {turn} of conversation {index}: " + "lorem ipsum " * 20,
+                "sequence_number": turn,
+            }
+            for turn in range(messages)
+        ],
+    }
+
+
+def post_batch(client, conversations):
+    started = time.perf_counter()
+    response = client.post("/api/v1/conversations/batch", json={"conversations": conversations})
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    body = response.json()
+    return elapsed, body
+
+
+def report(label, timings, conversations, messages):
+    total = sum(timings)
+    print(
+        f"{label:<8} {conversations / total:>10.1f} conv/s {messages / total:>10.1f} msg/s "
+        f"  p50 {statistics.median(timings) * 1000:>8.1f} ms  max {max(timings) * 1000:>8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="JWT access token")
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=20, help="messages per conversation")
+    parser.add_argument("--append", type=int, default=4, help="turns appended on the upsert pass")
+    parser.add_argument("--agent", default="chatgpt")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    headers = {"Authorization": f"Bearer {args.token}"}
+    create_times, upsert_times = [], []
+    failed = 0
+
+    with httpx.Client(base_url=args.url, headers=headers, timeout=600.0) as client:
+        for batch in range(args.batches):
+            conversations = [
+                make_conversation(run_id, batch * args.batch_size + i, args.messages, args.agent)
+                for i in range(args.batch_size)
+            ]
+            elapsed, body = post_batch(client, conversations)
+            create_times.append(elapsed)
+            failed += body["failed"]
+
+            conversations = [
+                make_conversation(run_id, batch * args.batch_size + i, args.messages + args.append, args.agent)
+                for i in range(args.batch_size)
+            ]
+            elapsed, body = post_batch(client, conversations)
+            upsert_times.append(elapsed)
+            failed += body["failed"]
+
+    total_conversations = args.batches * args.batch_size
+    print(f"run {run_id}: {args.batches} batches x {args.batch_size} conversations, failed {failed}")
+    report("create", create_times, total_conversations, total_conversations * args.messages)
+    report("upsert", upsert_times, total_conversations, total_conversations * args.append)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Conversation list pagination benchmark: offset vs keyset cursor
+
+For the user with the most conversations, times fetching one page at
+increasing depths with limit/offset and with the (created_at, id) keyset
+that list_conversations uses for cursors. Offset latency grows with depth;
+keyset latency should stay flat.
+
+Usage (from backend/, against a populated database):
+    python scripts/bench_pagination.py --limit 50 --repeats 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from sqlalchemy import select, func, tuple_  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.models.conversation import Conversation  # noqa: E402
+
+DEPTHS = [0, 10, 100, 1000, 10000, 50000]
+
+
+def page_query(user_id, limit):
+    return select(Conversation).where(
+        Conversation.user_id == user_id,
+        Conversation.is_deleted == False
+    ).order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(limit)
+
+
+def timed(db, query, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows = db.execute(query).scalars().all()
+        samples.append(time.perf_counter() - started)
+        db.expunge_all()
+    return np.median(samples) * 1000.0, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_id, total = db.execute(
+            select(Conversation.user_id, func.count())
+            .where(Conversation.is_deleted == False)
+            .group_by(Conversation.user_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).one()
+        print(f"user {user_id}: {total} conversations, limit {args.limit}")
+        print(f"{'page offset':>12} {'offset ms':>10} {'keyset ms':>10}")
+
+        for depth in DEPTHS:
+            if depth >= total:
+                break
+            offset_ms, rows = timed(db, page_query(user_id, args.limit).offset(depth), args.repeats)
+            if depth == 0:
+                keyset_ms, _ = timed(db, page_query(user_id, args.limit), args.repeats)
+            else:
+                # Position of the row just before this page, as a cursor would carry it
+                anchor = db.execute(
+                    page_query(user_id, 1).offset(depth - 1)
+                ).scalars().one()
+                keyset = page_query(user_id, args.limit).where(
+                    tuple_(Conversation.created_at, Conversation.id)
+                    < tuple_(anchor.created_at, anchor.id)
+                )
+                keyset_ms, keyset_rows = timed(db, keyset, args.repeats)
+                assert [r.id for r in keyset_rows] == [r.id for r in rows], "keyset page differs from offset page"
+            print(f"{depth:>12} {offset_ms:>9.2f} {keyset_ms:>10.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
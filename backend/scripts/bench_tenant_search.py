@@ -0,0 +1,96 @@
+"""
+Vector search benchmark across skewed tenant sizes
+
+Picks users from several corpus-size buckets, issues queries drawn from each
+user's own embeddings and reports per-bucket latency for the exact and HNSW
+strategies of EmbeddingService.search_similar, plus HNSW recall@k measured
+against the exact results.
+
+Usage (from backend/, against a populated database):
+    python scripts/bench_tenant_search.py --queries 20 --limit 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.embedding_service import EmbeddingService, EXACT_STRATEGY, HNSW_STRATEGY  # noqa: E402
+
+BUCKETS = [(0, 1000), (1000, 10000), (10000, 100000), (100000, None)]
+
+
+def pick_users(db, per_bucket):
+    rows = db.execute(text("""
+        SELECT user_id, count(*) AS n FROM embeddings
+        WHERE user_id IS NOT NULL GROUP BY user_id
+    """)).fetchall()
+    picked = {}
+    for low, high in BUCKETS:
+        users = [r for r in rows if r.n >= low and (high is None or r.n < high)]
+        users.sort(key=lambda r: r.n, reverse=True)
+        picked[(low, high)] = users[:per_bucket]
+    return picked
+
+
+def sample_vectors(db, user_id, count):
+    rows = db.execute(text("""
+        SELECT embedding FROM embeddings WHERE user_id = :user_id
+        ORDER BY random() LIMIT :count
+    """), {"user_id": user_id, "count": count}).fetchall()
+    return [np.asarray(r.embedding, dtype=np.float32) for r in rows]
+
+
+def timed(service, user_id, vector, limit, strategy):
+    started = time.perf_counter()
+    results = service.search_similar(
+        query="", user_id=str(user_id), limit=limit, threshold=-1.0,
+        query_vector=vector, strategy=strategy
+    )
+    service.db.commit()  # end the transaction so SET LOCAL settings reset
+    return time.perf_counter() - started, [r["message_id"] for r in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users-per-bucket", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    service = EmbeddingService(db)
+    try:
+        print(f"{'bucket':<16} {'users':>5} {'exact p50':>10} {'exact p99':>10} {'hnsw p50':>10} {'hnsw p99':>10} {'recall':>8}")
+        for (low, high), users in pick_users(db, args.users_per_bucket).items():
+            exact_times, hnsw_times, recalls = [], [], []
+            for user in users:
+                for vector in sample_vectors(db, user.user_id, args.queries):
+                    t_exact, exact_ids = timed(service, user.user_id, vector, args.limit, EXACT_STRATEGY)
+                    t_hnsw, hnsw_ids = timed(service, user.user_id, vector, args.limit, HNSW_STRATEGY)
+                    exact_times.append(t_exact)
+                    hnsw_times.append(t_hnsw)
+                    if exact_ids:
+                        recalls.append(len(set(exact_ids) & set(hnsw_ids)) / len(exact_ids))
+            label = f"{low}-{high if high else 'inf'}"
+            if not exact_times:
+                print(f"{label:<16} {len(users):>5}   (no data)")
+                continue
+            q = lambda values, pct: np.percentile(values, pct) * 1000.0
+            print(
+                f"{label:<16} {len(users):>5} {q(exact_times, 50):>9.1f}ms {q(exact_times, 99):>9.1f}ms "
+                f"{q(hnsw_times, 50):>9.1f}ms {q(hnsw_times, 99):>9.1f}ms "
+                f"{statistics.mean(recalls) if recalls else 0.0:>8.3f}"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Plan check for the HNSW search query
+
+Builds the same SQL EmbeddingService.search_similar runs on the HNSW path,
+EXPLAINs it and fails unless the plan reads embeddings through the
+idx_embeddings_vector index (no sequential scan of embeddings). Run it after
+touching the search SQL or the embeddings indexes.
+
+Usage (from backend/, against a populated database):
+    python scripts/check_knn_plan.py [--user-id UUID] [--limit 20] [--allow-seqscan]
+
+By default enable_seqscan is turned off for the check, so small dev tables
+still prove the query shape *can* use the index; pass --allow-seqscan to see
+the plan the planner would really pick.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.embedding_service import EmbeddingService, HNSW_STRATEGY  # noqa: E402
+
+INDEX_NAME = "idx_embeddings_vector"
+
+
+def walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", default=None, help="Tenant to plan for (default: largest)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--ef-search", type=int, default=None)
+    parser.add_argument("--allow-seqscan", action="store_true")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_id = args.user_id or db.execute(text("""
+            SELECT user_id FROM embeddings WHERE user_id IS NOT NULL
+            GROUP BY user_id ORDER BY count(*) DESC LIMIT 1
+        """)).scalar()
+        if user_id is None:
+            print("No embeddings with a user_id; nothing to plan")
+            return 1
+
+        service = EmbeddingService(db)
+        dim = db.execute(text("SELECT vector_dims(embedding) FROM embeddings LIMIT 1")).scalar()
+        query_vector = np.random.default_rng(0).standard_normal(dim).astype(np.float32)
+        sql, params, _ = service.build_similar_query(
+            str(user_id), query_vector, limit=args.limit, strategy=HNSW_STRATEGY
+        )
+
+        service._configure_hnsw_scan(args.ef_search, params["candidates"])
+        if not args.allow_seqscan:
+            db.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes = list(walk(plan[0]["Plan"]))
+    finally:
+        db.rollback()
+        db.close()
+
+    seq_scans = [n for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "embeddings"]
+    index_scans = [n for n in nodes if n.get("Index Name") == INDEX_NAME]
+
+    for node in nodes:
+        relation = node.get("Relation Name", "")
+        index = node.get("Index Name", "")
+        print(f"{node['Node Type']:<24} {relation:<16} {index}")
+
+    if seq_scans:
+        print("FAIL: sequential scan on embeddings")
+        return 1
+    if not index_scans:
+        print(f"FAIL: plan does not use {INDEX_NAME}")
+        return 1
+    print(f"OK: ordered KNN scan on {INDEX_NAME}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
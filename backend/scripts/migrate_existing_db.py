@@ -0,0 +1,176 @@
+"""
+Bring a database created from an older db/schema.sql up to date
+
+create_all only creates missing tables, so databases that predate these
+columns never get them. This script adds, idempotently:
+
+  * messages.search_vector, its triggers and GIN index (keyword search)
+  * messages.content_digest, conversations.content_digest and
+    last_sequence_number, the digest triggers (delta sync)
+  * embeddings.content_hash, user_id, agent_id and their indexes, and the
+    insert-time created_at default snapshot refreshes rely on
+  * the conversation_embeddings table
+  * the conversation list / sync manifest indexes
+
+then backfills existing rows in bounded batches. New writes are covered by
+the triggers before the backfill starts, so it can run against a live
+database; indexes are built CONCURRENTLY. Re-running it is safe and only
+touches rows that are still missing values.
+
+Usage (from backend/):
+    python scripts/migrate_existing_db.py [--batch-size 10000] [--skip-backfill]
+        [--rebuild-centroids]
+
+--rebuild-centroids recomputes every conversation centroid; pass it once on
+databases whose centroids were stored as means rather than weighted sums.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.conversation import _CONTENT_DIGEST_DDL, _SEARCH_VECTOR_DDL  # noqa: E402
+from app.models.embedding import ConversationEmbedding  # noqa: E402
+from app.tasks.embedding_tasks import (  # noqa: E402
+    backfill_conversation_embeddings_task,
+    backfill_embedding_tenants_task,
+    backfill_sync_digests_task,
+)
+
+COLUMNS = [
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS content_digest BIGINT NOT NULL DEFAULT 0",
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_sequence_number INTEGER",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector TSVECTOR",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_digest BIGINT",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES users(id) ON DELETE CASCADE",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS agent_id UUID REFERENCES agents(id)",
+    "ALTER TABLE embeddings ALTER COLUMN created_at SET DEFAULT clock_timestamp()",
+]
+
+# (trigger, table) pairs created by _SEARCH_VECTOR_DDL and _CONTENT_DIGEST_DDL
+TRIGGERS = [
+    ("messages_search_vector_trigger", "messages"),
+    ("conversations_title_search_trigger", "conversations"),
+    ("messages_content_digest_trigger", "messages"),
+    ("messages_digest_insert_trigger", "messages"),
+    ("messages_digest_update_trigger", "messages"),
+    ("messages_digest_delete_trigger", "messages"),
+]
+
+# Same definitions as db/schema.sql; the search_vector index is built after
+# its backfill so it is not maintained row by row during the UPDATEs
+INDEXES = [
+    ("idx_conversations_user_created", "ON conversations(user_id, created_at DESC, id DESC)"),
+    ("idx_conversations_user_updated", "ON conversations(user_id, updated_at, id)"),
+    ("idx_embeddings_content_hash", "ON embeddings(content_hash, model_name, model_version)"),
+    ("idx_embeddings_user_agent", "ON embeddings(user_id, agent_id)"),
+]
+SEARCH_VECTOR_INDEX = ("idx_messages_search_vector", "ON messages USING gin(search_vector)")
+# Expression index the search_vector index replaces
+DROPPED_INDEXES = ["idx_messages_content_fts"]
+
+
+def migrate_schema():
+    """Columns, functions, triggers and the conversation_embeddings table, in one transaction"""
+    with engine.begin() as conn:
+        for statement in COLUMNS:
+            conn.execute(text(statement))
+        for trigger, table in TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+        for ddl in _SEARCH_VECTOR_DDL + _CONTENT_DIGEST_DDL:
+            conn.execute(ddl)
+    Base.metadata.create_all(bind=engine, tables=[ConversationEmbedding.__table__])
+
+
+def create_indexes(indexes):
+    """CREATE INDEX CONCURRENTLY, replacing invalid leftovers of an interrupted build"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        for name, definition in indexes:
+            invalid = conn.execute(text("""
+                SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+                WHERE pg_class.relname = :name AND NOT pg_index.indisvalid
+            """), {"name": name}).scalar()
+            if invalid:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            started = time.perf_counter()
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}"))
+            print(f"  {name}: {time.perf_counter() - started:.1f}s")
+
+
+def backfill_batches(db, sql: str, batch_size: int) -> int:
+    """Run a LIMIT :batch_size UPDATE until it touches fewer rows than a batch"""
+    total = 0
+    while True:
+        updated = db.execute(text(sql), {"batch_size": batch_size}).rowcount
+        db.commit()
+        total += updated
+        if updated < batch_size:
+            return total
+
+
+def backfill_search_vectors(db, batch_size: int) -> int:
+    return backfill_batches(db, """
+        UPDATE messages m
+        SET search_vector =
+            setweight(to_tsvector('english', coalesce(c.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(m.content, '')), 'B')
+        FROM conversations c
+        WHERE c.id = m.conversation_id
+            AND m.id IN (SELECT id FROM messages WHERE search_vector IS NULL LIMIT :batch_size)
+    """, batch_size)
+
+
+def backfill_content_hashes(db, batch_size: int) -> int:
+    # Same value as embedding_service.content_hash: hex sha256 of the UTF-8 text
+    return backfill_batches(db, """
+        UPDATE embeddings e
+        SET content_hash = encode(sha256(convert_to(m.content, 'UTF8')), 'hex')
+        FROM messages m
+        WHERE m.id = e.message_id
+            AND e.id IN (SELECT id FROM embeddings WHERE content_hash IS NULL LIMIT :batch_size)
+    """, batch_size)
+
+
+def run_task(task, **kwargs):
+    """Run a Celery backfill task in this process"""
+    return task.apply(kwargs=kwargs).get()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--skip-backfill", action="store_true", help="Only add columns, triggers and indexes")
+    parser.add_argument("--rebuild-centroids", action="store_true")
+    args = parser.parse_args()
+
+    print("Adding columns, triggers and tables...")
+    migrate_schema()
+    print("Creating indexes...")
+    create_indexes(INDEXES)
+
+    if not args.skip_backfill:
+        db = SessionLocal()
+        try:
+            print(f"Backfilled search_vector on {backfill_search_vectors(db, args.batch_size)} messages")
+            print(f"Backfilled content_hash on {backfill_content_hashes(db, args.batch_size)} embeddings")
+        finally:
+            db.close()
+        print(f"Sync digests: {run_task(backfill_sync_digests_task, batch_size=args.batch_size)}")
+        print(f"Embedding tenants: {run_task(backfill_embedding_tenants_task, batch_size=args.batch_size)}")
+        print(f"Conversation centroids: {run_task(backfill_conversation_embeddings_task, rebuild=args.rebuild_centroids)}")
+
+    create_indexes([SEARCH_VECTOR_INDEX])
+    print("Migration complete")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())